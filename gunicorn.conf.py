@@ -0,0 +1,83 @@
+# Perfil de producción. Lo usa el Dockerfile; localmente: gunicorn -c gunicorn.conf.py
+import os
+import time
+
+INICIO = time.monotonic()
+
+
+def _entero(nombre, defecto):
+    valor = os.getenv(nombre, "").strip()
+    return int(valor) if valor else defecto
+
+
+def _cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+ASGI = os.getenv("SERVIDOR", "wsgi") == "asgi"
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+wsgi_app = "core.asgi:application" if ASGI else "core.wsgi:application"
+worker_class = "uvicorn_worker.UvicornWorker" if ASGI else "gthread"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Con gthread cada worker atiende `threads` requests a la vez y comparte la memoria del
+# código precargado. WEB_CONCURRENCY y GUNICORN_THREADS pisan el cálculo.
+workers = _entero("WEB_CONCURRENCY", min(2 * _cpus() + 1, 8))
+threads = _entero("GUNICORN_THREADS", 4)
+preload_app = True
+timeout = 30
+graceful_timeout = 20
+keepalive = 5
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+
+
+def when_ready(server):
+    # Con preload_app Django ya está cargado en el maestro: se prepara la base una sola vez
+    # y se calienta lo que los workers heredan por fork.
+    from django.core.management import call_command
+
+    from core import arranque
+
+    try:
+        call_command("bootstrap")
+    except Exception:
+        server.log.exception("Bootstrap falló; la app arranca igual para pasar el healthcheck.")
+    calentamiento = arranque.calentar()
+    arranque.cerrar_conexiones()
+    server.log.info(
+        "Maestro listo en %.2fs (%s plantillas compiladas en %.2fs, %s workers x %s threads).",
+        time.monotonic() - INICIO,
+        calentamiento["plantillas"],
+        calentamiento["segundos"],
+        server.cfg.workers,
+        server.cfg.threads if not ASGI else 1,
+    )
+
+
+def post_worker_init(worker):
+    # Bajo ASGI el ORM corre en el hilo de sync_to_async, que todavía no existe: la conexión
+    # se abre con el primer request.
+    if ASGI:
+        return
+    from core import arranque
+
+    try:
+        segundos = arranque.abrir_conexiones(getattr(worker, "tpool", None), worker.cfg.threads)
+    except Exception:
+        worker.log.exception("No se pudo abrir la conexión a la base al iniciar el worker.")
+        return
+    worker.log.info("Worker %s listo a %.2fs del arranque (base en %.3fs).", worker.pid, time.monotonic() - INICIO, segundos)
+
+
+def pre_request(worker, req):
+    # Solo los workers WSGI llaman a este hook.
+    if getattr(worker, "primer_request", False):
+        return
+    worker.primer_request = True
+    worker.log.info("Primer request del worker %s a %.2fs del arranque.", worker.pid, time.monotonic() - INICIO)
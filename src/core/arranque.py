@@ -0,0 +1,62 @@
+import threading
+import time
+from pathlib import Path
+
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+
+
+def _nombres_plantillas(backend):
+    for directorio in backend.template_dirs:
+        directorio = Path(directorio)
+        for archivo in directorio.rglob("*.html"):
+            yield archivo.relative_to(directorio).as_posix()
+
+
+def calentar():
+    # Con preload_app corre una sola vez en el proceso maestro: los workers heredan por fork
+    # las vistas importadas y las plantillas ya compiladas en el loader con caché.
+    inicio = time.perf_counter()
+    get_resolver().url_patterns
+    plantillas = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for nombre in set(_nombres_plantillas(backend)):
+            backend.get_template(nombre)
+            plantillas += 1
+    return {"plantillas": plantillas, "segundos": round(time.perf_counter() - inicio, 3)}
+
+
+def _abrir():
+    for conexion in connections.all():
+        conexion.ensure_connection()
+
+
+def cerrar_conexiones():
+    # Antes del fork: ni las conexiones ni el pool (con sus threads) sobreviven a la copia.
+    connections.close_all()
+    for conexion in connections.all():
+        if conexion.vendor == "postgresql":
+            conexion.close_pool()
+
+
+def abrir_conexiones(pool=None, hilos=1):
+    # Se llama en cada worker después del fork: una conexión abierta en el maestro quedaría
+    # compartida entre procesos. Django guarda una conexión por hilo, así que con un pool de
+    # threads se abre una en cada hilo; la barrera hace que cada tarea caiga en un hilo distinto.
+    inicio = time.perf_counter()
+    if pool is None:
+        _abrir()
+    else:
+        barrera = threading.Barrier(hilos)
+
+        def tarea():
+            _abrir()
+            barrera.wait(timeout=10)
+
+        for futuro in [pool.submit(tarea) for _ in range(hilos)]:
+            futuro.result()
+    return round(time.perf_counter() - inicio, 3)
@@ -0,0 +1,57 @@
+import re
+import unicodedata
+
+from django.db.models import Q
+
+
+MINIMO = 2
+LIMITE = 20
+LIMITE_MAXIMO = 50
+ALFABETO = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def normalizar(texto):
+    # Minúsculas, sin tildes ni separadores: "Pérez, J." y "perezj" buscan lo mismo, y
+    # "juan pe" encuentra a "Juan Pérez".
+    sin_tildes = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", sin_tildes.lower())
+
+
+def prefijo(campo, texto):
+    # Un rango en lugar de LIKE: lo resuelve el índice común tanto en SQLite como en
+    # PostgreSQL. El límite superior también sale de ALFABETO (tras "9" sigue "a", y las "z"
+    # finales se descartan): con un carácter de afuera, como "{" o ":", el orden dependería
+    # de la intercalación de la base.
+    base = texto.rstrip(ALFABETO[-1])
+    if not base:
+        return Q(**{f"{campo}__gte": texto})
+    siguiente = base[:-1] + ALFABETO[ALFABETO.index(base[-1]) + 1]
+    return Q(**{f"{campo}__gte": texto, f"{campo}__lt": siguiente})
+
+
+def buscar(queryset, texto, campos):
+    normalizado = normalizar(texto)
+    if len(normalizado) < MINIMO:
+        return queryset.none()
+    filtro = Q()
+    for campo in campos:
+        filtro |= prefijo(campo, normalizado)
+    return queryset.filter(filtro)
+
+
+class ConBusqueda:
+    # CAMPOS_BUSQUEDA = {"columna_normalizada": "campo"} o "campo+otro" para concatenar.
+    # Los bulk_create no pasan por save(): tienen que llamar antes a completar_busqueda().
+    CAMPOS_BUSQUEDA = {}
+
+    def completar_busqueda(self):
+        for destino, origen in self.CAMPOS_BUSQUEDA.items():
+            largo = self._meta.get_field(destino).max_length
+            valor = " ".join(str(getattr(self, campo) or "") for campo in origen.split("+"))
+            setattr(self, destino, normalizar(valor)[:largo])
+
+    def save(self, *args, **kwargs):
+        self.completar_busqueda()
+        if kwargs.get("update_fields"):
+            kwargs["update_fields"] = {*kwargs["update_fields"], *self.CAMPOS_BUSQUEDA}
+        super().save(*args, **kwargs)
@@ -0,0 +1,212 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+
+from core.replicas import primaria
+
+
+TIMEOUT_FAMILIA = 60 * 15
+
+_AUSENTE = object()
+
+# Igual que LocMemCache: el nivel local es uno por proceso y por LOCATION, no por hilo.
+_locales = {}
+_contadores = {}
+_locks = {}
+
+
+class CacheDosNiveles(BaseCache):
+    # Nivel 1: LRU acotado en la memoria de cada worker. Nivel 2: la caché compartida entre
+    # workers (archivo, base de datos o redis). Una entrada local vive como mucho TTL_LOCAL
+    # segundos, que es lo que puede tardar un worker en enterarse de un cambio hecho por otro.
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        opciones = params.get("OPTIONS", {})
+        self._alias_compartida = opciones.get("COMPARTIDA", "compartida")
+        self._max_local = int(opciones.get("MAX_LOCAL", 1000))
+        self._ttl_local = float(opciones.get("TTL_LOCAL", 5))
+        self._local = _locales.setdefault(location, OrderedDict())
+        self._contadores = _contadores.setdefault(
+            location, dict.fromkeys(("aciertos_local", "aciertos_compartida", "fallos", "desalojos"), 0)
+        )
+        self._lock = _locks.setdefault(location, threading.Lock())
+
+    @property
+    def compartida(self):
+        return caches[self._alias_compartida]
+
+    def _contar(self, contador):
+        with self._lock:
+            self._contadores[contador] += 1
+
+    def _leer_local(self, clave):
+        with self._lock:
+            entrada = self._local.get(clave)
+            if entrada is None:
+                return _AUSENTE
+            valor, vence = entrada
+            if vence <= time.monotonic():
+                del self._local[clave]
+                return _AUSENTE
+            self._local.move_to_end(clave)
+        return pickle.loads(valor)
+
+    def _guardar_local(self, clave, valor, timeout=DEFAULT_TIMEOUT):
+        ttl = self._ttl_local
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._borrar_local(clave)
+            return
+        serializado = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[clave] = (serializado, time.monotonic() + ttl)
+            self._local.move_to_end(clave)
+            while len(self._local) > self._max_local:
+                self._local.popitem(last=False)
+                self._contadores["desalojos"] += 1
+
+    def _borrar_local(self, clave):
+        with self._lock:
+            self._local.pop(clave, None)
+
+    def get(self, key, default=None, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        valor = self._leer_local(clave)
+        if valor is not _AUSENTE:
+            self._contar("aciertos_local")
+            return valor
+        valor = self.compartida.get(key, _AUSENTE, version=version)
+        if valor is _AUSENTE:
+            self._contar("fallos")
+            return default
+        self._contar("aciertos_compartida")
+        self._guardar_local(clave, valor)
+        return valor
+
+    async def aget(self, key, default=None, version=None):
+        # El nivel local se lee sin salir del event loop; solo el compartido pasa por un hilo.
+        clave = self.make_and_validate_key(key, version=version)
+        valor = self._leer_local(clave)
+        if valor is not _AUSENTE:
+            self._contar("aciertos_local")
+            return valor
+        valor = await self.compartida.aget(key, _AUSENTE, version=version)
+        if valor is _AUSENTE:
+            self._contar("fallos")
+            return default
+        self._contar("aciertos_compartida")
+        self._guardar_local(clave, valor)
+        return valor
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self.compartida.set(key, value, timeout=timeout, version=version)
+        self._guardar_local(clave, value, timeout)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        await self.compartida.aset(key, value, timeout=timeout, version=version)
+        self._guardar_local(clave, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        if not self.compartida.add(key, value, timeout=timeout, version=version):
+            return False
+        self._guardar_local(clave, value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._borrar_local(self.make_and_validate_key(key, version=version))
+        return self.compartida.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._borrar_local(self.make_and_validate_key(key, version=version))
+        return self.compartida.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._borrar_local(self.make_and_validate_key(key, version=version))
+        self.compartida.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._leer_local(self.make_and_validate_key(key, version=version)) is not _AUSENTE:
+            return True
+        return self.compartida.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self._borrar_local(clave)
+        valor = self.compartida.incr(key, delta, version=version)
+        self._guardar_local(clave, valor)
+        return valor
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.compartida.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return {**self._contadores, "entradas_local": len(self._local), "max_local": self._max_local}
+
+
+def _clave_version(familia):
+    return f"familia:{familia}:version"
+
+
+def version_familia(familia):
+    clave = _clave_version(familia)
+    version = cache.get(clave)
+    if version is None:
+        # Arrancar desde la hora evita reutilizar una versión vieja si la clave se desalojó.
+        version = int(time.time() * 1000)
+        if not cache.add(clave, version, timeout=None):
+            version = cache.get(clave, version)
+    return version
+
+
+def invalidar_familia(*familias):
+    def subir():
+        for familia in familias:
+            try:
+                cache.incr(_clave_version(familia))
+            except ValueError:
+                version_familia(familia)
+
+    # Se sube ya y otra vez al confirmar, para descartar lo que otro request haya
+    # cacheado leyendo datos de antes del commit.
+    subir()
+    transaction.on_commit(subir)
+
+
+def clave_familia(familia, *partes):
+    return ":".join([familia, str(version_familia(familia)), *(str(parte) for parte in partes)])
+
+
+def cachear(familia, partes, generar, timeout=TIMEOUT_FAMILIA):
+    clave = clave_familia(familia, *partes)
+    valor = cache.get(clave, _AUSENTE)
+    if valor is _AUSENTE:
+        # Lo que queda en caché se calcula en la primaria: una réplica atrasada lo dejaría
+        # viejo hasta el próximo cambio de la familia.
+        with primaria():
+            valor = generar()
+        cache.set(clave, valor, timeout=timeout)
+    return valor
+
+
+def queryset_cacheado(familia, nombre, queryset, timeout=TIMEOUT_FAMILIA):
+    return cachear(familia, (nombre,), lambda: list(queryset.all()), timeout)
+
+
+def estadisticas():
+    return cache.estadisticas() if hasattr(cache, "estadisticas") else {}
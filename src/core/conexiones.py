@@ -0,0 +1,37 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Conexiones físicas abiertas por este proceso. Con CONN_MAX_AGE debería crecer solo hasta
+# una por thread; si sube con cada request, las conexiones no se están reutilizando.
+_creadas = Counter()
+_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def contar_conexion(sender, connection, **kwargs):
+    with _lock:
+        _creadas[connection.alias] += 1
+
+
+def estadisticas():
+    resultado = {}
+    for conexion in connections.all():
+        fila = {
+            "vendor": conexion.vendor,
+            "conn_max_age": conexion.settings_dict["CONN_MAX_AGE"],
+            "health_checks": conexion.settings_dict["CONN_HEALTH_CHECKS"],
+            "conexiones_creadas": _creadas[conexion.alias],
+            "pool": None,
+        }
+        pool = conexion.pool if conexion.vendor == "postgresql" else None
+        if pool is not None:
+            # requests_num son los checkouts, requests_waiting los que esperan una conexión libre
+            # y pool_size / pool_available el tamaño actual y las libres.
+            fila["pool"] = pool.get_stats()
+        resultado[conexion.alias] = fila
+    return resultado
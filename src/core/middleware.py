@@ -0,0 +1,119 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+logger = logging.getLogger("core.perfilado")
+
+
+class RegistroConsultas:
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((context["connection"].alias, sql, time.perf_counter() - inicio))
+
+    @property
+    def tiempo_total(self):
+        return sum(duracion for _alias, _sql, duracion in self.consultas)
+
+    def duplicadas(self, minimo):
+        # El SQL llega con placeholders: la misma plantilla repetida con distintos
+        # parámetros es el patrón típico de N+1.
+        repetidas = Counter(sql for _alias, sql, _duracion in self.consultas)
+        return [{"sql": sql, "veces": veces} for sql, veces in repetidas.most_common() if veces >= minimo]
+
+    def mas_lentas(self, cantidad):
+        ordenadas = sorted(self.consultas, key=lambda consulta: consulta[2], reverse=True)[:cantidad]
+        return [{"alias": alias, "sql": sql, "ms": round(duracion * 1000, 2)} for alias, sql, duracion in ordenadas]
+
+
+class PerfiladoSQLMiddleware:
+    # Opt-in con PERFILADO_SQL=1. Apagado, Django lo descarta al arrancar y no cuesta nada.
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERFILADO_SQL", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral_ms = settings.PERFILADO_SQL_UMBRAL_MS
+        self.minimo_duplicadas = settings.PERFILADO_SQL_MINIMO_DUPLICADAS
+
+    def __call__(self, request):
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(registro))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - inicio) * 1000
+        db_ms = registro.tiempo_total * 1000
+        duplicadas = registro.duplicadas(self.minimo_duplicadas)
+
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={db_ms:.1f};desc="{len(registro.consultas)} consultas"',
+                f"app;dur={total_ms - db_ms:.1f}",
+                f"total;dur={total_ms:.1f}",
+            ]
+        )
+        if duplicadas:
+            response["X-Consultas-Duplicadas"] = str(sum(fila["veces"] for fila in duplicadas))
+
+        if total_ms >= self.umbral_ms or duplicadas:
+            logger.warning(
+                json.dumps(
+                    {
+                        "metodo": request.method,
+                        "ruta": request.path,
+                        "vista": getattr(request.resolver_match, "view_name", None),
+                        "estado": response.status_code,
+                        "total_ms": round(total_ms, 1),
+                        "db_ms": round(db_ms, 1),
+                        "consultas": len(registro.consultas),
+                        "duplicadas": duplicadas,
+                        "mas_lentas": registro.mas_lentas(5),
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return response
+
+
+class WhiteNoiseAsyncMiddleware(WhiteNoiseMiddleware):
+    # WhiteNoise solo es síncrono: bajo ASGI obligaría a Django a pasar cada pedido, también
+    # los de las vistas async, por el hilo único de sync_to_async. Acá los estáticos se sirven
+    # en un hilo aparte y el resto sigue de largo sin salir del event loop.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
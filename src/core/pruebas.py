@@ -0,0 +1,16 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+
+from core import replicas
+
+
+class RunnerPruebas(DiscoverRunner):
+    # Los tests del router necesitan el alias `replica` aunque no haya DB_REPLICA_URL: se agrega
+    # como espejo de default (otra conexión a la misma base de test) antes de preparar las bases.
+    def setup_test_environment(self, **kwargs):
+        if replicas.ALIAS not in connections.settings:
+            connections.settings[replicas.ALIAS] = {
+                **connections.settings[DEFAULT_DB_ALIAS],
+                "TEST": {"MIRROR": DEFAULT_DB_ALIAS},
+            }
+        super().setup_test_environment(**kwargs)
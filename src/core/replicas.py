@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger("core.replicas")
+
+ALIAS = "replica"
+ROUTER = "core.replicas.RouterReplica"
+COOKIE = "leer_primaria"
+# Sesiones, usuarios y permisos se leen siempre de la primaria: un login recién hecho tiene
+# que verse en el request siguiente.
+APPS_REPLICADAS = {"taller", "inventario"}
+SEGUNDOS_ENTRE_CHEQUEOS = 2
+
+_leer_replica = ContextVar("leer_replica", default=False)
+_chequeo = {"hasta": 0.0, "al_dia": False}
+_lock = threading.Lock()
+
+
+@contextmanager
+def leer_de_replica(activo=True):
+    # Un ContextVar y no un thread-local: sync_to_async copia el contexto al hilo que corre
+    # el ORM, así que también vale dentro de las vistas async.
+    token = _leer_replica.set(activo)
+    try:
+        yield
+    finally:
+        _leer_replica.reset(token)
+
+
+def primaria():
+    return leer_de_replica(False)
+
+
+def retraso():
+    conexion = connections[ALIAS]
+    if conexion.vendor != "postgresql":
+        return 0.0
+    with conexion.cursor() as cursor:
+        # Sin WAL pendiente de aplicar no hay retraso, aunque la última transacción sea vieja.
+        # En un servidor que no es réplica las funciones devuelven NULL.
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        segundos = cursor.fetchone()[0]
+    return float(segundos or 0)
+
+
+def replica_al_dia():
+    # La medición se reutiliza unos segundos para no sumar una consulta a cada lectura.
+    ahora = time.monotonic()
+    with _lock:
+        if ahora < _chequeo["hasta"]:
+            return _chequeo["al_dia"]
+        _chequeo["hasta"] = ahora + SEGUNDOS_ENTRE_CHEQUEOS
+    try:
+        segundos = retraso()
+        al_dia = segundos <= settings.DB_REPLICA_MAX_LAG
+        if not al_dia:
+            logger.warning("Réplica atrasada %.1fs: se lee de la primaria.", segundos)
+    except DatabaseError:
+        logger.exception("No se pudo medir el retraso de la réplica: se lee de la primaria.")
+        al_dia = False
+    with _lock:
+        _chequeo["al_dia"] = al_dia
+    return al_dia
+
+
+def olvidar_chequeo():
+    with _lock:
+        _chequeo["hasta"] = 0.0
+
+
+class RouterReplica:
+    def db_for_read(self, model, **hints):
+        if _leer_replica.get() and model._meta.app_label in APPS_REPLICADAS and replica_al_dia():
+            return ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != ALIAS
+
+
+class LecturaPrimariaMiddleware:
+    # Después de una escritura, las lecturas de ese navegador van a la primaria durante
+    # DB_REPLICA_STICKY segundos: quien guarda una orden la ve en el listado siguiente.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if ROUTER not in settings.DATABASE_ROUTERS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        return self._marcar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._marcar(request, await self.get_response(request))
+
+    def _marcar(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(COOKIE, "1", max_age=settings.DB_REPLICA_STICKY, httponly=True, samesite="Lax")
+        return response
@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -71,8 +72,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.PerfiladoSQLMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.middleware.WhiteNoiseAsyncMiddleware",
+    "core.replicas.LecturaPrimariaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -114,7 +117,6 @@ if DATABASE_URL:
     DATABASES = {
         "default": dj_database_url.parse(
             DATABASE_URL,
-            conn_max_age=600,
             ssl_require=DB_SSL_REQUIRE,
         )
     }
@@ -131,13 +133,91 @@ elif all([DB_NAME, DB_USER, DB_PASSWORD, DB_HOST]):
         }
     }
 else:
+    # SQLite para sucursales chicas en una sola máquina. WAL deja leer mientras otro worker
+    # escribe, y las transacciones IMMEDIATE toman el lock de escritura al empezar: si hay
+    # que esperar, se espera hasta busy_timeout en lugar de fallar con `database is locked`
+    # al querer pasar de lectura a escritura a mitad de la transacción.
+    SQLITE_BUSY_TIMEOUT_MS = int(env_str("SQLITE_BUSY_TIMEOUT_MS", "20000"))
+    SQLITE_PRAGMAS = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={int(env_str('SQLITE_MMAP_MB', '256')) * 1024 * 1024}",
+        f"PRAGMA cache_size=-{int(env_str('SQLITE_CACHE_MB', '64')) * 1024}",
+        "PRAGMA temp_store=MEMORY",
+    ]
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
-            "NAME": BASE_DIR / "db.sqlite3",
+            "NAME": env_str("SQLITE_PATH") or BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                "init_command": ";".join(SQLITE_PRAGMAS),
+                "transaction_mode": "IMMEDIATE",
+                "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
         }
     }
 
+# Réplica de lectura opcional: dashboard, listados, seguimiento y comandos de reportes leen de
+# ella mientras su retraso no pase DB_REPLICA_MAX_LAG segundos.
+DB_REPLICA_URL = env_str("DB_REPLICA_URL")
+DB_REPLICA_MAX_LAG = float(env_str("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_STICKY = int(env_str("DB_REPLICA_STICKY", "15"))
+DATABASE_ROUTERS = []
+if DB_REPLICA_URL:
+    DATABASES["replica"] = dj_database_url.parse(DB_REPLICA_URL, ssl_require=DB_SSL_REQUIRE)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+    DATABASE_ROUTERS = ["core.replicas.RouterReplica"]
+# Sin réplica configurada, el runner de tests agrega una como espejo de default.
+TEST_RUNNER = "core.pruebas.RunnerPruebas"
+
+# Conexiones persistentes y con chequeo de salud en todas las ramas. Con psycopg 3 y
+# psycopg_pool instalados, PostgreSQL usa el pool de Django (que no admite CONN_MAX_AGE).
+DB_CONN_MAX_AGE = int(env_str("DB_CONN_MAX_AGE", "600"))
+DB_POOL = env_bool("DB_POOL", default=bool(find_spec("psycopg") and find_spec("psycopg_pool")))
+DB_POOL_OPCIONES = {
+    "min_size": int(env_str("DB_POOL_MIN", "2")),
+    "max_size": int(env_str("DB_POOL_MAX", "8")),
+    "timeout": float(env_str("DB_POOL_TIMEOUT", "10")),
+    "max_idle": float(env_str("DB_POOL_MAX_IDLE", "600")),
+}
+
+for db in DATABASES.values():
+    db["CONN_HEALTH_CHECKS"] = True
+    if DB_POOL and db["ENGINE"] == "django.db.backends.postgresql":
+        db["CONN_MAX_AGE"] = 0
+        db.setdefault("OPTIONS", {})["pool"] = dict(DB_POOL_OPCIONES)
+    else:
+        db["CONN_MAX_AGE"] = DB_CONN_MAX_AGE
+
+# Caché en dos niveles: un LRU por worker delante de una caché compartida entre workers.
+# Sin servidor externo se comparte por archivos (o por la base con CACHE_COMPARTIDA=db,
+# que requiere `manage.py createcachetable`); con REDIS_URL se usa redis.
+REDIS_URL = env_str("REDIS_URL")
+CACHE_COMPARTIDA = env_str("CACHE_COMPARTIDA") or ("redis" if REDIS_URL else "locmem" if DEBUG else "archivo")
+CACHE_DIR = env_str("CACHE_DIR") or "/tmp/malargue-tech-cache"
+
+CACHES_COMPARTIDAS = {
+    "redis": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL},
+    "db": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache_compartida"},
+    "archivo": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": CACHE_DIR},
+    "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "compartida"},
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.CacheDosNiveles",
+        "LOCATION": "local",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "COMPARTIDA": "compartida",
+            "MAX_LOCAL": int(env_str("CACHE_MAX_LOCAL", "1000")),
+            "TTL_LOCAL": int(env_str("CACHE_TTL_LOCAL", "5")),
+        },
+    },
+    "compartida": {**CACHES_COMPARTIDAS[CACHE_COMPARTIDA], "TIMEOUT": 300},
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -172,6 +252,29 @@ EMAIL_BACKEND = os.getenv(
 )
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "no-reply@malarguetech.local")
 SITE_BASE_URL = os.getenv("SITE_BASE_URL", "http://localhost:8000")
+# Destinatarios del aviso de stock crítico; vacío = superusuarios y dueños con email.
+ALERTAS_STOCK_EMAILS = [email.strip() for email in env_str("ALERTAS_STOCK_EMAILS", "").split(",") if email.strip()]
+
+# Perfilado SQL por request (opt-in): header Server-Timing y log de requests lentos o con N+1.
+PERFILADO_SQL = env_bool("PERFILADO_SQL", default=False)
+PERFILADO_SQL_UMBRAL_MS = int(env_str("PERFILADO_SQL_UMBRAL_MS", "500"))
+PERFILADO_SQL_MINIMO_DUPLICADAS = int(env_str("PERFILADO_SQL_MINIMO_DUPLICADAS", "3"))
+PERFILADO_SQL_LOG = env_str("PERFILADO_SQL_LOG")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "perfilado": (
+            {"class": "logging.handlers.WatchedFileHandler", "filename": PERFILADO_SQL_LOG}
+            if PERFILADO_SQL_LOG
+            else {"class": "logging.StreamHandler"}
+        ),
+    },
+    "loggers": {
+        "core.perfilado": {"handlers": ["perfilado"], "level": "WARNING", "propagate": False},
+    },
+}
 
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "dashboard"
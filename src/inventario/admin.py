@@ -1,11 +1,11 @@
 from django.contrib import admin
 
-from inventario.models import MovimientoStock, Repuesto
+from inventario.models import MovimientoStock, Repuesto, ReservaStock, SnapshotStock
 
 
 @admin.register(Repuesto)
 class RepuestoAdmin(admin.ModelAdmin):
-    list_display = ("nombre", "sku", "stock_actual", "stock_minimo", "precio_unitario", "activo")
+    list_display = ("nombre", "sku", "stock_actual", "stock_reservado", "stock_minimo", "precio_unitario", "activo")
     list_filter = ("activo",)
     search_fields = ("nombre", "sku")
 
@@ -14,4 +14,18 @@ class RepuestoAdmin(admin.ModelAdmin):
 class MovimientoStockAdmin(admin.ModelAdmin):
     list_display = ("repuesto", "tipo", "cantidad", "motivo", "creado_en")
     list_filter = ("tipo", "creado_en")
-    search_fields = ("repuesto__nombre", "repuesto__sku", "motivo")
\ No newline at end of file
+    search_fields = ("repuesto__nombre", "repuesto__sku", "motivo")
+
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ("repuesto", "orden", "cantidad", "estado", "creado_en")
+    list_filter = ("estado",)
+    search_fields = ("repuesto__nombre", "repuesto__sku", "orden__id")
+
+
+@admin.register(SnapshotStock)
+class SnapshotStockAdmin(admin.ModelAdmin):
+    list_display = ("repuesto", "fecha", "stock", "ultimo_movimiento_id")
+    list_filter = ("fecha",)
+    search_fields = ("repuesto__nombre", "repuesto__sku")
@@ -0,0 +1,68 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+
+from inventario.models import Repuesto
+from taller.notificaciones import encolar_correo
+from usuarios.models import PerfilUsuario
+
+
+CLAVE_ULTIMO_DIGEST = "alertas:stock:ultimo"
+TIMEOUT_ULTIMO_DIGEST = 7 * 86400
+
+
+def criticos():
+    # Usa el índice parcial repuesto_critico_idx: solo recorre los repuestos en alerta.
+    return Repuesto.objects.filter(activo=True, stock_critico=True).order_by("nombre", "id")
+
+
+def destinatarios():
+    if settings.ALERTAS_STOCK_EMAILS:
+        return settings.ALERTAS_STOCK_EMAILS
+    usuarios = get_user_model().objects.filter(
+        Q(is_superuser=True) | Q(perfil__rol=PerfilUsuario.Rol.DUENO),
+        is_active=True,
+    )
+    return sorted(set(usuarios.exclude(email="").values_list("email", flat=True)))
+
+
+def armar_digest(repuestos):
+    lineas = [
+        f"- {repuesto.nombre} ({repuesto.sku}): disponible {repuesto.stock_disponible}, "
+        f"reservado {repuesto.stock_reservado}, mínimo {repuesto.stock_minimo}"
+        for repuesto in repuestos
+    ]
+    asunto = f"Stock crítico: {len(repuestos)} repuesto{'s' if len(repuestos) != 1 else ''}"
+    mensaje = (
+        "Estos repuestos tienen el stock disponible (descontando reservas) en o por debajo del mínimo:\n\n"
+        + "\n".join(lineas)
+        + "\n\nMalargüe Tech"
+    )
+    return asunto, mensaje
+
+
+def enviar_digest(siempre=False):
+    # Un solo correo por destinatario y por corrida, con todos los repuestos en alerta.
+    # Si nada cambió desde el último digest no se vuelve a mandar.
+    repuestos = list(
+        criticos().only("id", "nombre", "sku", "stock_actual", "stock_reservado", "stock_minimo")
+    )
+    if not repuestos:
+        cache.delete(CLAVE_ULTIMO_DIGEST)
+        return []
+    huella = hashlib.md5(
+        repr([(r.pk, r.stock_actual, r.stock_reservado, r.stock_minimo) for r in repuestos]).encode()
+    ).hexdigest()
+    if not siempre and cache.get(CLAVE_ULTIMO_DIGEST) == huella:
+        return []
+
+    asunto, mensaje = armar_digest(repuestos)
+    enviados = destinatarios()
+    for destinatario in enviados:
+        encolar_correo(destinatario, asunto, mensaje)
+    if enviados:
+        cache.set(CLAVE_ULTIMO_DIGEST, huella, TIMEOUT_ULTIMO_DIGEST)
+    return enviados
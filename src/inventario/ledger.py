@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.db.models import Case, Exists, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.cache import invalidar_familia
+from inventario.models import MovimientoStock, Repuesto, SnapshotStock
+
+
+TAMANO_LOTE = 1000
+
+
+def cantidad_con_signo():
+    return Case(
+        When(tipo=MovimientoStock.Tipo.SALIDA, then=-F("cantidad")),
+        default=F("cantidad"),
+        output_field=IntegerField(),
+    )
+
+
+def ultimo_movimiento_id():
+    return MovimientoStock.objects.aggregate(ultimo=Max("id"))["ultimo"] or 0
+
+
+def anotar_stock_ledger(queryset, hasta_movimiento_id):
+    # Stock según el ledger = último snapshot + movimientos posteriores a ese snapshot.
+    # Las subconsultas correlacionadas usan los índices por repuesto, así que cada fila
+    # cuesta lo mismo sin importar cuántos movimientos históricos haya.
+    ultimo_snapshot = SnapshotStock.objects.filter(
+        repuesto=OuterRef("pk"),
+        ultimo_movimiento_id__lte=hasta_movimiento_id,
+    ).order_by("-ultimo_movimiento_id")
+    delta = (
+        MovimientoStock.objects.filter(
+            repuesto=OuterRef("pk"),
+            id__gt=OuterRef("base_movimiento_id"),
+            id__lte=hasta_movimiento_id,
+        )
+        .order_by()
+        .values("repuesto")
+        .annotate(total=Sum(cantidad_con_signo()))
+        .values("total")
+    )
+    return queryset.annotate(
+        base_stock=Coalesce(Subquery(ultimo_snapshot.values("stock")[:1]), Value(0), output_field=IntegerField()),
+        base_movimiento_id=Coalesce(
+            Subquery(ultimo_snapshot.values("ultimo_movimiento_id")[:1]), Value(0), output_field=IntegerField()
+        ),
+    ).annotate(
+        delta_ledger=Coalesce(Subquery(delta[:1]), Value(0), output_field=IntegerField()),
+        stock_ledger=F("base_stock") + F("delta_ledger"),
+    )
+
+
+def con_movimientos_nuevos(queryset, hasta_movimiento_id):
+    # Lo que importa para el snapshot es si hay movimientos después del último, no si suman
+    # cero: una entrada y una salida iguales igual alargan el tramo que stock_en_fecha recorre.
+    nuevos = MovimientoStock.objects.filter(
+        repuesto=OuterRef("pk"),
+        id__gt=OuterRef("base_movimiento_id"),
+        id__lte=hasta_movimiento_id,
+    )
+    return queryset.filter(Exists(nuevos))
+
+
+def stock_en_fecha(repuesto_id, fecha):
+    snapshot = (
+        SnapshotStock.objects.filter(repuesto_id=repuesto_id, fecha__lte=fecha)
+        .order_by("-ultimo_movimiento_id")
+        .values("stock", "ultimo_movimiento_id")
+        .first()
+    ) or {"stock": 0, "ultimo_movimiento_id": 0}
+    delta = MovimientoStock.objects.filter(
+        repuesto_id=repuesto_id,
+        id__gt=snapshot["ultimo_movimiento_id"],
+        creado_en__lte=fecha,
+    ).aggregate(total=Sum(cantidad_con_signo()))["total"]
+    return snapshot["stock"] + (delta or 0)
+
+
+def tomar_snapshots(lote=TAMANO_LOTE):
+    fecha = timezone.now()
+    hasta = ultimo_movimiento_id()
+    repuestos = con_movimientos_nuevos(anotar_stock_ledger(Repuesto.objects.order_by("pk"), hasta), hasta).values_list(
+        "pk", "stock_ledger"
+    )
+    pendientes = []
+    total = 0
+    for repuesto_id, stock in repuestos.iterator(chunk_size=lote):
+        pendientes.append(
+            SnapshotStock(repuesto_id=repuesto_id, fecha=fecha, stock=stock, ultimo_movimiento_id=hasta)
+        )
+        if len(pendientes) >= lote:
+            total += len(SnapshotStock.objects.bulk_create(pendientes, ignore_conflicts=True))
+            pendientes = []
+    if pendientes:
+        total += len(SnapshotStock.objects.bulk_create(pendientes, ignore_conflicts=True))
+    return total
+
+
+def _lotes_de_ids(lote):
+    ultimo = 0
+    while True:
+        ids = list(Repuesto.objects.filter(pk__gt=ultimo).order_by("pk").values_list("pk", flat=True)[:lote])
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+def reconciliar(corregir=None, lote=TAMANO_LOTE):
+    # corregir="stock" lleva stock_actual al valor del ledger; corregir="ledger" registra
+    # movimientos de ajuste para que el ledger coincida con stock_actual. Con "stock" no se
+    # toca un repuesto cuyo ledger quedó por debajo de lo reservado: bajar stock_actual ahí
+    # dejaría reservas sin respaldo, así que se devuelve con sin_corregir=True para revisarlo.
+    for ids in _lotes_de_ids(lote):
+        with transaction.atomic():
+            filas = Repuesto.objects.filter(pk__in=ids).order_by("pk")
+            if corregir:
+                filas = filas.select_for_update(of=("self",))
+            hasta = ultimo_movimiento_id()
+            desvios = [
+                {
+                    "id": pk,
+                    "sku": sku,
+                    "stock_actual": actual,
+                    "stock_ledger": ledger,
+                    "stock_reservado": reservado,
+                    "sin_corregir": corregir == "stock" and ledger < reservado,
+                }
+                for pk, sku, actual, ledger, reservado in anotar_stock_ledger(filas, hasta).values_list(
+                    "pk", "sku", "stock_actual", "stock_ledger", "stock_reservado"
+                )
+                if actual != ledger
+            ]
+            corregibles = [d for d in desvios if not d["sin_corregir"]]
+            if corregibles and corregir == "stock":
+                Repuesto.objects.bulk_update(
+                    [
+                        Repuesto(pk=d["id"], stock_actual=d["stock_ledger"], actualizado_en=timezone.now())
+                        for d in corregibles
+                    ],
+                    ["stock_actual", "actualizado_en"],
+                )
+                invalidar_familia("repuestos")
+            elif desvios and corregir == "ledger":
+                MovimientoStock.objects.bulk_create(
+                    [
+                        MovimientoStock(
+                            repuesto_id=d["id"],
+                            tipo=(
+                                MovimientoStock.Tipo.ENTRADA
+                                if d["stock_actual"] > d["stock_ledger"]
+                                else MovimientoStock.Tipo.SALIDA
+                            ),
+                            cantidad=abs(d["stock_actual"] - d["stock_ledger"]),
+                            motivo="Ajuste por conciliación",
+                        )
+                        for d in desvios
+                    ]
+                )
+        yield from desvios
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.replicas import leer_de_replica
+from inventario import alertas
+
+
+class Command(BaseCommand):
+    help = (
+        "Encola un único correo con todos los repuestos en stock crítico (disponible <= mínimo). "
+        "Pensado para correr periódicamente desde cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--siempre",
+            action="store_true",
+            help="Enviar aunque la lista no haya cambiado desde el último aviso.",
+        )
+
+    def handle(self, *args, **options):
+        # Las lecturas van a la réplica si está configurada; el correo se encola en la primaria.
+        with leer_de_replica():
+            cantidad = alertas.criticos().count()
+            enviados = alertas.enviar_digest(siempre=options["siempre"])
+        if not cantidad:
+            self.stdout.write(self.style.SUCCESS("Sin repuestos en stock crítico."))
+        elif enviados:
+            self.stdout.write(f"{cantidad} repuestos en stock crítico, aviso encolado para {', '.join(enviados)}.")
+        else:
+            self.stdout.write(f"{cantidad} repuestos en stock crítico, sin cambios o sin destinatarios: no se envía aviso.")
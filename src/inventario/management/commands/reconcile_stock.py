@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from core.replicas import leer_de_replica
+from inventario import ledger
+
+
+class Command(BaseCommand):
+    help = "Compara stock_actual con el ledger de movimientos (snapshot + movimientos) y reporta o corrige desvíos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corregir",
+            choices=["stock", "ledger"],
+            help=(
+                "stock: ajusta stock_actual al valor del ledger. "
+                "ledger: registra movimientos de ajuste para que el ledger coincida con stock_actual."
+            ),
+        )
+        parser.add_argument("--lote", type=int, default=ledger.TAMANO_LOTE, help="Repuestos por lote.")
+
+    def handle(self, *args, **options):
+        corregir = options.get("corregir")
+        total = 0
+        sin_corregir = 0
+        # Solo el reporte puede leer de la réplica: para corregir hay que bloquear filas en la primaria.
+        with leer_de_replica(not corregir):
+            for desvio in ledger.reconciliar(corregir=corregir, lote=options["lote"]):
+                total += 1
+                linea = f"{desvio['sku']}: stock_actual={desvio['stock_actual']} ledger={desvio['stock_ledger']}"
+                if desvio["sin_corregir"]:
+                    sin_corregir += 1
+                    linea += f" reservado={desvio['stock_reservado']} (sin corregir: el ledger no cubre lo reservado)"
+                    self.stdout.write(self.style.ERROR(linea))
+                else:
+                    self.stdout.write(self.style.WARNING(linea))
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Stock conciliado, sin desvíos."))
+        elif corregir:
+            self.stdout.write(self.style.SUCCESS(f"{total - sin_corregir} repuesto(s) corregidos ({corregir})."))
+            if sin_corregir:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"{sin_corregir} repuesto(s) sin corregir: el ledger queda por debajo de lo reservado. "
+                        "Revisá sus reservas o usá --corregir ledger."
+                    )
+                )
+        else:
+            self.stdout.write(self.style.WARNING(f"{total} repuesto(s) con desvío. Usá --corregir para ajustarlos."))
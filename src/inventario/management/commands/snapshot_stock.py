@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventario import ledger
+
+
+class Command(BaseCommand):
+    help = "Guarda un snapshot del stock de cada repuesto con movimientos desde el snapshot anterior."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=ledger.TAMANO_LOTE, help="Filas por lote.")
+
+    def handle(self, *args, **options):
+        total = ledger.tomar_snapshots(lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"Snapshots creados: {total}"))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0001_initial'),
+        ('taller', '0003_correopendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repuesto',
+            name='stock_reservado',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('estado', models.CharField(choices=[('ACTIVA', 'Activa'), ('CONSUMIDA', 'Consumida'), ('LIBERADA', 'Liberada')], default='ACTIVA', max_length=10)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='taller.ordenreparacion')),
+                ('repuesto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='inventario.repuesto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['orden', 'estado'], name='reserva_orden_estado_idx')],
+            },
+        ),
+    ]
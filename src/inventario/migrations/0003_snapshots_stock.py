@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def snapshot_inicial(apps, schema_editor):
+    # El stock previo al ledger no tiene movimientos: se toma como línea base
+    # para que la conciliación no reporte cada repuesto existente como desvío.
+    Repuesto = apps.get_model('inventario', 'Repuesto')
+    MovimientoStock = apps.get_model('inventario', 'MovimientoStock')
+    SnapshotStock = apps.get_model('inventario', 'SnapshotStock')
+    hasta = MovimientoStock.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    fecha = timezone.now()
+    SnapshotStock.objects.bulk_create(
+        [
+            SnapshotStock(repuesto_id=pk, fecha=fecha, stock=stock, ultimo_movimiento_id=hasta)
+            for pk, stock in Repuesto.objects.values_list('pk', 'stock_actual').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('ultimo_movimiento_id', models.BigIntegerField(default=0)),
+                ('repuesto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventario.repuesto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['repuesto', 'fecha'], name='snapshot_repuesto_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('repuesto', 'ultimo_movimiento_id'), name='snapshot_repuesto_movimiento_uniq')],
+            },
+        ),
+        migrations.RunPython(snapshot_inicial, migrations.RunPython.noop),
+    ]
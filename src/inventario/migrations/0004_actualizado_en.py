@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_snapshots_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repuesto',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(fields=['actualizado_en'], name='repuesto_actualizado_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='repuesto',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='inventario.repuesto'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['repuesto', 'id'], name='movimiento_repuesto_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientostock',
+            index=models.Index(fields=['repuesto', 'creado_en'], name='movimiento_repuesto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(fields=['nombre', 'id'], name='repuesto_nombre_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['stock_actual'], name='repuesto_activo_stock_idx'),
+        ),
+    ]
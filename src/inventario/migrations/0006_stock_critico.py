@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:03
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_indices_acceso'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='repuesto',
+            name='repuesto_activo_stock_idx',
+        ),
+        migrations.AddField(
+            model_name='repuesto',
+            name='stock_critico',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('stock_actual__lte', django.db.models.expressions.CombinedExpression(models.F('stock_minimo'), '+', models.F('stock_reservado')))), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(condition=models.Q(('activo', True), ('stock_critico', True)), fields=['nombre', 'id'], name='repuesto_critico_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar(texto):
+    # Copia de core.busqueda.normalizar al momento de la migración.
+    sin_tildes = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]', '', sin_tildes.lower())
+
+
+def completar_busqueda(apps, schema_editor):
+    Repuesto = apps.get_model('inventario', 'Repuesto')
+    pendientes = []
+    for repuesto in Repuesto.objects.only('id', 'nombre', 'sku').iterator(chunk_size=2000):
+        repuesto.nombre_busqueda = normalizar(repuesto.nombre)[:120]
+        repuesto.sku_busqueda = normalizar(repuesto.sku)[:60]
+        pendientes.append(repuesto)
+        if len(pendientes) == 2000:
+            Repuesto.objects.bulk_update(pendientes, ['nombre_busqueda', 'sku_busqueda'])
+            pendientes = []
+    Repuesto.objects.bulk_update(pendientes, ['nombre_busqueda', 'sku_busqueda'])
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_stock_critico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repuesto',
+            name='nombre_busqueda',
+            field=models.CharField(default='', editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='repuesto',
+            name='sku_busqueda',
+            field=models.CharField(default='', editable=False, max_length=60),
+        ),
+        migrations.RunPython(completar_busqueda, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['nombre_busqueda'], name='repuesto_nombre_busq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['sku_busqueda'], name='repuesto_sku_busq_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.db import migrations
+from django.db.models import F, Sum
+
+
+ESTADOS_CON_RESERVA = ('INGRESADO', 'EN_REVISION', 'PRESUPUESTADO', 'REPARANDO')
+
+
+def reservar_ordenes_abiertas(apps, schema_editor):
+    # Las órdenes abiertas cargadas antes de las reservas tienen repuestos asignados que el
+    # stock disponible no descuenta. Cada repuesto reparte lo que tiene disponible entre sus
+    # órdenes, de la más vieja a la más nueva; lo que no alcanza no se reserva (stock_reservado
+    # nunca supera stock_actual) y se informa para cargarlo a mano o reponer.
+    OrdenRepuesto = apps.get_model('taller', 'OrdenRepuesto')
+    ReservaStock = apps.get_model('inventario', 'ReservaStock')
+    Repuesto = apps.get_model('inventario', 'Repuesto')
+
+    lineas = (
+        OrdenRepuesto.objects.filter(
+            orden__estado__in=ESTADOS_CON_RESERVA,
+            orden__stock_descontado=False,
+            cantidad__gt=0,
+        )
+        .exclude(orden__reservas__isnull=False)
+        .values('repuesto_id', 'orden_id')
+        .annotate(total=Sum('cantidad'))
+        .order_by('repuesto_id', 'orden_id')
+    )
+    reservas = []
+    faltantes = []
+    repuesto = None
+    disponible = reservado = 0
+
+    def cerrar_repuesto():
+        if repuesto and reservado:
+            Repuesto.objects.filter(pk=repuesto['id']).update(stock_reservado=F('stock_reservado') + reservado)
+
+    for linea in lineas.iterator(chunk_size=2000):
+        if repuesto is None or repuesto['id'] != linea['repuesto_id']:
+            cerrar_repuesto()
+            repuesto = Repuesto.objects.values('id', 'sku', 'stock_actual', 'stock_reservado').get(pk=linea['repuesto_id'])
+            disponible = max(repuesto['stock_actual'] - repuesto['stock_reservado'], 0)
+            reservado = 0
+        cantidad = min(linea['total'], disponible)
+        if cantidad < linea['total']:
+            faltantes.append(
+                f"  Orden #{linea['orden_id']}: {repuesto['sku']} reservado {cantidad} de {linea['total']}"
+            )
+        if cantidad:
+            reservas.append(ReservaStock(orden_id=linea['orden_id'], repuesto_id=linea['repuesto_id'], cantidad=cantidad))
+            disponible -= cantidad
+            reservado += cantidad
+        if len(reservas) >= 2000:
+            ReservaStock.objects.bulk_create(reservas)
+            reservas = []
+    cerrar_repuesto()
+    ReservaStock.objects.bulk_create(reservas)
+
+    if faltantes:
+        print(f"\n  {len(faltantes)} línea(s) de órdenes abiertas sin stock suficiente para reservarlas completas:")
+        print('\n'.join(faltantes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_busqueda_normalizada'),
+        ('taller', '0007_busqueda_normalizada'),
+    ]
+
+    operations = [
+        migrations.RunPython(reservar_ordenes_abiertas, migrations.RunPython.noop),
+    ]
@@ -1,26 +1,245 @@
+from collections import defaultdict
+
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from core.busqueda import ConBusqueda
+from core.cache import invalidar_familia
+
 
+def _agrupar(items):
+    cantidades = defaultdict(int)
+    for repuesto_id, cantidad in items:
+        cantidades[repuesto_id] += cantidad
+    return cantidades
 
-class Repuesto(models.Model):
+
+class Repuesto(ConBusqueda, models.Model):
     nombre = models.CharField(max_length=120)
     sku = models.CharField(max_length=60, unique=True)
     descripcion = models.TextField(blank=True)
     stock_actual = models.PositiveIntegerField(default=0)
+    stock_reservado = models.PositiveIntegerField(default=0, editable=False)
     stock_minimo = models.PositiveIntegerField(default=0)
     precio_unitario = models.DecimalField(max_digits=12, decimal_places=2)
     activo = models.BooleanField(default=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    # Disponible (stock menos reservas) en o por debajo del mínimo. Lo calcula la base en
+    # cada escritura, incluidos los UPDATE con F() de reservas y descuentos en bloque.
+    stock_critico = models.GeneratedField(
+        expression=models.Q(stock_actual__lte=models.F("stock_minimo") + models.F("stock_reservado")),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+    nombre_busqueda = models.CharField(max_length=120, editable=False, default="")
+    sku_busqueda = models.CharField(max_length=60, editable=False, default="")
+
+    CAMPOS_BUSQUEDA = {"nombre_busqueda": "nombre", "sku_busqueda": "sku"}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["actualizado_en"], name="repuesto_actualizado_idx"),
+            models.Index(fields=["nombre", "id"], name="repuesto_nombre_id_idx"),
+            # Stock crítico del panel: el índice solo guarda los repuestos activos en alerta.
+            models.Index(
+                fields=["nombre", "id"],
+                condition=models.Q(activo=True, stock_critico=True),
+                name="repuesto_critico_idx",
+            ),
+            # El autocompletado solo ofrece repuestos activos.
+            models.Index(fields=["nombre_busqueda"], condition=models.Q(activo=True), name="repuesto_nombre_busq_idx"),
+            models.Index(fields=["sku_busqueda"], condition=models.Q(activo=True), name="repuesto_sku_busq_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.sku})"
 
-    def descontar_stock(self, cantidad):
-        if cantidad > self.stock_actual:
+    @property
+    def stock_disponible(self):
+        return max(self.stock_actual - self.stock_reservado, 0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stock_original = instance.__dict__.get("stock_actual")
+        return instance
+
+    def save(self, *args, **kwargs):
+        creado = self._state.adding
+        stock_original = None if creado else getattr(self, "_stock_original", None)
+        update_fields = kwargs.get("update_fields")
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            invalidar_familia("repuestos")
+            if update_fields is not None and "stock_actual" not in update_fields:
+                return
+            if creado:
+                diferencia, motivo = self.stock_actual, "Stock inicial"
+            elif stock_original is not None:
+                diferencia, motivo = self.stock_actual - stock_original, "Ajuste manual de stock"
+            else:
+                diferencia = 0
+            if diferencia:
+                MovimientoStock.objects.create(
+                    repuesto=self,
+                    tipo=MovimientoStock.Tipo.ENTRADA if diferencia > 0 else MovimientoStock.Tipo.SALIDA,
+                    cantidad=abs(diferencia),
+                    motivo=motivo,
+                )
+        self._stock_original = self.stock_actual
+
+    def delete(self, *args, **kwargs):
+        invalidar_familia("repuestos")
+        return super().delete(*args, **kwargs)
+
+    def stock_en(self, fecha):
+        from inventario.ledger import stock_en_fecha
+
+        return stock_en_fecha(self.pk, fecha)
+
+    def clean(self):
+        super().clean()
+        if self.stock_actual < self.stock_reservado:
+            raise ValidationError(
+                {"stock_actual": f"Hay {self.stock_reservado} unidades reservadas para órdenes abiertas."}
+            )
+
+    @transaction.atomic
+    def descontar_stock(self, cantidad, motivo=""):
+        actualizados = Repuesto.objects.filter(pk=self.pk, stock_actual__gte=F("stock_reservado") + cantidad).update(
+            stock_actual=F("stock_actual") - cantidad,
+            actualizado_en=timezone.now(),
+        )
+        if not actualizados:
+            self.refresh_from_db(fields=["stock_actual", "stock_reservado"])
             raise ValidationError(
-                f"Stock insuficiente para {self.nombre}. Disponible: {self.stock_actual}, requerido: {cantidad}."
+                f"Stock insuficiente para {self.nombre}. Disponible: {self.stock_disponible}, requerido: {cantidad}."
             )
+        MovimientoStock.objects.create(
+            repuesto=self,
+            tipo=MovimientoStock.Tipo.SALIDA,
+            cantidad=cantidad,
+            motivo=motivo,
+        )
+        invalidar_familia("repuestos")
         self.stock_actual -= cantidad
-        self.save(update_fields=["stock_actual"])
+        self._stock_original = self.stock_actual
+
+    @classmethod
+    def _bloquear(cls, ids):
+        # Bloquear siempre en orden de id evita deadlocks entre órdenes que comparten repuestos.
+        return list(
+            cls.objects.select_for_update()
+            .filter(pk__in=ids)
+            .order_by("pk")
+            .values_list("pk", "nombre", "stock_actual", "stock_reservado")
+        )
+
+    @staticmethod
+    def _error_stock(bloqueados, requeridos):
+        faltantes = [
+            f"{nombre} (disponible: {max(actual - reservado, 0)}, requerido: {requeridos[pk]})"
+            for pk, nombre, actual, reservado in bloqueados
+            if actual - reservado < requeridos[pk]
+        ]
+        return ValidationError(f"Stock insuficiente para {', '.join(faltantes) or 'uno de los repuestos'}.")
+
+    @classmethod
+    @transaction.atomic
+    def reservar_en_bloque(cls, items):
+        cantidades = _agrupar(items)
+        if not cantidades:
+            return
+        ids = sorted(cantidades)
+        bloqueados = cls._bloquear(ids)
+
+        condicion = Q()
+        for repuesto_id in ids:
+            condicion |= Q(pk=repuesto_id, stock_actual__gte=F("stock_reservado") + cantidades[repuesto_id])
+        actualizados = cls.objects.filter(condicion).update(
+            stock_reservado=Case(
+                *[When(pk=repuesto_id, then=F("stock_reservado") + cantidades[repuesto_id]) for repuesto_id in ids],
+                default=F("stock_reservado"),
+                output_field=models.PositiveIntegerField(),
+            ),
+            actualizado_en=timezone.now(),
+        )
+        if actualizados != len(ids):
+            raise cls._error_stock(bloqueados, cantidades)
+        invalidar_familia("repuestos")
+
+    @classmethod
+    def liberar_en_bloque(cls, cantidades):
+        if not cantidades:
+            return
+        ids = sorted(cantidades)
+        cls.objects.filter(pk__in=ids).update(
+            stock_reservado=Case(
+                *[
+                    When(pk=repuesto_id, stock_reservado__gte=cantidades[repuesto_id], then=F("stock_reservado") - cantidades[repuesto_id])
+                    for repuesto_id in ids
+                ],
+                default=0,
+                output_field=models.PositiveIntegerField(),
+            ),
+            actualizado_en=timezone.now(),
+        )
+        invalidar_familia("repuestos")
+
+    @classmethod
+    @transaction.atomic
+    def descontar_en_bloque(cls, items, motivo="", reservado=None):
+        items = list(items)
+        cantidades = _agrupar(items)
+        if not cantidades:
+            return []
+        reservado = reservado or {}
+
+        ids = sorted(cantidades)
+        bloqueados = cls._bloquear(ids)
+
+        # Lo ya reservado por esta misma orden no compite con las reservas de otras órdenes.
+        condicion = Q()
+        for repuesto_id in ids:
+            propio = reservado.get(repuesto_id, 0)
+            condicion |= Q(pk=repuesto_id, stock_actual__gte=F("stock_reservado") - propio + cantidades[repuesto_id])
+        actualizados = cls.objects.filter(condicion).update(
+            stock_actual=Case(
+                *[When(pk=repuesto_id, then=F("stock_actual") - cantidades[repuesto_id]) for repuesto_id in ids],
+                default=F("stock_actual"),
+                output_field=models.PositiveIntegerField(),
+            ),
+            stock_reservado=Case(
+                *[
+                    When(pk=repuesto_id, then=F("stock_reservado") - reservado[repuesto_id])
+                    for repuesto_id in ids
+                    if reservado.get(repuesto_id)
+                ],
+                default=F("stock_reservado"),
+                output_field=models.PositiveIntegerField(),
+            ),
+            actualizado_en=timezone.now(),
+        )
+        if actualizados != len(ids):
+            requeridos = {
+                repuesto_id: cantidad - reservado.get(repuesto_id, 0) for repuesto_id, cantidad in cantidades.items()
+            }
+            raise cls._error_stock(bloqueados, requeridos)
+        invalidar_familia("repuestos")
+
+        return MovimientoStock.objects.bulk_create(
+            [
+                MovimientoStock(
+                    repuesto_id=repuesto_id,
+                    tipo=MovimientoStock.Tipo.SALIDA,
+                    cantidad=cantidad,
+                    motivo=motivo,
+                )
+                for repuesto_id, cantidad in items
+            ]
+        )
 
 
 class MovimientoStock(models.Model):
@@ -28,11 +247,54 @@ class MovimientoStock(models.Model):
         ENTRADA = "ENTRADA", "Entrada"
         SALIDA = "SALIDA", "Salida"
 
-    repuesto = models.ForeignKey(Repuesto, on_delete=models.PROTECT, related_name="movimientos")
+    repuesto = models.ForeignKey(Repuesto, on_delete=models.PROTECT, related_name="movimientos", db_index=False)
     tipo = models.CharField(max_length=10, choices=Tipo.choices)
     cantidad = models.PositiveIntegerField()
     motivo = models.CharField(max_length=180, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # El ledger busca por repuesto y rango de id; stock_en_fecha, por repuesto y fecha.
+        indexes = [
+            models.Index(fields=["repuesto", "id"], name="movimiento_repuesto_id_idx"),
+            models.Index(fields=["repuesto", "creado_en"], name="movimiento_repuesto_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - {self.repuesto.sku} x{self.cantidad}"
+
+
+class ReservaStock(models.Model):
+    class Estado(models.TextChoices):
+        ACTIVA = "ACTIVA", "Activa"
+        CONSUMIDA = "CONSUMIDA", "Consumida"
+        LIBERADA = "LIBERADA", "Liberada"
+
+    repuesto = models.ForeignKey(Repuesto, on_delete=models.PROTECT, related_name="reservas")
+    orden = models.ForeignKey("taller.OrdenReparacion", on_delete=models.CASCADE, related_name="reservas")
+    cantidad = models.PositiveIntegerField()
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.ACTIVA)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["orden", "estado"], name="reserva_orden_estado_idx")]
+
+    def __str__(self):
+        return f"Reserva {self.repuesto.sku} x{self.cantidad} (Orden #{self.orden_id}, {self.get_estado_display()})"
+
+
+class SnapshotStock(models.Model):
+    repuesto = models.ForeignKey(Repuesto, on_delete=models.CASCADE, related_name="snapshots")
+    fecha = models.DateTimeField()
+    stock = models.IntegerField()
+    ultimo_movimiento_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["repuesto", "ultimo_movimiento_id"], name="snapshot_repuesto_movimiento_uniq"),
+        ]
+        indexes = [models.Index(fields=["repuesto", "fecha"], name="snapshot_repuesto_fecha_idx")]
+
     def __str__(self):
-        return f"{self.tipo} - {self.repuesto.sku} x{self.cantidad}"
\ No newline at end of file
+        return f"{self.repuesto_id} @ {self.fecha:%Y-%m-%d %H:%M}: {self.stock}"
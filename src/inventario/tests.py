@@ -1,7 +1,17 @@
+import threading
+import time
+from io import StringIO
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 
-from inventario.models import Repuesto
+from inventario import alertas, ledger
+from inventario.models import MovimientoStock, Repuesto
+from taller.models import CorreoPendiente
 
 
 class RepuestoTests(TestCase):
@@ -29,4 +39,184 @@ class RepuestoTests(TestCase):
         )
 
         with self.assertRaises(ValidationError):
-            repuesto.descontar_stock(2)
\ No newline at end of file
+            repuesto.descontar_stock(2)
+
+    def test_descuento_en_bloque_es_todo_o_nada(self):
+        ssd = Repuesto.objects.create(nombre="SSD", sku="SSD-1", stock_actual=5, precio_unitario="1.00")
+        ram = Repuesto.objects.create(nombre="RAM", sku="RAM-1", stock_actual=1, precio_unitario="1.00")
+
+        with self.assertRaisesMessage(ValidationError, "RAM"):
+            Repuesto.descontar_en_bloque([(ssd.pk, 2), (ram.pk, 2)], motivo="Orden #1")
+
+        ssd.refresh_from_db()
+        self.assertEqual(ssd.stock_actual, 5)
+        self.assertFalse(MovimientoStock.objects.filter(tipo=MovimientoStock.Tipo.SALIDA).exists())
+
+    def test_descuento_en_bloque_escribe_movimientos_en_un_insert(self):
+        ssd = Repuesto.objects.create(nombre="SSD", sku="SSD-1", stock_actual=5, precio_unitario="1.00")
+        ram = Repuesto.objects.create(nombre="RAM", sku="RAM-1", stock_actual=4, precio_unitario="1.00")
+
+        with self.assertNumQueries(5):
+            # savepoint, bloqueo, UPDATE condicional, INSERT de movimientos, release.
+            Repuesto.descontar_en_bloque([(ssd.pk, 1), (ram.pk, 2), (ssd.pk, 1)], motivo="Orden #2")
+
+        ssd.refresh_from_db()
+        ram.refresh_from_db()
+        self.assertEqual((ssd.stock_actual, ram.stock_actual), (3, 2))
+        self.assertEqual(MovimientoStock.objects.filter(tipo=MovimientoStock.Tipo.SALIDA).count(), 3)
+
+
+class LedgerStockTests(TestCase):
+    def setUp(self):
+        self.repuesto = Repuesto.objects.create(nombre="Fuente 600W", sku="PSU-600", stock_actual=10, precio_unitario="1.00")
+
+    def test_alta_y_descuentos_quedan_en_el_ledger(self):
+        self.repuesto.descontar_stock(3, motivo="Orden #1")
+        self.repuesto.stock_actual = 12
+        self.repuesto.save()
+
+        movimientos = list(self.repuesto.movimientos.order_by("id").values_list("tipo", "cantidad"))
+        self.assertEqual(
+            movimientos,
+            [(MovimientoStock.Tipo.ENTRADA, 10), (MovimientoStock.Tipo.SALIDA, 3), (MovimientoStock.Tipo.ENTRADA, 5)],
+        )
+        self.assertEqual(list(ledger.reconciliar()), [])
+
+    def test_stock_en_fecha_combina_snapshot_y_movimientos(self):
+        antes = timezone.now()
+        self.repuesto.descontar_stock(4)
+        self.assertEqual(ledger.tomar_snapshots(), 1)
+        self.assertEqual(ledger.tomar_snapshots(), 0)
+        self.repuesto.descontar_stock(1)
+
+        self.assertEqual(self.repuesto.stock_en(antes), 10)
+        self.assertEqual(self.repuesto.stock_en(timezone.now()), 5)
+        self.assertEqual(self.repuesto.snapshots.get().stock, 6)
+
+    def test_snapshot_aunque_los_movimientos_sumen_cero(self):
+        ledger.tomar_snapshots()
+        self.repuesto.stock_actual = 15
+        self.repuesto.save()
+        self.repuesto.descontar_stock(5)
+
+        self.assertEqual(ledger.tomar_snapshots(), 1)
+        snapshot = self.repuesto.snapshots.order_by("-ultimo_movimiento_id").first()
+        self.assertEqual((snapshot.stock, snapshot.ultimo_movimiento_id), (10, ledger.ultimo_movimiento_id()))
+
+    def test_reconcile_stock_detecta_y_corrige_desvios(self):
+        Repuesto.objects.filter(pk=self.repuesto.pk).update(stock_actual=7)
+        salida = StringIO()
+
+        call_command("reconcile_stock", stdout=salida)
+        self.assertIn("PSU-600: stock_actual=7 ledger=10", salida.getvalue())
+
+        call_command("reconcile_stock", corregir="ledger", stdout=StringIO())
+        self.repuesto.refresh_from_db()
+        self.assertEqual(self.repuesto.stock_actual, 7)
+        self.assertEqual(list(ledger.reconciliar()), [])
+
+        Repuesto.objects.filter(pk=self.repuesto.pk).update(stock_actual=20)
+        call_command("reconcile_stock", corregir="stock", stdout=StringIO())
+        self.repuesto.refresh_from_db()
+        self.assertEqual(self.repuesto.stock_actual, 7)
+
+    def test_corregir_stock_no_baja_de_lo_reservado(self):
+        Repuesto.objects.filter(pk=self.repuesto.pk).update(stock_actual=15, stock_reservado=12)
+        salida = StringIO()
+
+        call_command("reconcile_stock", corregir="stock", stdout=salida)
+        self.repuesto.refresh_from_db()
+        self.assertEqual((self.repuesto.stock_actual, self.repuesto.stock_reservado), (15, 12))
+        self.assertIn("PSU-600: stock_actual=15 ledger=10 reservado=12 (sin corregir", salida.getvalue())
+        self.assertIn("1 repuesto(s) sin corregir", salida.getvalue())
+
+        Repuesto.objects.filter(pk=self.repuesto.pk).update(stock_reservado=4)
+        call_command("reconcile_stock", corregir="stock", stdout=StringIO())
+        self.repuesto.refresh_from_db()
+        self.assertEqual(self.repuesto.stock_actual, 10)
+
+
+class DescuentoConcurrenteTests(TransactionTestCase):
+    HILOS = 12
+    STOCK_INICIAL = 5
+
+    def test_hilos_en_paralelo_no_pierden_descuentos(self):
+        repuesto = Repuesto.objects.create(
+            nombre="Pasta térmica",
+            sku="PASTA-1",
+            stock_actual=self.STOCK_INICIAL,
+            precio_unitario="1.00",
+        )
+        resultados = []
+        barrera = threading.Barrier(self.HILOS)
+
+        def descontar():
+            try:
+                barrera.wait()
+                for _intento in range(200):
+                    try:
+                        Repuesto.descontar_en_bloque([(repuesto.pk, 1)], motivo="Prueba")
+                        resultados.append("ok")
+                        return
+                    except ValidationError:
+                        resultados.append("sin_stock")
+                        return
+                    except OperationalError:
+                        # SQLite devuelve "database is locked" en lugar de esperar: reintentar.
+                        time.sleep(0.005)
+                resultados.append("bloqueado")
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=descontar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        repuesto.refresh_from_db()
+        self.assertNotIn("bloqueado", resultados)
+        self.assertEqual(resultados.count("ok"), self.STOCK_INICIAL)
+        self.assertEqual(resultados.count("sin_stock"), self.HILOS - self.STOCK_INICIAL)
+        self.assertEqual(repuesto.stock_actual, 0)
+        self.assertEqual(
+            MovimientoStock.objects.filter(repuesto=repuesto, tipo=MovimientoStock.Tipo.SALIDA).count(),
+            self.STOCK_INICIAL,
+        )
+
+
+class StockCriticoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.repuesto = Repuesto.objects.create(
+            nombre="Batería HP", sku="BAT-HP", stock_actual=5, stock_minimo=2, precio_unitario="68000.00"
+        )
+        Repuesto.objects.create(nombre="Cooler", sku="FAN-1", stock_actual=10, stock_minimo=2, precio_unitario="9000.00")
+
+    def test_flag_sigue_a_reservas_y_descuentos_en_bloque(self):
+        self.assertFalse(alertas.criticos().exists())
+
+        Repuesto.reservar_en_bloque([(self.repuesto.pk, 3)])
+        self.assertEqual(list(alertas.criticos().values_list("sku", flat=True)), ["BAT-HP"])
+
+        Repuesto.liberar_en_bloque({self.repuesto.pk: 3})
+        self.assertFalse(alertas.criticos().exists())
+
+        self.repuesto.descontar_stock(3)
+        self.assertTrue(alertas.criticos().filter(pk=self.repuesto.pk).exists())
+
+    @override_settings(ALERTAS_STOCK_EMAILS=["dueno@taller.local"])
+    def test_digest_unico_por_corrida_y_sin_repetir(self):
+        Repuesto.objects.filter(sku="FAN-1").update(stock_actual=1)
+        self.repuesto.descontar_stock(4)
+
+        call_command("alertar_stock", stdout=StringIO())
+        call_command("alertar_stock", stdout=StringIO())
+
+        correo = CorreoPendiente.objects.get()
+        self.assertEqual(correo.destinatario, "dueno@taller.local")
+        self.assertIn("BAT-HP", correo.mensaje)
+        self.assertIn("FAN-1", correo.mensaje)
+
+        call_command("alertar_stock", siempre=True, stdout=StringIO())
+        self.assertEqual(CorreoPendiente.objects.count(), 2)
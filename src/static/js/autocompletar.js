@@ -0,0 +1,92 @@
+(function () {
+  const DELAY_MS = 200;
+  const MIN_LENGTH = 2;
+
+  const fillOptions = (select, results, keepSelection) => {
+    const selected = keepSelection ? select.querySelector('option:checked') : null;
+    const keep = selected && selected.value ? selected.cloneNode(true) : null;
+    select.innerHTML = '';
+    select.add(new Option(results.length ? 'Seleccionar...' : 'Sin resultados', ''));
+    if (keep) {
+      select.add(keep);
+    }
+    results.forEach((item) => {
+      if (keep && String(item.id) === keep.value) {
+        return;
+      }
+      const label = item.detalle ? `${item.texto} - ${item.detalle}` : item.texto;
+      select.add(new Option(label, item.id));
+    });
+    if (keep) {
+      select.value = keep.value;
+    }
+  };
+
+  const activate = (select) => {
+    if (select.dataset.autocompletarActivo) {
+      return;
+    }
+    select.dataset.autocompletarActivo = '1';
+
+    const input = document.createElement('input');
+    input.type = 'search';
+    input.className = 'form-control form-control-sm mb-1';
+    input.placeholder = 'Buscar...';
+    input.autocomplete = 'off';
+    input.setAttribute('aria-label', 'Buscar');
+    select.parentNode.insertBefore(input, select);
+
+    let timer = null;
+    let controller = null;
+
+    const search = (text) => {
+      if (controller) {
+        controller.abort();
+      }
+      controller = new AbortController();
+      const url = new URL(select.dataset.autocompletar, window.location.origin);
+      url.searchParams.set('q', text);
+      fetch(url, { signal: controller.signal, headers: { Accept: 'application/json' } })
+        .then((response) => (response.ok ? response.json() : { resultados: [] }))
+        .then((data) => {
+          // Sin texto se conserva lo elegido; al escribir se propone el primer resultado.
+          fillOptions(select, data.resultados, !text);
+          if (text && data.resultados.length) {
+            select.value = String(data.resultados[0].id);
+          }
+        })
+        .catch((error) => {
+          if (error.name !== 'AbortError') {
+            throw error;
+          }
+        });
+    };
+
+    input.addEventListener('input', function () {
+      const text = input.value.trim();
+      clearTimeout(timer);
+      if (text && text.length < MIN_LENGTH) {
+        return;
+      }
+      timer = setTimeout(() => search(text), DELAY_MS);
+    });
+    input.addEventListener('keydown', function (event) {
+      if (event.key === 'Enter') {
+        event.preventDefault();
+      }
+    });
+    select.addEventListener('focus', function () {
+      if (select.options.length <= 2 && !input.value) {
+        search('');
+      }
+    }, { once: true });
+  };
+
+  window.activarAutocompletar = function (root) {
+    (root || document).querySelectorAll('select[data-autocompletar]').forEach(activate);
+  };
+
+  document.addEventListener('DOMContentLoaded', function () {
+    window.activarAutocompletar(document);
+  });
+})();
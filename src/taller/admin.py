@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
+from taller.models import Cliente, CorreoPendiente, Equipo, EstadisticaEstado, OrdenReparacion, OrdenRepuesto
 
 
 @admin.register(Cliente)
@@ -17,8 +17,14 @@ class EquipoAdmin(admin.ModelAdmin):
 
 
 class OrdenRepuestoInline(admin.TabularInline):
+    # Solo lectura: las líneas se agregan desde la orden, que reserva el stock.
     model = OrdenRepuesto
-    extra = 1
+    extra = 0
+    can_delete = False
+    readonly_fields = ("repuesto", "cantidad", "precio_unitario")
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(OrdenReparacion)
@@ -29,17 +35,40 @@ class OrdenReparacionAdmin(admin.ModelAdmin):
         "tecnico_asignado",
         "estado",
         "precio_estimado",
+        "total",
         "stock_descontado",
         "creado_en",
     )
     list_filter = ("estado", "stock_descontado", "creado_en")
     search_fields = ("equipo__marca", "equipo__modelo", "equipo__cliente__nombre", "problema_reportado")
     inlines = [OrdenRepuestoInline]
-    readonly_fields = ("qr_token", "qr_imagen")
+    readonly_fields = ("qr_token", "qr_imagen", "stock_descontado")
 
 
 @admin.register(OrdenRepuesto)
 class OrdenRepuestoAdmin(admin.ModelAdmin):
     list_display = ("orden", "repuesto", "cantidad", "precio_unitario")
     list_filter = ("repuesto",)
-    search_fields = ("orden__id", "repuesto__nombre", "repuesto__sku")
\ No newline at end of file
+    search_fields = ("orden__id", "repuesto__nombre", "repuesto__sku")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EstadisticaEstado)
+class EstadisticaEstadoAdmin(admin.ModelAdmin):
+    list_display = ("estado", "cantidad", "monto", "actualizado_en")
+    readonly_fields = ("estado", "cantidad", "monto", "actualizado_en")
+
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    list_display = ("asunto", "destinatario", "estado", "intentos", "proximo_intento", "enviado_en")
+    list_filter = ("estado",)
+    search_fields = ("destinatario", "asunto")
@@ -6,4 +6,5 @@ class TallerConfig(AppConfig):
     name = "taller"
 
     def ready(self):
+        import core.conexiones
         import taller.signals
\ No newline at end of file
@@ -0,0 +1,99 @@
+import json
+import re
+
+from django.db import connection
+from django.test import Client
+
+from taller import benchmark
+
+
+UMBRAL_FILAS = 1000
+SENTENCIAS_AUDITADAS = ("SELECT", "UPDATE", "DELETE")
+MOTORES = ("postgresql", "sqlite")
+
+
+class RegistroSQL:
+    # A diferencia del perfilado, guarda los parámetros para poder repetir el EXPLAIN.
+    def __init__(self):
+        self.consultas = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(SENTENCIAS_AUDITADAS):
+            self.consultas.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+def explicar(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            return plan if isinstance(plan, list) else json.loads(plan)
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [fila[-1] for fila in cursor.fetchall()]
+    return None
+
+
+def _nodos_postgres(nodo):
+    yield nodo
+    for hijo in nodo.get("Plans", []):
+        yield from _nodos_postgres(hijo)
+
+
+def hallazgos(plan):
+    # Devuelve (tabla, tipo, detalle) por cada recorrido completo u ordenamiento sin índice.
+    if connection.vendor == "postgresql":
+        for nodo in _nodos_postgres(plan[0]["Plan"]):
+            if nodo["Node Type"] == "Seq Scan":
+                yield nodo["Relation Name"], "scan", f"Seq Scan on {nodo['Relation Name']}"
+            elif nodo["Node Type"] in ("Sort", "Incremental Sort"):
+                yield None, "sort", f"{nodo['Node Type']} by {', '.join(nodo.get('Sort Key', []))}"
+        return
+    for detalle in plan or []:
+        escaneo = re.match(r"SCAN (?:TABLE )?(\w+)(.*)", detalle)
+        if escaneo and "INDEX" not in escaneo.group(2):
+            yield escaneo.group(1), "scan", detalle
+        elif detalle.startswith("USE TEMP B-TREE FOR ORDER BY"):
+            yield None, "sort", detalle
+
+
+def filas_por_tabla():
+    tablas = connection.introspection.table_names()
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r'")
+            estimadas = dict(cursor.fetchall())
+            return {tabla: max(estimadas.get(tabla, 0), 0) for tabla in tablas}
+        filas = {}
+        for tabla in tablas:
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(tabla)}")
+            filas[tabla] = cursor.fetchone()[0]
+        return filas
+
+
+def auditar(datos, umbral_filas=UMBRAL_FILAS):
+    staff = Client()
+    staff.force_login(datos["usuario"])
+    anonimo = Client()
+
+    # Con estadísticas frescas el planificador elige como lo haría en producción.
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    filas = filas_por_tabla()
+
+    resultado = {}
+    for escenario in benchmark.ESCENARIOS:
+        registro = RegistroSQL()
+        with connection.execute_wrapper(registro):
+            benchmark._pedir(anonimo if escenario.get("anonimo") else staff, escenario, datos)
+
+        problemas = []
+        for sql, params in registro.consultas.items():
+            for tabla, tipo, detalle in hallazgos(explicar(sql, params)):
+                # Recorrer tablas chicas es más barato que usar un índice: no se reporta.
+                if tipo == "scan" and filas.get(tabla, 0) < umbral_filas:
+                    continue
+                problemas.append({"tipo": tipo, "tabla": tabla, "filas": filas.get(tabla), "detalle": detalle, "sql": sql})
+        resultado[escenario["nombre"]] = {"consultas": len(registro.consultas), "hallazgos": problemas}
+    return resultado
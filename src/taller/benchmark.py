@@ -0,0 +1,206 @@
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from inventario.models import Repuesto
+from taller import sinteticos
+from taller.models import OrdenReparacion
+
+
+LOTE = 1000
+
+# Consultas máximas por vista. Los endpoints de borrado y la carga de demo quedan afuera
+# porque destruyen el dataset que miden los demás.
+ESCENARIOS = [
+    {"nombre": "home", "url": lambda d: reverse("home"), "anonimo": True, "presupuesto": 0},
+    {"nombre": "health", "url": lambda d: reverse("health"), "anonimo": True, "presupuesto": 0},
+    {"nombre": "estado_cache", "url": lambda d: reverse("estado_cache"), "presupuesto": 2},
+    {"nombre": "dashboard", "url": lambda d: reverse("dashboard"), "presupuesto": 5},
+    {"nombre": "clientes_list", "url": lambda d: reverse("clientes_list"), "presupuesto": 4},
+    {"nombre": "cliente_create", "url": lambda d: reverse("cliente_create"), "presupuesto": 2},
+    {"nombre": "cliente_edit", "url": lambda d: reverse("cliente_edit", args=[d["cliente"]]), "presupuesto": 3},
+    {"nombre": "equipos_list", "url": lambda d: reverse("equipos_list"), "presupuesto": 4},
+    {"nombre": "equipo_create", "url": lambda d: reverse("equipo_create"), "presupuesto": 2},
+    {"nombre": "equipo_edit", "url": lambda d: reverse("equipo_edit", args=[d["equipo"]]), "presupuesto": 4},
+    {"nombre": "repuestos_list", "url": lambda d: reverse("repuestos_list"), "presupuesto": 4},
+    {"nombre": "repuesto_create", "url": lambda d: reverse("repuesto_create"), "presupuesto": 2},
+    {"nombre": "repuesto_edit", "url": lambda d: reverse("repuesto_edit", args=[d["repuesto"]]), "presupuesto": 3},
+    {"nombre": "ordenes_list", "url": lambda d: reverse("ordenes_list"), "presupuesto": 4},
+    {"nombre": "orden_create", "url": lambda d: reverse("orden_create"), "presupuesto": 2},
+    {"nombre": "orden_create_form", "url": lambda d: reverse("orden_create_form"), "presupuesto": 4},
+    {
+        "nombre": "orden_create_form_post",
+        "url": lambda d: reverse("orden_create_form"),
+        "metodo": "post",
+        "datos": lambda d: {
+            "equipo": d["equipo"],
+            "problema_reportado": "No enciende (benchmark)",
+            "precio_estimado": "1000",
+            "estado": OrdenReparacion.Estado.INGRESADO,
+            "repuestos-TOTAL_FORMS": "1",
+            "repuestos-INITIAL_FORMS": "0",
+            "repuestos-MIN_NUM_FORMS": "0",
+            "repuestos-MAX_NUM_FORMS": "1000",
+            "repuestos-0-repuesto": d["repuesto"],
+            "repuestos-0-cantidad": "1",
+            "repuestos-0-precio_unitario": "10",
+        },
+        "estado": 302,
+        "presupuesto": 23,
+    },
+    {"nombre": "orden_detalle", "url": lambda d: reverse("orden_detalle", args=[d["orden"]]), "presupuesto": 6},
+    {"nombre": "orden_edit", "url": lambda d: reverse("orden_edit", args=[d["orden"]]), "presupuesto": 5},
+    {
+        "nombre": "buscar_clientes",
+        "url": lambda d: f"{reverse('buscar_clientes')}?q={d['texto_cliente']}",
+        "presupuesto": 3,
+    },
+    {"nombre": "buscar_equipos", "url": lambda d: f"{reverse('buscar_equipos')}?q={d['texto_equipo']}", "presupuesto": 3},
+    {
+        "nombre": "buscar_repuestos",
+        "url": lambda d: f"{reverse('buscar_repuestos')}?q={d['texto_repuesto']}",
+        "presupuesto": 3,
+    },
+    {
+        "nombre": "seguimiento_publico",
+        "url": lambda d: reverse("seguimiento_publico", args=[d["qr_token"]]),
+        "anonimo": True,
+        "presupuesto": 2,
+    },
+    {
+        "nombre": "orden_qr",
+        "url": lambda d: reverse("orden_qr", args=[d["qr_token"], "svg"]),
+        "anonimo": True,
+        "presupuesto": 1,
+    },
+]
+
+
+def generar_dataset(escala=1, semilla=0):
+    usuario = get_user_model().objects.create_superuser("benchmark", "benchmark@bench.local", "benchmark")
+    # Sobre una base ya sembrada la tanda se agrega con su propia numeración; las filas que
+    # se miden se eligen entre las de esta tanda.
+    ultima_orden = OrdenReparacion.objects.aggregate(ultima=Max("pk"))["ultima"] or 0
+    ultimo_repuesto = Repuesto.objects.aggregate(ultimo=Max("pk"))["ultimo"] or 0
+    sinteticos.generar(escala=escala, semilla=semilla, tecnicos=[usuario], lote=LOTE)
+    # El alta de órdenes necesita stock libre para reservar en cada iteración.
+    repuesto = Repuesto.objects.filter(pk__gt=ultimo_repuesto, sku__startswith=sinteticos.PREFIJO_SKU).latest("pk")
+    Repuesto.objects.filter(pk=repuesto.pk).update(stock_actual=10**6)
+    orden = OrdenReparacion.objects.filter(pk__gt=ultima_orden, repuestos__isnull=False).latest("pk")
+    return {
+        "usuario": usuario,
+        "cliente": orden.equipo.cliente_id,
+        "equipo": orden.equipo_id,
+        "repuesto": repuesto.pk,
+        "orden": orden.pk,
+        "qr_token": orden.qr_token,
+        # Prefijos como los que tipea alguien en los buscadores.
+        "texto_cliente": orden.equipo.cliente.nombre_busqueda[:4],
+        "texto_equipo": orden.equipo.serie_busqueda[:5],
+        "texto_repuesto": repuesto.nombre_busqueda[:4],
+    }
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _pedir(cliente, escenario, datos):
+    metodo = getattr(cliente, escenario.get("metodo", "get"))
+    if "datos" in escenario:
+        return metodo(escenario["url"](datos), escenario["datos"](datos))
+    return metodo(escenario["url"](datos))
+
+
+def medir(datos, iteraciones=20, con_cache=False):
+    staff = Client()
+    staff.force_login(datos["usuario"])
+    anonimo = Client()
+
+    resultados = {}
+    for escenario in ESCENARIOS:
+        cliente = anonimo if escenario.get("anonimo") else staff
+        esperado = escenario.get("estado", 200)
+
+        # Una pasada con tracemalloc para consultas y memoria; las demás solo miden tiempo.
+        if not con_cache:
+            cache.clear()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as consultas:
+            response = _pedir(cliente, escenario, datos)
+        memoria_pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        # captured_queries se lee del log de la conexión, que el próximo request reinicia.
+        cantidad_consultas = len(consultas)
+
+        tiempos = []
+        errores = int(response.status_code != esperado)
+        for _ in range(iteraciones):
+            if not con_cache:
+                cache.clear()
+            inicio = time.perf_counter()
+            response = _pedir(cliente, escenario, datos)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            errores += int(response.status_code != esperado)
+
+        resultados[escenario["nombre"]] = {
+            "consultas": cantidad_consultas,
+            "presupuesto": escenario["presupuesto"],
+            "p50_ms": round(percentil(tiempos, 50), 2),
+            "p95_ms": round(percentil(tiempos, 95), 2),
+            "p99_ms": round(percentil(tiempos, 99), 2),
+            "max_ms": round(max(tiempos), 2),
+            "memoria_pico_kb": round(memoria_pico / 1024, 1),
+            "errores": errores,
+        }
+    return resultados
+
+
+def reporte(escala, iteraciones, resultados):
+    return {
+        "fecha": datetime.now(dt_timezone.utc).isoformat(),
+        "motor": connection.vendor,
+        "escala": escala,
+        "iteraciones": iteraciones,
+        "escenarios": resultados,
+    }
+
+
+def excedidos(resultados):
+    return {
+        nombre: fila
+        for nombre, fila in resultados.items()
+        if fila["consultas"] > fila["presupuesto"] or fila["errores"]
+    }
+
+
+def regresiones(actual, anterior, tolerancia):
+    # Compara p95 contra una corrida anterior; tolerancia en porcentaje.
+    filas = []
+    for nombre, fila in actual["escenarios"].items():
+        previa = anterior.get("escenarios", {}).get(nombre)
+        if not previa or not previa["p95_ms"]:
+            continue
+        variacion = (fila["p95_ms"] - previa["p95_ms"]) / previa["p95_ms"] * 100
+        if variacion > tolerancia or fila["consultas"] > previa["consultas"]:
+            filas.append(
+                {
+                    "nombre": nombre,
+                    "p95_ms": fila["p95_ms"],
+                    "p95_ms_anterior": previa["p95_ms"],
+                    "variacion": round(variacion, 1),
+                    "consultas": fila["consultas"],
+                    "consultas_anterior": previa["consultas"],
+                }
+            )
+    return filas
@@ -0,0 +1,495 @@
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils.crypto import get_random_string
+
+from core.cache import invalidar_familia
+from inventario.models import MovimientoStock, Repuesto, ReservaStock, SnapshotStock
+from taller import estadisticas, seguimiento, sinteticos
+from taller.benchmark import percentil
+from taller.models import CorreoPendiente, Equipo, OrdenReparacion, OrdenRepuesto
+
+
+TIMEOUT = 30
+PREFIJO_USUARIO = "loadtest_"
+CUBETAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+MEZCLA = {"tecnico": 4, "dueno": 1, "cliente": 15}
+# Tablas donde la carga inserta filas; limpiar() borra todo lo posterior a la marca de preparar().
+TABLAS_NUEVAS = {
+    "ordenes": OrdenReparacion,
+    "lineas": OrdenRepuesto,
+    "reservas": ReservaStock,
+    "movimientos": MovimientoStock,
+    "correos": CorreoPendiente,
+}
+CAMPOS_ORDEN = ("estado", "precio_estimado", "diagnostico", "tecnico_asignado_id", "stock_descontado", "actualizado_en")
+
+# Recorrido feliz de una orden; cada técnico lo avanza de a un paso.
+SIGUIENTE_ESTADO = {
+    OrdenReparacion.Estado.INGRESADO: OrdenReparacion.Estado.EN_REVISION,
+    OrdenReparacion.Estado.EN_REVISION: OrdenReparacion.Estado.PRESUPUESTADO,
+    OrdenReparacion.Estado.PRESUPUESTADO: OrdenReparacion.Estado.REPARANDO,
+    OrdenReparacion.Estado.REPARANDO: OrdenReparacion.Estado.REPARADO,
+    OrdenReparacion.Estado.REPARADO: OrdenReparacion.Estado.ENTREGADO,
+}
+ESTADOS_CON_REPUESTOS = (
+    OrdenReparacion.Estado.INGRESADO,
+    OrdenReparacion.Estado.EN_REVISION,
+    OrdenReparacion.Estado.PRESUPUESTADO,
+    OrdenReparacion.Estado.REPARANDO,
+)
+
+
+class ErrorHTTP(Exception):
+    pass
+
+
+class ConexionHTTP:
+    # Cliente HTTP/1.1 mínimo con keep-alive: alcanza para hablar con runserver y
+    # gunicorn sin agregar dependencias.
+    def __init__(self, host, puerto, timeout=TIMEOUT):
+        self.host = host
+        self.puerto = puerto
+        self.timeout = timeout
+        self.lector = None
+        self.escritor = None
+
+    async def cerrar(self):
+        if self.escritor:
+            self.escritor.close()
+            try:
+                await self.escritor.wait_closed()
+            except OSError:
+                pass
+        self.lector = self.escritor = None
+
+    async def pedir(self, metodo, ruta, cabeceras=None, cuerpo=b""):
+        reutilizada = self.escritor is not None
+        try:
+            return await asyncio.wait_for(self._pedir(metodo, ruta, cabeceras or {}, cuerpo), self.timeout)
+        except (ErrorHTTP, ConnectionError, asyncio.IncompleteReadError):
+            await self.cerrar()
+            if not reutilizada:
+                raise
+        # El servidor pudo cerrar la conexión ociosa: se reintenta una vez con una nueva.
+        return await asyncio.wait_for(self._pedir(metodo, ruta, cabeceras or {}, cuerpo), self.timeout)
+
+    async def _pedir(self, metodo, ruta, cabeceras, cuerpo):
+        if self.escritor is None:
+            self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+        lineas = [f"{metodo} {ruta} HTTP/1.1", f"Host: {self.host}:{self.puerto}", "Connection: keep-alive"]
+        lineas += [f"{nombre}: {valor}" for nombre, valor in cabeceras.items()]
+        if cuerpo or metodo == "POST":
+            lineas.append(f"Content-Length: {len(cuerpo)}")
+        self.escritor.write(("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1") + cuerpo)
+        await self.escritor.drain()
+
+        linea_estado = await self.lector.readline()
+        if not linea_estado:
+            raise ErrorHTTP("El servidor cerró la conexión.")
+        estado = int(linea_estado.split()[1])
+        respuesta = defaultdict(list)
+        while True:
+            linea = (await self.lector.readline()).decode("latin-1").strip()
+            if not linea:
+                break
+            nombre, _, valor = linea.partition(":")
+            respuesta[nombre.strip().lower()].append(valor.strip())
+
+        if metodo == "HEAD" or estado in (204, 304):
+            contenido = b""
+        elif "chunked" in respuesta.get("transfer-encoding", [""])[0].lower():
+            contenido = await self._leer_chunks()
+        elif "content-length" in respuesta:
+            contenido = await self.lector.readexactly(int(respuesta["content-length"][0]))
+        else:
+            contenido = await self.lector.read()
+            respuesta["connection"] = ["close"]
+        if respuesta.get("connection", [""])[0].lower() == "close":
+            await self.cerrar()
+        return estado, respuesta, contenido
+
+    async def _leer_chunks(self):
+        partes = []
+        while True:
+            tamano = int((await self.lector.readline()).split(b";")[0], 16)
+            if not tamano:
+                await self.lector.readline()
+                return b"".join(partes)
+            partes.append(await self.lector.readexactly(tamano))
+            await self.lector.readline()
+
+
+class Estadisticas:
+    def __init__(self):
+        self.tiempos = defaultdict(list)
+        self.resultados = defaultdict(Counter)
+        self.estados = defaultdict(Counter)
+
+    def registrar(self, operacion, resultado, estado, ms):
+        self.tiempos[operacion].append(ms)
+        self.resultados[operacion][resultado] += 1
+        self.estados[operacion][estado] += 1
+
+    def reporte(self, duracion):
+        todos = [ms for tiempos in self.tiempos.values() for ms in tiempos]
+        operaciones = {nombre: self._fila(nombre, duracion) for nombre in sorted(self.tiempos)}
+        total = sum(fila["pedidos"] for fila in operaciones.values())
+        errores = sum(fila["errores"] for fila in operaciones.values())
+        return {
+            "duracion_s": round(duracion, 2),
+            "pedidos": total,
+            "rps": round(total / duracion, 1) if duracion else 0,
+            "tasa_error": round(errores / total * 100, 2) if total else 0,
+            "histograma_ms": histograma(todos),
+            "operaciones": operaciones,
+        }
+
+    def _fila(self, nombre, duracion):
+        tiempos = self.tiempos[nombre]
+        resultados = self.resultados[nombre]
+        return {
+            "pedidos": len(tiempos),
+            "rps": round(len(tiempos) / duracion, 1) if duracion else 0,
+            "ok": resultados["ok"],
+            "rechazados": resultados["rechazado"],
+            "errores": resultados["error"],
+            "tasa_error": round(resultados["error"] / len(tiempos) * 100, 2),
+            "p50_ms": round(percentil(tiempos, 50), 2),
+            "p95_ms": round(percentil(tiempos, 95), 2),
+            "p99_ms": round(percentil(tiempos, 99), 2),
+            "max_ms": round(max(tiempos), 2),
+            "estados": {str(estado): cantidad for estado, cantidad in sorted(self.estados[nombre].items(), key=str)},
+            "histograma_ms": histograma(tiempos),
+        }
+
+
+def histograma(tiempos):
+    cubetas = Counter()
+    for ms in tiempos:
+        limite = next((tope for tope in CUBETAS_MS if ms <= tope), None)
+        cubetas[f"<={limite}" if limite else f">{CUBETAS_MS[-1]}"] += 1
+    etiquetas = [f"<={tope}" for tope in CUBETAS_MS] + [f">{CUBETAS_MS[-1]}"]
+    return {etiqueta: cubetas[etiqueta] for etiqueta in etiquetas}
+
+
+def repartir_roles(usuarios, mezcla):
+    # Reparto proporcional por mayor resto, con al menos un usuario por rol si alcanza.
+    activos = {rol: peso for rol, peso in mezcla.items() if peso > 0}
+    total = sum(activos.values())
+    cuotas = {rol: usuarios * peso / total for rol, peso in activos.items()}
+    cantidades = {rol: int(cuota) for rol, cuota in cuotas.items()}
+    if usuarios >= len(activos):
+        for rol in activos:
+            cantidades[rol] = max(cantidades[rol], 1)
+    sobrantes = sorted(activos, key=lambda rol: cuotas[rol] - int(cuotas[rol]), reverse=True)
+    while sum(cantidades.values()) < usuarios:
+        cantidades[sobrantes[0]] += 1
+        sobrantes = sobrantes[1:] + sobrantes[:1]
+    while sum(cantidades.values()) > usuarios:
+        mayor = max(cantidades, key=cantidades.get)
+        cantidades[mayor] -= 1
+    return [rol for rol in activos for _ in range(cantidades[rol])]
+
+
+def _crear_sesion(usuario):
+    sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+    sesion[SESSION_KEY] = usuario._meta.pk.value_to_string(usuario)
+    sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+    sesion.create()
+    return sesion.session_key
+
+
+def preparar(repuestos_calientes=10, muestra=500):
+    # Solo se usan datos sintéticos: las órdenes, reservas y transiciones de la carga nunca
+    # tocan clientes ni repuestos reales. Antes de escribir nada se anota lo necesario para
+    # que limpiar() deje la base como estaba.
+    equipos = Equipo.objects.filter(cliente__email__endswith=sinteticos.DOMINIO)
+    ordenes = OrdenReparacion.objects.filter(equipo__cliente__email__endswith=sinteticos.DOMINIO)
+    marcas = {
+        clave: modelo.objects.aggregate(ultimo=Max("pk"))["ultimo"] or 0 for clave, modelo in TABLAS_NUEVAS.items()
+    }
+
+    # Usuarios y sesiones se crean directo en la base: el login no es parte de la carga.
+    modelo_usuario = get_user_model()
+    dueno = modelo_usuario.objects.create(
+        username=f"{PREFIJO_USUARIO}{get_random_string(8)}", is_staff=True, is_superuser=True
+    )
+    tecnico = modelo_usuario.objects.create(username=f"{PREFIJO_USUARIO}{get_random_string(8)}", is_staff=True)
+
+    # Pocos repuestos concentran las reservas para que se vea la espera por los locks de fila.
+    calientes = list(
+        Repuesto.objects.filter(activo=True, sku__startswith=sinteticos.PREFIJO_SKU).order_by("pk")[:repuestos_calientes]
+    )
+    abiertas = list(
+        ordenes.filter(estado__in=SIGUIENTE_ESTADO).order_by("-pk").values_list("pk", "estado", "precio_estimado")[:muestra]
+    )
+    pks_abiertas = [pk for pk, _estado, _precio in abiertas]
+    # Las transiciones consumen las reservas de las órdenes de la muestra y mueven el stock de
+    # sus repuestos, además de los calientes.
+    tocados = {repuesto.pk for repuesto in calientes} | set(
+        OrdenRepuesto.objects.filter(orden_id__in=pks_abiertas).values_list("repuesto_id", flat=True)
+    )
+    stock = {
+        pk: (actual, reservado)
+        for pk, actual, reservado in Repuesto.objects.filter(pk__in=tocados).values_list(
+            "pk", "stock_actual", "stock_reservado"
+        )
+    }
+    originales = {
+        fila.pop("id"): fila for fila in OrdenReparacion.objects.filter(pk__in=pks_abiertas).values("id", *CAMPOS_ORDEN)
+    }
+    reservas_activas = list(
+        ReservaStock.objects.filter(orden_id__in=pks_abiertas, estado=ReservaStock.Estado.ACTIVA).values_list(
+            "pk", flat=True
+        )
+    )
+
+    for repuesto in calientes:
+        if repuesto.stock_disponible < 10**5:
+            repuesto.stock_actual += 10**6
+            repuesto.save()
+
+    return {
+        "usuarios": [dueno.pk, tecnico.pk],
+        "marcas": marcas,
+        "stock": stock,
+        "originales": originales,
+        "reservas_activas": reservas_activas,
+        "sesiones": {"dueno": _crear_sesion(dueno), "tecnico": _crear_sesion(tecnico)},
+        "tecnico": tecnico.pk,
+        "repuestos": [(repuesto.pk, str(repuesto.precio_unitario)) for repuesto in calientes],
+        "equipos": list(equipos.order_by("-pk").values_list("pk", flat=True)[:muestra]),
+        "ordenes": {pk: [estado, str(precio)] for pk, estado, precio in abiertas},
+        "tokens": [str(token) for token in ordenes.order_by("-pk").values_list("qr_token", flat=True)[:muestra]],
+    }
+
+
+@transaction.atomic
+def limpiar(datos):
+    motor = import_module(settings.SESSION_ENGINE)
+    for clave in datos["sesiones"].values():
+        motor.SessionStore(session_key=clave).delete()
+
+    # Lo que insertó la carga: órdenes nuevas, líneas y reservas (también las agregadas a
+    # órdenes previas), movimientos (la reposición incluida) y los avisos a clientes sintéticos.
+    marcas = datos["marcas"]
+    nuevas = OrdenReparacion.objects.filter(pk__gt=marcas["ordenes"])
+    for queryset in (
+        ReservaStock.objects.filter(pk__gt=marcas["reservas"]),
+        OrdenRepuesto.objects.filter(pk__gt=marcas["lineas"]),
+        nuevas,
+        SnapshotStock.objects.filter(ultimo_movimiento_id__gt=marcas["movimientos"]),
+        MovimientoStock.objects.filter(pk__gt=marcas["movimientos"]),
+        CorreoPendiente.objects.filter(pk__gt=marcas["correos"], destinatario__endswith=sinteticos.DOMINIO),
+    ):
+        queryset._raw_delete(queryset.db)
+
+    # Lo que modificó: las órdenes de la muestra vuelven a su estado, sus reservas a activas y
+    # los repuestos tocados a su stock y reservado anteriores (sin save(): no es un movimiento).
+    for pk, campos in datos["originales"].items():
+        OrdenReparacion.objects.filter(pk=pk).update(**campos)
+    OrdenReparacion.recalcular_totales(list(datos["originales"]))
+    ReservaStock.objects.filter(pk__in=datos["reservas_activas"]).update(estado=ReservaStock.Estado.ACTIVA)
+    Repuesto.objects.bulk_update(
+        [
+            Repuesto(pk=pk, stock_actual=actual, stock_reservado=reservado)
+            for pk, (actual, reservado) in datos["stock"].items()
+        ],
+        ["stock_actual", "stock_reservado"],
+    )
+    estadisticas.recalcular()
+    seguimiento.invalidar(
+        OrdenReparacion.objects.filter(pk__in=list(datos["originales"])).values_list("qr_token", flat=True)
+    )
+    invalidar_familia("ordenes", "repuestos")
+
+    get_user_model().objects.filter(pk__in=datos["usuarios"]).delete()
+
+
+class UsuarioVirtual:
+    def __init__(self, rol, base, datos, rng, estadisticas, timeout):
+        destino = urlsplit(base)
+        self.prefijo = destino.path.rstrip("/")
+        self.conexion = ConexionHTTP(destino.hostname, destino.port or 80, timeout)
+        self.rol = rol
+        self.datos = datos
+        self.rng = rng
+        self.estadisticas = estadisticas
+        self.csrf = get_random_string(32)
+        self.cookies = {settings.CSRF_COOKIE_NAME: self.csrf}
+        if rol in datos["sesiones"]:
+            self.cookies[settings.SESSION_COOKIE_NAME] = datos["sesiones"][rol]
+        self.etags = {}
+
+    async def pedir(self, operacion, ruta, formulario=None, esperado=200, cabeceras=None):
+        cabeceras = dict(cabeceras or {})
+        cabeceras["Cookie"] = "; ".join(f"{nombre}={valor}" for nombre, valor in self.cookies.items())
+        cuerpo = b""
+        metodo = "GET"
+        if formulario is not None:
+            metodo = "POST"
+            cuerpo = urlencode({"csrfmiddlewaretoken": self.csrf, **formulario}).encode()
+            cabeceras["Content-Type"] = "application/x-www-form-urlencoded"
+        inicio = time.perf_counter()
+        try:
+            estado, respuesta, _contenido = await self.conexion.pedir(metodo, self.prefijo + ruta, cabeceras, cuerpo)
+        except (OSError, ErrorHTTP, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as exc:
+            await self.conexion.cerrar()
+            self.estadisticas.registrar(operacion, "error", type(exc).__name__, (time.perf_counter() - inicio) * 1000)
+            return None, {}
+        ms = (time.perf_counter() - inicio) * 1000
+        for valor in respuesta.get("set-cookie", []):
+            for nombre, morsel in SimpleCookie(valor).items():
+                if nombre != settings.CSRF_COOKIE_NAME:
+                    self.cookies[nombre] = morsel.value
+
+        # Un POST que vuelve con 200 es el formulario con errores: stock insuficiente o
+        # una transición que otro técnico ya hizo. Cuenta aparte de los errores.
+        if estado == esperado or (estado == 304 and metodo == "GET"):
+            resultado = "ok"
+        elif metodo == "POST" and estado == 200:
+            resultado = "rechazado"
+        else:
+            resultado = "error"
+        self.estadisticas.registrar(operacion, resultado, estado, ms)
+        return estado, respuesta
+
+    def _orden_libre(self, estados=None):
+        # Las órdenes en uso se sacan del pozo compartido para que dos técnicos
+        # virtuales no pisen la misma transición.
+        candidatas = [
+            pk for pk, (estado, _precio) in self.datos["ordenes"].items() if estados is None or estado in estados
+        ]
+        if not candidatas:
+            return None, None
+        pk = self.rng.choice(candidatas)
+        return pk, self.datos["ordenes"].pop(pk)
+
+    async def ver_ordenes(self):
+        await self.pedir("ordenes_list", "/ordenes/")
+
+    async def ver_orden(self):
+        pk, estado = self._orden_libre()
+        if pk is None:
+            return await self.ver_ordenes()
+        await self.pedir("orden_detalle", f"/ordenes/{pk}/")
+        self.datos["ordenes"][pk] = estado
+
+    async def abrir_orden(self):
+        repuesto, precio = self.rng.choice(self.datos["repuestos"])
+        formulario = {
+            "equipo": self.rng.choice(self.datos["equipos"]),
+            "problema_reportado": "No enciende (carga)",
+            "precio_estimado": "50000",
+            "estado": OrdenReparacion.Estado.INGRESADO,
+            "tecnico_asignado": self.datos["tecnico"],
+            "repuestos-TOTAL_FORMS": "1",
+            "repuestos-INITIAL_FORMS": "0",
+            "repuestos-MIN_NUM_FORMS": "0",
+            "repuestos-MAX_NUM_FORMS": "1000",
+            "repuestos-0-repuesto": repuesto,
+            "repuestos-0-cantidad": "1",
+            "repuestos-0-precio_unitario": precio,
+        }
+        estado, respuesta = await self.pedir("abrir_orden", "/ordenes/nueva/form/", formulario, esperado=302)
+        destino = (respuesta.get("location") or [""])[0].rstrip("/").rsplit("/", 1)[-1]
+        if estado == 302 and destino.isdigit():
+            self.datos["ordenes"][int(destino)] = [OrdenReparacion.Estado.INGRESADO, "50000"]
+
+    async def agregar_repuesto(self):
+        pk, estado = self._orden_libre(ESTADOS_CON_REPUESTOS)
+        if pk is None:
+            return await self.abrir_orden()
+        repuesto, precio = self.rng.choice(self.datos["repuestos"])
+        formulario = {"action": "add_repuesto", "repuesto": repuesto, "cantidad": 1, "precio_unitario": precio}
+        await self.pedir("agregar_repuesto", f"/ordenes/{pk}/", formulario, esperado=302)
+        self.datos["ordenes"][pk] = estado
+
+    async def cambiar_estado(self):
+        pk, fila = self._orden_libre()
+        if pk is None:
+            return await self.abrir_orden()
+        estado, precio = fila
+        siguiente = SIGUIENTE_ESTADO[estado]
+        formulario = {
+            "action": "update_estado",
+            "estado": siguiente,
+            "diagnostico": "Revisado en prueba de carga",
+            "precio_estimado": precio,
+            "tecnico_asignado": self.datos["tecnico"],
+        }
+        codigo, _respuesta = await self.pedir("cambiar_estado", f"/ordenes/{pk}/", formulario, esperado=302)
+        # Las entregadas salen del pozo; las rechazadas también, porque su estado real ya no se conoce.
+        if codigo == 302 and siguiente in SIGUIENTE_ESTADO:
+            self.datos["ordenes"][pk] = [siguiente, precio]
+
+    async def ver_panel(self):
+        await self.pedir("dashboard", "/panel/")
+
+    async def ver_repuestos(self):
+        await self.pedir("repuestos_list", "/repuestos/")
+
+    async def ver_seguimiento(self):
+        token = self.rng.choice(self.datos["tokens"])
+        cabeceras = {}
+        # La mitad de las visitas son recargas del navegador con el ETag anterior.
+        if token in self.etags and self.rng.random() < 0.5:
+            cabeceras["If-None-Match"] = self.etags[token]
+        _estado, respuesta = await self.pedir("seguimiento_publico", f"/seguimiento/{token}/", cabeceras=cabeceras)
+        if respuesta.get("etag"):
+            self.etags[token] = respuesta["etag"][0]
+
+    async def ver_qr(self):
+        await self.pedir("orden_qr", f"/seguimiento/{self.rng.choice(self.datos['tokens'])}/qr.svg")
+
+    def acciones(self):
+        if self.rol == "tecnico":
+            return {
+                self.ver_ordenes: 2,
+                self.ver_orden: 3,
+                self.abrir_orden: 1,
+                self.agregar_repuesto: 2,
+                self.cambiar_estado: 2,
+            }
+        if self.rol == "dueno":
+            return {self.ver_panel: 4, self.ver_ordenes: 1, self.ver_repuestos: 1}
+        return {self.ver_seguimiento: 9, self.ver_qr: 1}
+
+    async def correr(self, hasta, pausa_ms):
+        acciones, pesos = zip(*self.acciones().items())
+        try:
+            while time.monotonic() < hasta:
+                await self.rng.choices(acciones, weights=pesos)[0]()
+                if pausa_ms:
+                    await asyncio.sleep(self.rng.expovariate(1000 / pausa_ms))
+        finally:
+            await self.conexion.cerrar()
+
+
+async def correr(base, datos, usuarios=20, duracion=30, mezcla=None, pausa_ms=0, semilla=0, timeout=TIMEOUT):
+    estadisticas = Estadisticas()
+    roles = repartir_roles(usuarios, mezcla or MEZCLA)
+    inicio = time.monotonic()
+    hasta = inicio + duracion
+    await asyncio.gather(
+        *(
+            UsuarioVirtual(rol, base, datos, random.Random(semilla * 1000 + n), estadisticas, timeout).correr(
+                hasta, pausa_ms
+            )
+            for n, rol in enumerate(roles)
+        )
+    )
+    reporte = estadisticas.reporte(time.monotonic() - inicio)
+    reporte["usuarios"] = dict(Counter(roles))
+    return reporte
@@ -0,0 +1,74 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from core.replicas import COOKIE, leer_de_replica
+
+
+def version_queryset(queryset, *campos):
+    # Máximo de las marcas de tiempo más la cantidad de filas: cubre altas, ediciones y bajas
+    # con un solo agregado que resuelve el índice sobre actualizado_en.
+    campos = campos or ("actualizado_en",)
+    agregados = {f"ultimo_{indice}": Max(campo) for indice, campo in enumerate(campos)}
+    return tuple(queryset.order_by().aggregate(total=Count("pk"), **agregados).values())
+
+
+def _etag(request, version):
+    # La página incluye el usuario en la barra y el token CSRF en los formularios;
+    # get_token fija el secreto que va a usar la respuesta aunque todavía no haya cookie.
+    get_token(request)
+    partes = [
+        str(request.user.pk),
+        request.META["CSRF_COOKIE"],
+        request.get_full_path(),
+        *(valor.isoformat() if hasattr(valor, "isoformat") else str(valor) for valor in version),
+    ]
+    return quote_etag(hashlib.md5("|".join(partes).encode()).hexdigest())
+
+
+def get_condicional(version):
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or messages.get_messages(request):
+                return vista(request, *args, **kwargs)
+
+            etag = _etag(request, version(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = vista(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response["ETag"] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return envoltura
+
+    return decorador
+
+
+def lectura_replica(vista):
+    # Solo tiene efecto con el router de réplica instalado; la cookie la deja
+    # LecturaPrimariaMiddleware después de un POST del mismo navegador.
+    if iscoroutinefunction(vista):
+
+        @wraps(vista)
+        async def envoltura_async(request, *args, **kwargs):
+            with leer_de_replica(COOKIE not in request.COOKIES):
+                return await vista(request, *args, **kwargs)
+
+        return envoltura_async
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        with leer_de_replica(COOKIE not in request.COOKIES):
+            return vista(request, *args, **kwargs)
+
+    return envoltura
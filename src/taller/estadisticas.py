@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from core.cache import invalidar_familia, queryset_cacheado
+from taller.models import EstadisticaEstado, OrdenReparacion
+
+
+ESTADOS_FACTURABLES = (OrdenReparacion.Estado.REPARADO, OrdenReparacion.Estado.ENTREGADO)
+
+
+def _aplicar(estado, cantidad, monto):
+    if not cantidad and not monto:
+        return
+    actualizados = EstadisticaEstado.objects.filter(estado=estado).update(
+        cantidad=F("cantidad") + cantidad,
+        monto=F("monto") + monto,
+    )
+    if actualizados:
+        return
+    try:
+        with transaction.atomic():
+            EstadisticaEstado.objects.create(estado=estado, cantidad=cantidad, monto=monto)
+    except IntegrityError:
+        _aplicar(estado, cantidad, monto)
+
+
+def registrar_cambio(estado_anterior, precio_anterior, estado_nuevo, precio_nuevo):
+    precio_anterior = Decimal(precio_anterior or 0)
+    precio_nuevo = Decimal(precio_nuevo or 0)
+    if estado_anterior == estado_nuevo:
+        if estado_nuevo is not None:
+            _aplicar(estado_nuevo, 0, precio_nuevo - precio_anterior)
+        return
+    if estado_anterior is not None:
+        _aplicar(estado_anterior, -1, -precio_anterior)
+    if estado_nuevo is not None:
+        _aplicar(estado_nuevo, 1, precio_nuevo)
+
+
+def resumen():
+    filas = queryset_cacheado("ordenes", "resumen_estados", EstadisticaEstado.objects.order_by("estado"))
+    estadisticas_estados = [{"estado": fila.estado, "total": fila.cantidad} for fila in filas if fila.cantidad]
+    facturacion = sum((fila.monto for fila in filas if fila.estado in ESTADOS_FACTURABLES), start=Decimal(0))
+    return estadisticas_estados, facturacion
+
+
+def calcular_desde_ordenes():
+    reales = {
+        estado: {"cantidad": 0, "monto": Decimal(0)}
+        for estado in OrdenReparacion.Estado.values
+    }
+    filas = (
+        OrdenReparacion.objects.order_by()
+        .values("estado")
+        .annotate(cantidad=Count("id"), monto=Sum("precio_estimado"))
+    )
+    for fila in filas:
+        reales[fila["estado"]] = {"cantidad": fila["cantidad"], "monto": fila["monto"] or Decimal(0)}
+    return reales
+
+
+@transaction.atomic
+def recalcular(corregir=True):
+    actuales = {fila.estado: fila for fila in EstadisticaEstado.objects.select_for_update()}
+    reales = calcular_desde_ordenes()
+    desvios = []
+    for estado, real in reales.items():
+        fila = actuales.get(estado)
+        cantidad = fila.cantidad if fila else 0
+        monto = fila.monto if fila else Decimal(0)
+        if fila is None or cantidad != real["cantidad"] or monto != real["monto"]:
+            desvios.append(
+                {
+                    "estado": estado,
+                    "cantidad": cantidad,
+                    "cantidad_real": real["cantidad"],
+                    "monto": monto,
+                    "monto_real": real["monto"],
+                }
+            )
+            if corregir:
+                EstadisticaEstado.objects.update_or_create(estado=estado, defaults=real)
+    if desvios and corregir:
+        invalidar_familia("ordenes")
+    return desvios
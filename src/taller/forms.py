@@ -1,4 +1,9 @@
+from collections import defaultdict
+
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms import BaseInlineFormSet
+from django.urls import reverse
 
 from inventario.models import Repuesto
 from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
@@ -17,6 +22,39 @@ class StyledModelForm(forms.ModelForm):
             field.widget.attrs["class"] = f"{existing} {base_class}".strip()
 
 
+class AutocompletarSelect(forms.Select):
+    # Renderiza solo la opción elegida; el resto lo trae el navegador del endpoint JSON
+    # mientras se tipea (static/js/autocompletar.js). Sin esto el <select> listaba la tabla entera.
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+
+    def get_context(self, name, value, attrs):
+        attrs = {**(attrs or {}), "data-autocompletar": reverse(self.url_name)}
+        return super().get_context(name, value, attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        opciones = [("", "Buscar...")]
+        ids = [valor for valor in value if str(valor).isdigit()]
+        if ids:
+            campo = self.choices.field
+            opciones += [(obj.pk, campo.label_from_instance(obj)) for obj in self.choices.queryset.filter(pk__in=ids)]
+        return [
+            (None, [self.create_option(name, valor, etiqueta, str(valor) in value, indice, attrs=attrs)], indice)
+            for indice, (valor, etiqueta) in enumerate(opciones)
+        ]
+
+
+def limitar_estados_permitidos(form):
+    orden = form.instance
+    if orden.pk is None or "estado" not in form.fields:
+        return
+    permitidos = {orden.estado_original or orden.estado, *orden.transiciones_posibles()}
+    form.fields["estado"].choices = [
+        (valor, etiqueta) for valor, etiqueta in form.fields["estado"].choices if valor in permitidos
+    ]
+
+
 class ClienteForm(StyledModelForm):
     class Meta:
         model = Cliente
@@ -34,9 +72,14 @@ class EquipoForm(StyledModelForm):
             "numero_serie",
             "observaciones_ingreso",
         ]
+        widgets = {"cliente": AutocompletarSelect("buscar_clientes")}
 
 
 class OrdenReparacionForm(StyledModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        limitar_estados_permitidos(self)
+
     class Meta:
         model = OrdenReparacion
         fields = [
@@ -47,6 +90,7 @@ class OrdenReparacionForm(StyledModelForm):
             "precio_estimado",
             "estado",
         ]
+        widgets = {"equipo": AutocompletarSelect("buscar_equipos")}
 
 
 class RepuestoForm(StyledModelForm):
@@ -64,14 +108,79 @@ class RepuestoForm(StyledModelForm):
 
 
 class EstadoOrdenForm(StyledModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        limitar_estados_permitidos(self)
+
     class Meta:
         model = OrdenReparacion
         fields = ["estado", "diagnostico", "precio_estimado", "tecnico_asignado"]
 
 
+class RepuestoChoiceField(forms.ModelChoiceField):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.precargados = None
+
+    def to_python(self, value):
+        if self.precargados is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            return self.precargados[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice")
+
+
 class OrdenRepuestoForm(StyledModelForm):
-    repuesto = forms.ModelChoiceField(queryset=Repuesto.objects.filter(activo=True))
+    repuesto = RepuestoChoiceField(
+        queryset=Repuesto.objects.filter(activo=True),
+        widget=AutocompletarSelect("buscar_repuestos"),
+    )
+
+    def _get_validation_exclusions(self):
+        exclusiones = super()._get_validation_exclusions()
+        if self.fields["repuesto"].precargados is not None:
+            # El repuesto ya salió de la consulta agrupada del formset; no hace falta revalidar la FK.
+            exclusiones.add("repuesto")
+        return exclusiones
 
     class Meta:
         model = OrdenRepuesto
-        fields = ["repuesto", "cantidad", "precio_unitario"]
\ No newline at end of file
+        fields = ["repuesto", "cantidad", "precio_unitario"]
+
+
+class OrdenRepuestoBaseFormSet(BaseInlineFormSet):
+    def full_clean(self):
+        if self.is_bound:
+            self._precargar_repuestos()
+        super().full_clean()
+
+    def _precargar_repuestos(self):
+        ids = set()
+        for form in self.forms:
+            valor = form.data.get(form.add_prefix("repuesto"))
+            if valor and str(valor).isdigit():
+                ids.add(int(valor))
+        # Una sola consulta para todas las líneas en lugar de un lookup por formulario.
+        repuestos = Repuesto.objects.filter(activo=True).in_bulk(ids) if ids else {}
+        for form in self.forms:
+            form.fields["repuesto"].precargados = repuestos
+
+    def clean(self):
+        super().clean()
+        requeridos = defaultdict(int)
+        lineas = []
+        for form in self.forms:
+            cleaned = getattr(form, "cleaned_data", None)
+            if not cleaned or cleaned.get("DELETE") or not cleaned.get("repuesto"):
+                continue
+            requeridos[cleaned["repuesto"].pk] += cleaned.get("cantidad") or 0
+            lineas.append(form)
+
+        for form in lineas:
+            repuesto = form.cleaned_data["repuesto"]
+            if requeridos[repuesto.pk] > repuesto.stock_disponible:
+                form.add_error(
+                    "cantidad",
+                    f"Stock insuficiente para {repuesto.nombre}. Disponible: {repuesto.stock_disponible}.",
+                )
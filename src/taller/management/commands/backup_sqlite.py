@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia en caliente la base SQLite con la API de backup: los workers pueden seguir leyendo "
+        "y escribiendo mientras corre. Verifica la copia y rota las anteriores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("destino", nargs="?", default="backups", help="Archivo o directorio de destino.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--paginas",
+            type=int,
+            default=1000,
+            help="Páginas copiadas por paso; entre pasos se libera la base (0 = todo de una vez).",
+        )
+        parser.add_argument(
+            "--conservar",
+            type=int,
+            default=0,
+            help="Con un directorio como destino, deja solo los N backups más nuevos (0 = todos).",
+        )
+
+    def handle(self, *args, **options):
+        conexion = connections[options["database"]]
+        if conexion.vendor != "sqlite":
+            raise CommandError(f"La base {options['database']} no es SQLite: usá pg_dump.")
+        if conexion.in_atomic_block:
+            # La API de backup reintenta para siempre si la misma conexión tiene escrituras sin confirmar.
+            raise CommandError("No se puede copiar la base desde dentro de una transacción.")
+
+        destino = Path(options["destino"])
+        if destino.suffix == "":
+            destino.mkdir(parents=True, exist_ok=True)
+            destino = destino / f"db-{timezone.now():%Y%m%d-%H%M%S-%f}.sqlite3"
+        # Se escribe en un temporal y se renombra: un backup a medias nunca queda con el nombre final.
+        temporal = destino.with_name(destino.name + ".parcial")
+
+        inicio = time.perf_counter()
+        conexion.ensure_connection()
+        copia = sqlite3.connect(temporal)
+        try:
+            conexion.connection.backup(copia, pages=options["paginas"] or -1)
+            resultado = copia.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            copia.close()
+        if resultado != "ok":
+            temporal.unlink()
+            raise CommandError(f"La copia no pasó integrity_check: {resultado}")
+        os.replace(temporal, destino)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Backup en {destino} ({destino.stat().st_size / 1024 / 1024:.1f} MB, "
+                f"{time.perf_counter() - inicio:.2f}s)."
+            )
+        )
+        if options["conservar"] and Path(options["destino"]).suffix == "":
+            anteriores = sorted(destino.parent.glob("db-*.sqlite3"), reverse=True)[options["conservar"] :]
+            for viejo in anteriores:
+                viejo.unlink()
+            if anteriores:
+                self.stdout.write(f"Borrados {len(anteriores)} backups viejos.")
@@ -0,0 +1,76 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from taller import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide consultas, latencia (p50/p95/p99) y memoria pico de cada vista sobre un dataset sintético "
+        "que se descarta al terminar. Falla si alguna vista supera su presupuesto de consultas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escala", type=int, default=1, help="Multiplicador del tamaño del dataset.")
+        parser.add_argument("--semilla", type=int, default=0, help="Semilla del dataset sintético.")
+        parser.add_argument("--iteraciones", type=int, default=20, help="Requests medidos por vista.")
+        parser.add_argument("--con-cache", action="store_true", help="No vaciar la caché entre requests.")
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior para detectar regresiones.")
+        parser.add_argument(
+            "--tolerancia",
+            type=float,
+            default=25.0,
+            help="Aumento de p95 (en %%) que se considera regresión al comparar.",
+        )
+        parser.add_argument(
+            "--forzar",
+            action="store_true",
+            help="Permite correrlo con DEBUG=0 (escribe y descarta datos en la base configurada).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["forzar"]:
+            raise CommandError("El benchmark escribe en la base configurada: usalo en desarrollo o pasá --forzar.")
+
+        escala = options["escala"]
+        iteraciones = max(options["iteraciones"], 1)
+        with transaction.atomic():
+            datos = benchmark.generar_dataset(escala, semilla=options["semilla"])
+            resultados = benchmark.medir(datos, iteraciones=iteraciones, con_cache=options["con_cache"])
+            transaction.set_rollback(True)
+
+        reporte = benchmark.reporte(escala, iteraciones, resultados)
+        for nombre, fila in resultados.items():
+            self.stdout.write(
+                f"{nombre:<24} {fila['consultas']:>3}/{fila['presupuesto']:<3} consultas  "
+                f"p50={fila['p50_ms']:.1f}ms p95={fila['p95_ms']:.1f}ms p99={fila['p99_ms']:.1f}ms  "
+                f"mem={fila['memoria_pico_kb']:.0f}KB"
+            )
+
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        problemas = []
+        if options["comparar"]:
+            with open(options["comparar"], encoding="utf-8") as archivo:
+                anterior = json.load(archivo)
+            for fila in benchmark.regresiones(reporte, anterior, options["tolerancia"]):
+                problemas.append(
+                    f"{fila['nombre']}: p95 {fila['p95_ms_anterior']} -> {fila['p95_ms']} ms ({fila['variacion']:+}%), "
+                    f"consultas {fila['consultas_anterior']} -> {fila['consultas']}"
+                )
+
+        for nombre, fila in benchmark.excedidos(resultados).items():
+            problemas.append(
+                f"{nombre}: {fila['consultas']} consultas (presupuesto {fila['presupuesto']}), {fila['errores']} errores"
+            )
+
+        if problemas:
+            raise CommandError("Benchmark fuera de presupuesto:\n" + "\n".join(problemas))
+        self.stdout.write(self.style.SUCCESS("Todas las vistas dentro del presupuesto."))
@@ -0,0 +1,76 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def migraciones_pendientes(alias=DEFAULT_DB_ALIAS):
+    executor = MigrationExecutor(connections[alias])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def asegurar_superusuario(username, email, password, resetear=False):
+    # Idempotente: solo escribe si el usuario no existe o, con resetear, si algo cambió.
+    User = get_user_model()
+    user = User.objects.filter(username=username).first()
+    if user is None:
+        User.objects.create_superuser(username, email, password)
+        return "creado"
+    if not resetear:
+        return "sin cambios"
+    al_dia = (
+        user.email == email
+        and user.is_staff
+        and user.is_superuser
+        and user.is_active
+        and user.check_password(password)
+    )
+    if al_dia:
+        return "sin cambios"
+    user.email = email
+    user.is_staff = user.is_superuser = user.is_active = True
+    user.set_password(password)
+    user.save()
+    return "actualizado"
+
+
+class Command(BaseCommand):
+    help = (
+        "Prepara la base al arrancar el contenedor: migra solo si hay migraciones pendientes y "
+        "crea el superusuario de DJANGO_SUPERUSER_* si CREATE_SUPERUSER=1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sin-migraciones",
+            action="store_true",
+            default=os.getenv("RUN_MIGRATIONS", "1") != "1",
+            help="No migrar aunque haya pendientes (por defecto sigue RUN_MIGRATIONS).",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if not options["sin_migraciones"]:
+            pendientes = migraciones_pendientes()
+            if pendientes:
+                self.stdout.write(f"Aplicando {len(pendientes)} migraciones.")
+                call_command("migrate", interactive=False, verbosity=options["verbosity"])
+            else:
+                self.stdout.write("Sin migraciones pendientes.")
+
+        password = os.getenv("DJANGO_SUPERUSER_PASSWORD", "")
+        if os.getenv("CREATE_SUPERUSER", "0") == "1" and password:
+            username = os.getenv("DJANGO_SUPERUSER_USERNAME", "admin")
+            estado = asegurar_superusuario(
+                username,
+                os.getenv("DJANGO_SUPERUSER_EMAIL", "admin@malarguetech.com"),
+                password,
+                resetear=os.getenv("RESET_SUPERUSER_PASSWORD", "0") == "1",
+            )
+            self.stdout.write(f"Superusuario {username}: {estado}.")
+
+        self.stdout.write(f"Bootstrap en {time.perf_counter() - inicio:.2f}s.")
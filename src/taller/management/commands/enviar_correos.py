@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from taller import notificaciones
+
+
+class Command(BaseCommand):
+    help = "Envía los correos pendientes de la cola en lotes, con reintentos y backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=notificaciones.TAMANO_LOTE, help="Correos por lote.")
+        parser.add_argument(
+            "--max-intentos",
+            type=int,
+            default=notificaciones.MAX_INTENTOS,
+            help="Intentos antes de marcar el correo como fallido.",
+        )
+        parser.add_argument(
+            "--backoff",
+            type=int,
+            default=notificaciones.BACKOFF_SEGUNDOS,
+            help="Segundos de espera base entre reintentos (se duplica en cada intento).",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="Queda escuchando la cola en lugar de salir cuando se vacía.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=float,
+            default=5.0,
+            help="Segundos de espera entre lecturas de la cola en modo continuo.",
+        )
+
+    def handle(self, *args, **options):
+        totales = {"enviados": 0, "reintentos": 0, "fallidos": 0}
+        try:
+            while True:
+                resultado = notificaciones.procesar_lote(
+                    tamano=options["lote"],
+                    max_intentos=options["max_intentos"],
+                    backoff=options["backoff"],
+                )
+                for clave, valor in resultado.items():
+                    totales[clave] += valor
+                if any(resultado.values()):
+                    continue
+                if not options["continuo"]:
+                    break
+                time.sleep(options["intervalo"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Correos enviados: {totales['enviados']}, "
+                f"reprogramados: {totales['reintentos']}, "
+                f"fallidos: {totales['fallidos']}"
+            )
+        )
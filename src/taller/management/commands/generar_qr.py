@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from taller import qr
+from taller.models import OrdenReparacion
+
+
+def _renderizar_png(tarea):
+    orden_id, url = tarea
+    return orden_id, qr.renderizar(url, "png")
+
+
+class Command(BaseCommand):
+    help = "Genera (o regenera) las imágenes QR de las órdenes existentes usando varios procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--regenerar",
+            action="store_true",
+            help="Vuelve a generar también las órdenes que ya tienen QR.",
+        )
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Cantidad de procesos que dibujan los QR en paralelo.",
+        )
+        parser.add_argument("--lote", type=int, default=500, help="Órdenes que se guardan por lote.")
+
+    def handle(self, *args, **options):
+        ordenes = OrdenReparacion.objects.order_by("id")
+        if not options["regenerar"]:
+            ordenes = ordenes.filter(Q(qr_imagen="") | Q(qr_imagen__isnull=True))
+        total = 0
+        ultimo_id = 0
+        with ProcessPoolExecutor(max_workers=max(options["procesos"], 1)) as pool:
+            while True:
+                tareas = [
+                    (orden_id, qr.url_seguimiento(token))
+                    for orden_id, token in ordenes.filter(id__gt=ultimo_id).values_list("id", "qr_token")[: options["lote"]]
+                ]
+                if not tareas:
+                    break
+                ultimo_id = tareas[-1][0]
+
+                lote = []
+                for orden_id, contenido in pool.map(_renderizar_png, tareas, chunksize=16):
+                    nombre = qr.nombre_archivo(orden_id)
+                    if default_storage.exists(nombre):
+                        default_storage.delete(nombre)
+                    lote.append(OrdenReparacion(pk=orden_id, qr_imagen=default_storage.save(nombre, ContentFile(contenido))))
+                OrdenReparacion.objects.bulk_update(lote, ["qr_imagen"])
+                total += len(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"QR generados: {total}"))
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from taller import carga, sinteticos
+from taller.models import Cliente
+
+
+def _puerto_libre():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _mezcla(valor):
+    try:
+        pesos = {rol.strip(): int(peso) for rol, peso in (parte.split("=") for parte in valor.split(","))}
+    except ValueError:
+        raise CommandError("--mezcla espera el formato tecnico=4,dueno=1,cliente=15.")
+    desconocidos = set(pesos) - set(carga.MEZCLA)
+    if desconocidos or not any(pesos.values()):
+        raise CommandError(f"Roles válidos para --mezcla: {', '.join(carga.MEZCLA)}.")
+    return pesos
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga HTTP con una mezcla de técnicos, dueño y clientes contra un servidor local. "
+        "Informa throughput, histogramas de latencia y tasa de errores por operación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Servidor ya levantado. Si se omite, se arranca uno local.")
+        parser.add_argument("--servidor", choices=["gunicorn", "uvicorn", "runserver"], default="gunicorn")
+        parser.add_argument("--workers", type=int, default=2, help="Workers de gunicorn.")
+        parser.add_argument("--threads", type=int, default=1, help="Threads por worker de gunicorn.")
+        parser.add_argument("--usuarios", type=int, default=20, help="Usuarios virtuales concurrentes.")
+        parser.add_argument("--duracion", type=float, default=30, help="Segundos de carga.")
+        parser.add_argument(
+            "--mezcla",
+            type=_mezcla,
+            default=carga.MEZCLA,
+            help="Proporción de usuarios por rol, p. ej. tecnico=4,dueno=1,cliente=15.",
+        )
+        parser.add_argument("--pausa-ms", type=float, default=0, help="Pausa media entre pedidos de cada usuario.")
+        parser.add_argument(
+            "--repuestos-calientes",
+            type=int,
+            default=10,
+            help="Cantidad de repuestos entre los que se reparten las reservas (menos = más contención).",
+        )
+        parser.add_argument("--escala", type=int, default=1, help="Datos sintéticos a generar si la base está vacía.")
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--timeout", type=float, default=carga.TIMEOUT, help="Segundos máximos por pedido.")
+        parser.add_argument("--salida", help="Archivo JSON donde guardar el reporte.")
+        parser.add_argument(
+            "--forzar",
+            action="store_true",
+            help="Permite correrlo con DEBUG=0 (crea órdenes y mueve stock en la base configurada).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["forzar"]:
+            raise CommandError("La prueba de carga escribe en la base configurada: usala en desarrollo o pasá --forzar.")
+        if options["url"] and not options["url"].startswith("http://"):
+            raise CommandError("--url tiene que ser http://host:puerto.")
+
+        # La carga trabaja solo sobre datos sintéticos; si no hay, los genera y al final los borra.
+        generados = not Cliente.objects.filter(email__endswith=sinteticos.DOMINIO).exists()
+        if generados:
+            self.stdout.write(f"Sin datos sintéticos: generando (escala {options['escala']}).")
+            sinteticos.generar(escala=options["escala"], semilla=options["semilla"])
+        datos = carga.preparar(options["repuestos_calientes"])
+
+        try:
+            if not datos["equipos"] or not datos["repuestos"] or not datos["tokens"]:
+                raise CommandError("Hacen falta equipos, repuestos y órdenes sintéticos: corré seed_demo --scale 1.")
+            with self._servidor(options) as base:
+                self.stdout.write(
+                    f"{options['usuarios']} usuarios durante {options['duracion']:.0f}s contra {base} ..."
+                )
+                reporte = asyncio.run(
+                    carga.correr(
+                        base,
+                        datos,
+                        usuarios=options["usuarios"],
+                        duracion=options["duracion"],
+                        mezcla=options["mezcla"],
+                        pausa_ms=options["pausa_ms"],
+                        semilla=options["semilla"],
+                        timeout=options["timeout"],
+                    )
+                )
+        finally:
+            carga.limpiar(datos)
+            if generados:
+                sinteticos.borrar_sinteticos()
+
+        reporte["servidor"] = options["url"] or {
+            "tipo": options["servidor"],
+            "workers": options["workers"],
+            "threads": options["threads"],
+            "arranque_s": self.arranque_s,
+        }
+        self._imprimir(reporte)
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Reporte guardado en {options['salida']}")
+
+    @contextmanager
+    def _servidor(self, options):
+        if options["url"]:
+            yield options["url"].rstrip("/")
+            return
+
+        puerto = _puerto_libre()
+        if options["servidor"] in ("gunicorn", "uvicorn"):
+            comando = [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                "--config",
+                str(settings.BASE_DIR.parent / "gunicorn.conf.py"),
+                *(
+                    ["core.asgi:application", "-k", "uvicorn_worker.UvicornWorker"]
+                    if options["servidor"] == "uvicorn"
+                    else ["core.wsgi:application"]
+                ),
+                "--bind",
+                f"127.0.0.1:{puerto}",
+                "--workers",
+                str(options["workers"]),
+                "--threads",
+                str(options["threads"]),
+                "--log-level",
+                "warning",
+            ]
+        else:
+            comando = [sys.executable, "manage.py", "runserver", f"127.0.0.1:{puerto}", "--noreload"]
+        # El log de accesos de runserver taparía el reporte.
+        proceso = subprocess.Popen(
+            comando,
+            cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL if options["servidor"] == "runserver" else None,
+        )
+        base = f"http://127.0.0.1:{puerto}"
+        inicio = time.monotonic()
+        try:
+            limite = inicio + 30
+            while True:
+                try:
+                    urllib.request.urlopen(f"{base}/health/", timeout=1).close()
+                    self.arranque_s = round(time.monotonic() - inicio, 2)
+                    self.stdout.write(f"Servidor listo: primer request respondido a {self.arranque_s}s de lanzarlo.")
+                    break
+                except OSError:
+                    if proceso.poll() is not None or time.monotonic() > limite:
+                        raise CommandError(f"No arrancó el servidor de prueba ({' '.join(comando)}).")
+                    time.sleep(0.05)
+            yield base
+        finally:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+
+    def _imprimir(self, reporte):
+        self.stdout.write(
+            f"\n{reporte['pedidos']} pedidos en {reporte['duracion_s']}s: {reporte['rps']} req/s, "
+            f"{reporte['tasa_error']}% errores"
+        )
+        self.stdout.write(
+            f"{'operación':<22}{'pedidos':>8}{'req/s':>8}{'rech.':>7}{'err.':>6}"
+            f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"
+        )
+        for nombre, fila in reporte["operaciones"].items():
+            self.stdout.write(
+                f"{nombre:<22}{fila['pedidos']:>8}{fila['rps']:>8}{fila['rechazados']:>7}{fila['errores']:>6}"
+                f"{fila['p50_ms']:>9.1f}{fila['p95_ms']:>9.1f}{fila['p99_ms']:>9.1f}{fila['max_ms']:>9.1f}"
+            )
+
+        self.stdout.write("\nLatencia de todos los pedidos (ms):")
+        maximo = max(reporte["histograma_ms"].values(), default=0) or 1
+        for cubeta, cantidad in reporte["histograma_ms"].items():
+            self.stdout.write(f"{cubeta:>7} {'#' * round(cantidad / maximo * 50):<50} {cantidad}")
@@ -0,0 +1,64 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from taller import auditoria, benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Captura las consultas de cada vista sobre un dataset sintético descartable, corre EXPLAIN "
+        "(PostgreSQL o SQLite) y marca recorridos secuenciales sobre tablas grandes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escala", type=int, default=10, help="Multiplicador del tamaño del dataset.")
+        parser.add_argument(
+            "--umbral-filas",
+            type=int,
+            default=auditoria.UMBRAL_FILAS,
+            help="Tablas con menos filas no se reportan aunque se recorran completas.",
+        )
+        parser.add_argument("--ordenamientos", action="store_true", help="Mostrar también los ORDER BY sin índice.")
+        parser.add_argument("--estricto", action="store_true", help="Falla si hay recorridos secuenciales.")
+        parser.add_argument("--salida", help="Archivo JSON donde guardar los planes marcados.")
+        parser.add_argument(
+            "--forzar",
+            action="store_true",
+            help="Permite correrlo con DEBUG=0 (escribe y descarta datos en la base configurada).",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["forzar"]:
+            raise CommandError("La auditoría escribe en la base configurada: usala en desarrollo o pasá --forzar.")
+        if connection.vendor not in auditoria.MOTORES:
+            raise CommandError(f"La auditoría solo interpreta EXPLAIN de PostgreSQL y SQLite, no de {connection.vendor}.")
+
+        with transaction.atomic():
+            datos = benchmark.generar_dataset(options["escala"])
+            resultado = auditoria.auditar(datos, umbral_filas=options["umbral_filas"])
+            transaction.set_rollback(True)
+
+        escaneos = 0
+        for nombre, fila in resultado.items():
+            marcados = [
+                hallazgo
+                for hallazgo in fila["hallazgos"]
+                if hallazgo["tipo"] == "scan" or options["ordenamientos"]
+            ]
+            escaneos += sum(hallazgo["tipo"] == "scan" for hallazgo in marcados)
+            estilo = self.style.WARNING if marcados else self.style.SUCCESS
+            self.stdout.write(estilo(f"{nombre:<24} {fila['consultas']:>3} consultas  {len(marcados)} hallazgos"))
+            for hallazgo in marcados:
+                self.stdout.write(f"    {hallazgo['detalle']}  ({hallazgo['filas'] or '-'} filas)")
+                self.stdout.write(f"      {hallazgo['sql'][:160]}")
+
+        if options["salida"]:
+            with open(options["salida"], "w", encoding="utf-8") as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False, default=str)
+            self.stdout.write(f"Resultados guardados en {options['salida']}")
+
+        if escaneos and options["estricto"]:
+            raise CommandError(f"{escaneos} recorridos secuenciales sobre tablas grandes.")
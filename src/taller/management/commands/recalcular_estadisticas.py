@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from taller import estadisticas
+
+
+class Command(BaseCommand):
+    help = "Recalcula los contadores del panel desde las órdenes y reporta desvíos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--solo-reportar",
+            action="store_true",
+            help="Informa los desvíos sin corregir los contadores.",
+        )
+
+    def handle(self, *args, **options):
+        solo_reportar = options.get("solo_reportar")
+        desvios = estadisticas.recalcular(corregir=not solo_reportar)
+
+        if not desvios:
+            self.stdout.write(self.style.SUCCESS("Contadores consistentes, sin desvíos."))
+            return
+
+        for desvio in desvios:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{desvio['estado']}: cantidad {desvio['cantidad']} → {desvio['cantidad_real']}, "
+                    f"monto ${desvio['monto']} → ${desvio['monto_real']}"
+                )
+            )
+        if solo_reportar:
+            self.stdout.write(self.style.WARNING(f"{len(desvios)} estado(s) con desvío. No se corrigió nada."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(desvios)} estado(s) corregidos."))
@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 
 from inventario.models import Repuesto
+from taller import sinteticos
 from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
 from usuarios.models import PerfilUsuario
 
@@ -16,19 +17,48 @@ class Command(BaseCommand):
         parser.add_argument(
             "--reset",
             action="store_true",
-            help="Borra datos de demo existentes antes de volver a cargarlos.",
+            help="Borra datos de demo (y los sintéticos) existentes antes de volver a cargarlos.",
+        )
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=0,
+            help=(
+                "Además de la demo, genera un volumen sintético: por unidad ~100 clientes, 200 órdenes "
+                "y 50 repuestos con sus líneas, reservas y movimientos."
+            ),
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Semilla del generador sintético.")
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=sinteticos.LOTE,
+            help="Filas por bulk_create al generar datos sintéticos.",
         )
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        if options.get("reset"):
-            self._reset_demo_data()
-
-        owner, tech1, tech2 = self._seed_users()
-        clientes = self._seed_clientes()
-        equipos = self._seed_equipos(clientes)
-        repuestos = self._seed_repuestos()
-        self._seed_ordenes(equipos, repuestos, tech1, tech2)
+        with transaction.atomic():
+            if options.get("reset"):
+                self._reset_demo_data()
+
+            owner, tech1, tech2 = self._seed_users()
+            clientes = self._seed_clientes()
+            equipos = self._seed_equipos(clientes)
+            repuestos = self._seed_repuestos()
+            self._seed_ordenes(equipos, repuestos, tech1, tech2)
+
+        # Fuera de la transacción de la demo: el generador confirma lote por lote.
+        if options.get("scale"):
+            totales = sinteticos.generar(
+                escala=options["scale"],
+                semilla=options["seed"],
+                tecnicos=[tech1, tech2],
+                lote=options["lote"],
+                log=self.stdout.write,
+            )
+            self.stdout.write(
+                "Datos sintéticos: " + ", ".join(f"{cantidad} {nombre}" for nombre, cantidad in totales.items())
+            )
 
         self.stdout.write(self.style.SUCCESS("Modo demo cargado correctamente ✅"))
         self.stdout.write("Usuarios demo:")
@@ -37,11 +67,11 @@ class Command(BaseCommand):
         self.stdout.write("- técnico 2: demo_tecnico2 / Demo1234!")
 
     def _reset_demo_data(self):
-        OrdenRepuesto.objects.filter(orden__equipo__cliente__email__endswith="@demo.local").delete()
-        OrdenReparacion.objects.filter(equipo__cliente__email__endswith="@demo.local").delete()
-        Equipo.objects.filter(cliente__email__endswith="@demo.local").delete()
-        Cliente.objects.filter(email__endswith="@demo.local").delete()
-        Repuesto.objects.filter(sku__startswith="DEMO-").delete()
+        sinteticos.borrar_rapido(
+            Cliente.objects.filter(email__endswith="@demo.local"),
+            Repuesto.objects.filter(sku__startswith="DEMO-"),
+        )
+        sinteticos.borrar_sinteticos()
 
         user_model = get_user_model()
         user_model.objects.filter(username__in=["demo_owner", "demo_tecnico1", "demo_tecnico2"]).delete()
@@ -198,10 +228,14 @@ class Command(BaseCommand):
                 orden.save()
 
             if not orden.repuestos.exists():
-                for sku, cantidad, precio in spec["items"]:
+                items = [
                     OrdenRepuesto.objects.create(
                         orden=orden,
                         repuesto=repuestos[sku],
                         cantidad=cantidad,
                         precio_unitario=precio,
                     )
+                    for sku, cantidad, precio in spec["items"]
+                ]
+                if orden.admite_repuestos:
+                    orden.reservar_repuestos(items)
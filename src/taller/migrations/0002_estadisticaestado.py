@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+ESTADOS = ['INGRESADO', 'EN_REVISION', 'PRESUPUESTADO', 'REPARANDO', 'REPARADO', 'ENTREGADO', 'CANCELADO']
+
+
+def poblar_estadisticas(apps, schema_editor):
+    OrdenReparacion = apps.get_model('taller', 'OrdenReparacion')
+    EstadisticaEstado = apps.get_model('taller', 'EstadisticaEstado')
+    reales = {
+        fila['estado']: fila
+        for fila in OrdenReparacion.objects.order_by().values('estado').annotate(
+            cantidad=Count('id'), monto=Sum('precio_estimado')
+        )
+    }
+    EstadisticaEstado.objects.bulk_create(
+        [
+            EstadisticaEstado(
+                estado=estado,
+                cantidad=reales.get(estado, {}).get('cantidad', 0),
+                monto=reales.get(estado, {}).get('monto') or 0,
+            )
+            for estado in ESTADOS
+        ]
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('INGRESADO', 'Ingresado'), ('EN_REVISION', 'En revisión'), ('PRESUPUESTADO', 'Presupuestado'), ('REPARANDO', 'Reparando'), ('REPARADO', 'Reparado'), ('ENTREGADO', 'Entregado'), ('CANCELADO', 'Cancelado')], max_length=20, unique=True)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0003_correopendiente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['actualizado_en'], name='cliente_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['actualizado_en'], name='equipo_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenreparacion',
+            index=models.Index(fields=['actualizado_en'], name='orden_actualizado_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0004_actualizado_en'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ordenreparacion',
+            name='orden_actualizado_idx',
+        ),
+        migrations.AlterField(
+            model_name='equipo',
+            name='cliente',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='equipos', to='taller.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='ordenreparacion',
+            name='tecnico_asignado',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes_asignadas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['creado_en', 'id'], name='cliente_creado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['creado_en', 'id'], name='equipo_creado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['cliente', 'actualizado_en'], name='equipo_cliente_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenreparacion',
+            index=models.Index(fields=['actualizado_en', 'id'], name='orden_actualizado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenreparacion',
+            index=models.Index(fields=['creado_en', 'id'], name='orden_creado_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenreparacion',
+            index=models.Index(fields=['estado', 'actualizado_en'], name='orden_estado_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenreparacion',
+            index=models.Index(fields=['tecnico_asignado', 'estado'], name='orden_tecnico_estado_idx'),
+        ),
+    ]
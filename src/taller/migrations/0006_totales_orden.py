@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    OrdenReparacion = apps.get_model('taller', 'OrdenReparacion')
+    OrdenRepuesto = apps.get_model('taller', 'OrdenRepuesto')
+    lineas = (
+        OrdenRepuesto.objects.filter(orden=OuterRef('pk'))
+        .order_by()
+        .values('orden')
+        .annotate(total=Sum(F('cantidad') * F('precio_unitario')))
+        .values('total')
+    )
+    OrdenReparacion.objects.filter(pk__in=OrdenRepuesto.objects.values('orden')).update(
+        total_repuestos=Coalesce(Subquery(lineas[:1]), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0005_indices_acceso'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordenreparacion',
+            name='total_repuestos',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='ordenreparacion',
+            name='total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('precio_estimado'), '+', models.F('total_repuestos')), output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+    ]
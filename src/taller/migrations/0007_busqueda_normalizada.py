@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar(texto):
+    # Copia de core.busqueda.normalizar al momento de la migración.
+    sin_tildes = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]', '', sin_tildes.lower())
+
+
+def _completar(modelo, campos):
+    pendientes = []
+    for objeto in modelo.objects.iterator(chunk_size=2000):
+        for destino, origenes in campos.items():
+            largo = modelo._meta.get_field(destino).max_length
+            valor = " ".join(getattr(objeto, origen) or "" for origen in origenes)
+            setattr(objeto, destino, normalizar(valor)[:largo])
+        pendientes.append(objeto)
+        if len(pendientes) == 2000:
+            modelo.objects.bulk_update(pendientes, list(campos))
+            pendientes = []
+    modelo.objects.bulk_update(pendientes, list(campos))
+
+
+def completar_busqueda(apps, schema_editor):
+    _completar(
+        apps.get_model('taller', 'Cliente'),
+        {'nombre_busqueda': ('nombre',), 'telefono_busqueda': ('telefono',)},
+    )
+    _completar(
+        apps.get_model('taller', 'Equipo'),
+        {
+            'marca_modelo_busqueda': ('marca', 'modelo'),
+            'modelo_busqueda': ('modelo',),
+            'serie_busqueda': ('numero_serie',),
+        },
+    )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taller', '0006_totales_orden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='nombre_busqueda',
+            field=models.CharField(default='', editable=False, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefono_busqueda',
+            field=models.CharField(default='', editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='marca_modelo_busqueda',
+            field=models.CharField(default='', editable=False, max_length=160),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='modelo_busqueda',
+            field=models.CharField(default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='serie_busqueda',
+            field=models.CharField(default='', editable=False, max_length=120),
+        ),
+        migrations.RunPython(completar_busqueda, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nombre_busqueda'], name='cliente_nombre_busq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['telefono_busqueda'], name='cliente_telefono_busq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['marca_modelo_busqueda'], name='equipo_marca_modelo_busq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['modelo_busqueda'], name='equipo_modelo_busq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['serie_busqueda'], name='equipo_serie_busq_idx'),
+        ),
+    ]
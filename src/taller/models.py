@@ -1,33 +1,71 @@
 import uuid
-from io import BytesIO
 
-import qrcode
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.exceptions import ValidationError
 from django.db import models, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from inventario.models import MovimientoStock
+from core.busqueda import ConBusqueda
+from core.cache import invalidar_familia
+from inventario.models import Repuesto, ReservaStock
+from taller import qr, seguimiento
 
 
-class Cliente(models.Model):
+class Cliente(ConBusqueda, models.Model):
     nombre = models.CharField(max_length=120)
     telefono = models.CharField(max_length=30)
     email = models.EmailField(blank=True)
     direccion = models.CharField(max_length=180, blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    nombre_busqueda = models.CharField(max_length=120, editable=False, default="")
+    telefono_busqueda = models.CharField(max_length=30, editable=False, default="")
+
+    CAMPOS_BUSQUEDA = {"nombre_busqueda": "nombre", "telefono_busqueda": "telefono"}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["actualizado_en"], name="cliente_actualizado_idx"),
+            models.Index(fields=["creado_en", "id"], name="cliente_creado_id_idx"),
+            models.Index(fields=["nombre_busqueda"], name="cliente_nombre_busq_idx"),
+            models.Index(fields=["telefono_busqueda"], name="cliente_telefono_busq_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.telefono}"
 
 
-class Equipo(models.Model):
-    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="equipos")
+class Equipo(ConBusqueda, models.Model):
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="equipos", db_index=False)
     tipo = models.CharField(max_length=60, default="Notebook")
     marca = models.CharField(max_length=80)
     modelo = models.CharField(max_length=80)
     numero_serie = models.CharField(max_length=120, blank=True)
     observaciones_ingreso = models.TextField(blank=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    marca_modelo_busqueda = models.CharField(max_length=160, editable=False, default="")
+    modelo_busqueda = models.CharField(max_length=80, editable=False, default="")
+    serie_busqueda = models.CharField(max_length=120, editable=False, default="")
+
+    CAMPOS_BUSQUEDA = {
+        "marca_modelo_busqueda": "marca+modelo",
+        "modelo_busqueda": "modelo",
+        "serie_busqueda": "numero_serie",
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["actualizado_en"], name="equipo_actualizado_idx"),
+            models.Index(fields=["creado_en", "id"], name="equipo_creado_id_idx"),
+            # Cubre la FK y la versión del listado (MAX de actualizado_en junto al del cliente).
+            models.Index(fields=["cliente", "actualizado_en"], name="equipo_cliente_actualizado_idx"),
+            models.Index(fields=["marca_modelo_busqueda"], name="equipo_marca_modelo_busq_idx"),
+            models.Index(fields=["modelo_busqueda"], name="equipo_modelo_busq_idx"),
+            models.Index(fields=["serie_busqueda"], name="equipo_serie_busq_idx"),
+        ]
 
     def __str__(self):
         return f"{self.tipo} {self.marca} {self.modelo}"
@@ -43,6 +81,19 @@ class OrdenReparacion(models.Model):
         ENTREGADO = "ENTREGADO", "Entregado"
         CANCELADO = "CANCELADO", "Cancelado"
 
+    TRANSICIONES_PERMITIDAS = {
+        Estado.INGRESADO: (Estado.EN_REVISION, Estado.PRESUPUESTADO, Estado.REPARANDO, Estado.CANCELADO),
+        Estado.EN_REVISION: (Estado.PRESUPUESTADO, Estado.REPARANDO, Estado.CANCELADO),
+        Estado.PRESUPUESTADO: (Estado.EN_REVISION, Estado.REPARANDO, Estado.CANCELADO),
+        Estado.REPARANDO: (Estado.EN_REVISION, Estado.REPARADO, Estado.CANCELADO),
+        Estado.REPARADO: (Estado.ENTREGADO,),
+        Estado.ENTREGADO: (),
+        Estado.CANCELADO: (),
+    }
+    CAMPOS_MANTENIDOS_APARTE = ("total_repuestos", "stock_descontado", "qr_imagen")
+    # Solo estas órdenes reservan stock: en REPARADO ya se descontó y al cancelar se libera.
+    ESTADOS_CON_RESERVA = (Estado.INGRESADO, Estado.EN_REVISION, Estado.PRESUPUESTADO, Estado.REPARANDO)
+
     equipo = models.ForeignKey(Equipo, on_delete=models.PROTECT, related_name="ordenes")
     tecnico_asignado = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -50,10 +101,18 @@ class OrdenReparacion(models.Model):
         null=True,
         blank=True,
         related_name="ordenes_asignadas",
+        db_index=False,
     )
     problema_reportado = models.TextField()
     diagnostico = models.TextField(blank=True)
     precio_estimado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Suma de las líneas de repuestos; la mantiene recalcular_totales cuando cambian.
+    total_repuestos = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    total = models.GeneratedField(
+        expression=F("precio_estimado") + F("total_repuestos"),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+    )
     estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.INGRESADO)
     stock_descontado = models.BooleanField(default=False)
     qr_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
@@ -61,48 +120,227 @@ class OrdenReparacion(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Los listados paginan por (fecha, id); el índice de técnico también cubre la FK.
+        indexes = [
+            models.Index(fields=["actualizado_en", "id"], name="orden_actualizado_id_idx"),
+            models.Index(fields=["creado_en", "id"], name="orden_creado_id_idx"),
+            models.Index(fields=["estado", "actualizado_en"], name="orden_estado_actualizado_idx"),
+            models.Index(fields=["tecnico_asignado", "estado"], name="orden_tecnico_estado_idx"),
+        ]
+
     def __str__(self):
         return f"Orden #{self.pk} - {self.equipo}"
 
     @property
     def url_seguimiento(self):
-        base = settings.SITE_BASE_URL.rstrip("/")
-        return f"{base}/seguimiento/{self.qr_token}/"
+        return qr.url_seguimiento(self.qr_token)
 
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        if is_new or not self.qr_imagen:
-            self.generar_qr()
-
-    def generar_qr(self):
-        qr_img = qrcode.make(self.url_seguimiento)
-        buffer = BytesIO()
-        qr_img.save(buffer, format="PNG")
-        self.qr_imagen.save(
-            f"orden_{self.pk}.png",
-            ContentFile(buffer.getvalue()),
-            save=False,
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._guardar_originales()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._guardar_originales()
+
+    def _guardar_originales(self):
+        self._estado_original = self.__dict__.get("estado")
+        self._precio_original = self.__dict__.get("precio_estimado")
+
+    @property
+    def estado_original(self):
+        if self._state.adding:
+            return None
+        return getattr(self, "_estado_original", None)
+
+    @classmethod
+    def recalcular_totales(cls, ids):
+        # Un UPDATE con subconsulta correlacionada: no trae las líneas a Python y no
+        # depende de lo que cada proceso tenga en memoria.
+        lineas = (
+            OrdenRepuesto.objects.filter(orden=OuterRef("pk"))
+            .order_by()
+            .values("orden")
+            .annotate(total=Sum(F("cantidad") * F("precio_unitario")))
+            .values("total")
+        )
+        return cls.objects.filter(pk__in=ids).update(
+            total_repuestos=Coalesce(
+                Subquery(lineas[:1]), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
         )
-        super().save(update_fields=["qr_imagen"])
 
-    @transaction.atomic
-    def descontar_stock_repuestos(self):
-        if self.stock_descontado:
+    @property
+    def admite_repuestos(self):
+        return (self.estado_original or self.estado) in self.ESTADOS_CON_RESERVA
+
+    def transiciones_posibles(self):
+        return self.TRANSICIONES_PERMITIDAS.get(self.estado_original or self.estado, ())
+
+    def puede_transicionar(self, nuevo_estado):
+        original = self.estado_original
+        return original is None or nuevo_estado == original or nuevo_estado in self.TRANSICIONES_PERMITIDAS.get(original, ())
+
+    def clean(self):
+        super().clean()
+        if not self.puede_transicionar(self.estado):
+            raise ValidationError(
+                {
+                    "estado": (
+                        f"No se puede pasar de {self.Estado(self.estado_original).label} "
+                        f"a {self.Estado(self.estado).label}."
+                    )
+                }
+            )
+
+    def _leer_originales(self):
+        if self._state.adding:
+            return None, None
+        estado = getattr(self, "_estado_original", None)
+        precio = getattr(self, "_precio_original", None)
+        if estado is None or precio is None:
+            previo = OrdenReparacion.objects.filter(pk=self.pk).values_list("estado", "precio_estimado").first()
+            if previo:
+                estado, precio = previo
+        return estado, precio
+
+    def _campos_editables(self):
+        # total_repuestos, stock_descontado y qr_imagen los escriben recalcular_totales,
+        # descontar_stock_repuestos y el QR con UPDATE propios: una instancia vieja no los pisa.
+        return [
+            campo.name
+            for campo in self._meta.concrete_fields
+            if not campo.primary_key and not campo.generated and campo.name not in self.CAMPOS_MANTENIDOS_APARTE
+        ]
+
+    def save(self, *args, **kwargs):
+        estado_anterior, precio_anterior = self._leer_originales()
+        if estado_anterior is not None and not kwargs.get("update_fields"):
+            kwargs["update_fields"] = self._campos_editables()
+        if estado_anterior == self.estado and precio_anterior == self.precio_estimado:
+            # Sin cambios de estado ni de precio no hay contadores que tocar: un solo UPDATE, que
+            # además no escribe esas columnas para no pisar una transición hecha en paralelo.
+            kwargs["update_fields"] = [
+                campo for campo in kwargs["update_fields"] if campo not in ("estado", "precio_estimado")
+            ]
+            super().save(*args, **kwargs)
+            self._aplicar_transicion(estado_anterior, precio_anterior)
             return
+        with transaction.atomic():
+            if estado_anterior is not None:
+                # Los contadores se mueven desde lo que hay en la base: con la fila bloqueada,
+                # dos guardados en paralelo no descuentan dos veces el mismo estado.
+                actual = (
+                    OrdenReparacion.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list("estado", "precio_estimado")
+                    .first()
+                )
+                if actual:
+                    if actual[0] != estado_anterior:
+                        raise ValidationError("La orden cambió de estado mientras se editaba. Recargá e intentá de nuevo.")
+                    precio_anterior = actual[1]
+            super().save(*args, **kwargs)
+            self._aplicar_transicion(estado_anterior, precio_anterior)
 
-        items = self.repuestos.select_related("repuesto")
-        for item in items:
-            item.repuesto.descontar_stock(item.cantidad)
-            MovimientoStock.objects.create(
-                repuesto=item.repuesto,
-                tipo=MovimientoStock.Tipo.SALIDA,
-                cantidad=item.cantidad,
-                motivo=f"Orden de reparación #{self.pk}",
+    def transicionar(self, nuevo_estado, **campos):
+        estado_anterior, precio_anterior = self._leer_originales()
+        if estado_anterior is None:
+            raise ValidationError("La orden tiene que estar guardada para cambiar de estado.")
+        if nuevo_estado not in self.TRANSICIONES_PERMITIDAS.get(estado_anterior, ()):
+            raise ValidationError(
+                f"No se puede pasar de {self.Estado(estado_anterior).label} a {self.Estado(nuevo_estado).label}."
             )
 
+        campos["estado"] = nuevo_estado
+        campos["actualizado_en"] = timezone.now()
+        with transaction.atomic():
+            # El filtro por estado evita pisar una transición hecha en paralelo.
+            actualizadas = OrdenReparacion.objects.filter(pk=self.pk, estado=estado_anterior).update(**campos)
+            if not actualizadas:
+                raise ValidationError("La orden cambió de estado mientras se editaba. Recargá e intentá de nuevo.")
+            for campo, valor in campos.items():
+                setattr(self, campo, valor)
+            self._aplicar_transicion(estado_anterior, precio_anterior)
+
+    def _aplicar_transicion(self, estado_anterior, precio_anterior):
+        # Importes diferidos: estos módulos dependen de los modelos de este archivo.
+        from taller import estadisticas, notificaciones
+
+        estadisticas.registrar_cambio(estado_anterior, precio_anterior, self.estado, self.precio_estimado)
+
+        if self.estado == self.Estado.CANCELADO and estado_anterior not in (None, self.Estado.CANCELADO):
+            self.liberar_reservas()
+        if self.estado == self.Estado.REPARADO and estado_anterior != self.estado and not self.stock_descontado:
+            # Dentro de la transacción de la transición, con la orden ya bloqueada: si falta
+            # stock, la excepción deshace también el cambio de estado.
+            self.descontar_stock_repuestos()
+        if estado_anterior is not None and estado_anterior != self.estado:
+            notificaciones.notificar_cambio_estado(self)
+
+        seguimiento.invalidar([self.qr_token])
+        invalidar_familia("ordenes")
+        self._guardar_originales()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+    @transaction.atomic
+    def descontar_stock_repuestos(self):
+        # Marcar primero la orden hace la operación idempotente aunque dos requests la disparen a la vez.
+        if not OrdenReparacion.objects.filter(pk=self.pk, stock_descontado=False).update(stock_descontado=True):
+            self.stock_descontado = True
+            return
+
+        Repuesto.descontar_en_bloque(
+            self.repuestos.values_list("repuesto_id", "cantidad"),
+            motivo=f"Orden de reparación #{self.pk}",
+            reservado=self._reservas_activas(),
+        )
+        self.reservas.filter(estado=ReservaStock.Estado.ACTIVA).update(
+            estado=ReservaStock.Estado.CONSUMIDA,
+            actualizado_en=timezone.now(),
+        )
         self.stock_descontado = True
-        super().save(update_fields=["stock_descontado"])
+
+    def _reservas_activas(self):
+        return dict(
+            self.reservas.filter(estado=ReservaStock.Estado.ACTIVA)
+            .order_by()
+            .values("repuesto_id")
+            .annotate(total=Sum("cantidad"))
+            .values_list("repuesto_id", "total")
+        )
+
+    @transaction.atomic
+    def reservar_repuestos(self, items):
+        # El lock de la orden ordena la reserva contra una transición en paralelo: si la orden
+        # se cierra o se cancela primero, la reserva no queda colgada.
+        items = [item for item in items if item.cantidad]
+        if not items:
+            return
+        estado = OrdenReparacion.objects.select_for_update().filter(pk=self.pk).values_list("estado", flat=True).first()
+        if estado not in self.ESTADOS_CON_RESERVA:
+            raise ValidationError("La orden está cerrada: no admite repuestos nuevos.")
+        Repuesto.reservar_en_bloque((item.repuesto_id, item.cantidad) for item in items)
+        ReservaStock.objects.bulk_create(
+            [ReservaStock(orden=self, repuesto_id=item.repuesto_id, cantidad=item.cantidad) for item in items]
+        )
+
+    @transaction.atomic
+    def liberar_reservas(self):
+        activas = self._reservas_activas()
+        if not activas:
+            return
+        Repuesto.liberar_en_bloque(activas)
+        self.reservas.filter(estado=ReservaStock.Estado.ACTIVA).update(
+            estado=ReservaStock.Estado.LIBERADA,
+            actualizado_en=timezone.now(),
+        )
 
 
 class OrdenRepuesto(models.Model):
@@ -115,4 +353,37 @@ class OrdenRepuesto(models.Model):
         return f"{self.repuesto.nombre} x{self.cantidad} (Orden #{self.orden_id})"
 
     def subtotal(self):
-        return self.cantidad * self.precio_unitario
\ No newline at end of file
+        return self.cantidad * self.precio_unitario
+
+
+class EstadisticaEstado(models.Model):
+    estado = models.CharField(max_length=20, choices=OrdenReparacion.Estado.choices, unique=True)
+    cantidad = models.IntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_estado_display()}: {self.cantidad} (${self.monto})"
+
+
+class CorreoPendiente(models.Model):
+    class Estado(models.TextChoices):
+        PENDIENTE = "PENDIENTE", "Pendiente"
+        ENVIADO = "ENVIADO", "Enviado"
+        FALLIDO = "FALLIDO", "Fallido"
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    mensaje = models.TextField()
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["estado", "proximo_intento"], name="correo_pendiente_cola_idx")]
+
+    def __str__(self):
+        return f"{self.asunto} → {self.destinatario} ({self.get_estado_display()})"
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from taller.models import CorreoPendiente
+
+
+TAMANO_LOTE = 50
+MAX_INTENTOS = 5
+BACKOFF_SEGUNDOS = 60
+RESERVA_SEGUNDOS = 300
+
+
+def encolar_correo(destinatario, asunto, mensaje):
+    # Se llama dentro de la transacción del cambio que avisa: el correo se confirma o se descarta
+    # junto con ese cambio, y el worker solo ve los confirmados.
+    return CorreoPendiente.objects.create(destinatario=destinatario, asunto=asunto, mensaje=mensaje)
+
+
+def notificar_cambio_estado(orden):
+    cliente = orden.equipo.cliente
+    if not cliente.email:
+        return
+    encolar_correo(
+        cliente.email,
+        f"Actualización de tu equipo - Orden #{orden.pk}",
+        (
+            f"Hola {cliente.nombre},\n\n"
+            f"Tu equipo ({orden.equipo}) cambió a estado: {orden.get_estado_display()}.\n"
+            f"Podés seguir el detalle aquí: {orden.url_seguimiento}\n\n"
+            "Malargüe Tech"
+        ),
+    )
+
+
+def _reservar_lote(tamano):
+    ahora = timezone.now()
+    with transaction.atomic():
+        pendientes = CorreoPendiente.objects.filter(
+            estado=CorreoPendiente.Estado.PENDIENTE,
+            proximo_intento__lte=ahora,
+        ).order_by("proximo_intento", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            pendientes = pendientes.select_for_update(skip_locked=True)
+        lote = list(pendientes[:tamano])
+        if lote:
+            # Mientras el worker envía, otro worker no vuelve a tomar estos correos.
+            CorreoPendiente.objects.filter(pk__in=[correo.pk for correo in lote]).update(
+                proximo_intento=ahora + timedelta(seconds=RESERVA_SEGUNDOS)
+            )
+    return lote
+
+
+def procesar_lote(tamano=TAMANO_LOTE, max_intentos=MAX_INTENTOS, backoff=BACKOFF_SEGUNDOS):
+    lote = _reservar_lote(tamano)
+    if not lote:
+        return {"enviados": 0, "reintentos": 0, "fallidos": 0}
+
+    enviados, reintentos, fallidos = [], [], []
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as exc:
+        error_conexion = exc
+    else:
+        error_conexion = None
+
+    try:
+        for correo in lote:
+            error = error_conexion
+            if error is None:
+                try:
+                    EmailMessage(
+                        subject=correo.asunto,
+                        body=correo.mensaje,
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        to=[correo.destinatario],
+                        connection=conexion,
+                    ).send()
+                except Exception as exc:
+                    error = exc
+
+            ahora = timezone.now()
+            if error is None:
+                correo.estado = CorreoPendiente.Estado.ENVIADO
+                correo.enviado_en = ahora
+                correo.ultimo_error = ""
+                enviados.append(correo)
+                continue
+
+            correo.intentos += 1
+            correo.ultimo_error = f"{type(error).__name__}: {error}"
+            if correo.intentos >= max_intentos:
+                correo.estado = CorreoPendiente.Estado.FALLIDO
+                fallidos.append(correo)
+            else:
+                correo.proximo_intento = ahora + timedelta(seconds=backoff * 2 ** (correo.intentos - 1))
+                reintentos.append(correo)
+    finally:
+        if error_conexion is None:
+            conexion.close()
+
+    CorreoPendiente.objects.bulk_update(
+        enviados + reintentos + fallidos,
+        ["estado", "intentos", "proximo_intento", "ultimo_error", "enviado_en"],
+    )
+    return {"enviados": len(enviados), "reintentos": len(reintentos), "fallidos": len(fallidos)}
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+POR_PAGINA = 24
+
+
+class PaginaKeyset:
+    def __init__(self, items, siguiente=None, anterior=None, parametros=None):
+        self.items = items
+        self.siguiente = siguiente
+        self.anterior = anterior
+        self.parametros = parametros or {}
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def hay_otras_paginas(self):
+        return bool(self.siguiente or self.anterior)
+
+    @property
+    def url_siguiente(self):
+        return self._url("despues", self.siguiente)
+
+    @property
+    def url_anterior(self):
+        return self._url("antes", self.anterior)
+
+    def _url(self, clave, token):
+        if not token:
+            return ""
+        parametros = {k: v for k, v in self.parametros.items() if k not in {"despues", "antes"}}
+        parametros[clave] = token
+        return f"?{urlencode(parametros)}"
+
+
+def _campos(orden):
+    return [(campo.lstrip("-"), campo.startswith("-")) for campo in orden]
+
+
+def codificar_cursor(obj, orden):
+    valores = []
+    for nombre, _desc in _campos(orden):
+        field = obj._meta.get_field(nombre)
+        valores.append(field.value_to_string(obj))
+    raw = json.dumps(valores, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decodificar_cursor(token, model, orden):
+    # Cualquier token que no sea el que arma codificar_cursor (una lista de textos, uno por
+    # campo) es inválido y se trata igual: sin cursor, primera página.
+    try:
+        padding = "=" * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    campos = _campos(orden)
+    if (
+        not isinstance(valores, list)
+        or len(valores) != len(campos)
+        or not all(isinstance(valor, str) for valor in valores)
+    ):
+        return None
+    try:
+        convertidos = [
+            model._meta.get_field(nombre).to_python(valor) for (nombre, _desc), valor in zip(campos, valores)
+        ]
+    except (ValidationError, TypeError, ValueError):
+        return None
+    if any(valor is None for valor in convertidos):
+        return None
+    return convertidos
+
+
+def _filtro_posterior(orden, valores, invertir=False):
+    # (a, b) > (x, y) se expresa como a > x OR (a = x AND b > y), respetando
+    # la dirección de cada columna para que el motor use el índice compuesto.
+    filtro = Q()
+    iguales = {}
+    for (nombre, desc), valor in zip(_campos(orden), valores):
+        operador = "lt" if desc != invertir else "gt"
+        filtro |= Q(**iguales, **{f"{nombre}__{operador}": valor})
+        iguales[nombre] = valor
+    return filtro
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith("-") else f"-{campo}" for campo in orden]
+
+
+def paginar_keyset(request, queryset, orden=("-creado_en", "-id"), por_pagina=POR_PAGINA):
+    orden = list(orden)
+    model = queryset.model
+    despues = request.GET.get("despues")
+    antes = request.GET.get("antes")
+
+    cursor = None
+    hacia_atras = False
+    if despues:
+        cursor = decodificar_cursor(despues, model, orden)
+    elif antes:
+        cursor = decodificar_cursor(antes, model, orden)
+        hacia_atras = cursor is not None
+
+    if hacia_atras:
+        qs = queryset.filter(_filtro_posterior(orden, cursor, invertir=True)).order_by(*_invertir(orden))
+    elif cursor is not None:
+        qs = queryset.filter(_filtro_posterior(orden, cursor)).order_by(*orden)
+    else:
+        qs = queryset.order_by(*orden)
+
+    filas = list(qs[: por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    siguiente = anterior = None
+    if filas:
+        if hacia_atras:
+            siguiente = codificar_cursor(filas[-1], orden)
+            if hay_mas:
+                anterior = codificar_cursor(filas[0], orden)
+        else:
+            if hay_mas:
+                siguiente = codificar_cursor(filas[-1], orden)
+            if cursor is not None:
+                anterior = codificar_cursor(filas[0], orden)
+
+    return PaginaKeyset(filas, siguiente=siguiente, anterior=anterior, parametros=request.GET.dict())
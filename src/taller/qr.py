@@ -0,0 +1,54 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+FORMATOS = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+# Acotado aunque el contenido no cambie: lo que se borra sin señales (DELETE masivos) también
+# termina saliendo de la caché.
+CACHE_SEGUNDOS = 60 * 60 * 24
+
+
+def url_seguimiento(token):
+    base = settings.SITE_BASE_URL.rstrip("/")
+    return f"{base}/seguimiento/{token}/"
+
+
+def renderizar(url, formato):
+    # qrcode y PIL se importan recién cuando hace falta dibujar un código.
+    import qrcode
+
+    if formato == "svg":
+        import qrcode.image.svg
+
+        return qrcode.make(url, image_factory=qrcode.image.svg.SvgPathImage).to_string()
+
+    buffer = BytesIO()
+    qrcode.make(url).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def etag(token, formato):
+    huella = hashlib.sha1(f"{url_seguimiento(token)}|{formato}".encode()).hexdigest()[:20]
+    return f'"qr-{huella}"'
+
+
+def clave_cache(token, formato):
+    return f"qr:{formato}:{etag(token, formato).strip(chr(34))}"
+
+
+def invalidar(token):
+    # Como en seguimiento.invalidar: se borra ya y de nuevo al confirmar.
+    claves = [clave_cache(token, formato) for formato in FORMATOS]
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def nombre_archivo(orden_id):
+    return f"qr/orden_{orden_id}.png"
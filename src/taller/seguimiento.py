@@ -0,0 +1,38 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import invalidar_familia
+
+
+CACHE_SEGUNDOS = 60 * 60 * 24
+
+
+def clave_cache(token):
+    return f"seguimiento:{token}"
+
+
+def invalidar(tokens):
+    claves = [clave_cache(token) for token in tokens if token]
+    if not claves:
+        return
+    # Se borra ya y de nuevo al confirmar: un request concurrente podría volver a
+    # guardar la versión vieja antes de que termine la transacción.
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def tocar_ordenes(ordenes):
+    tokens = list(ordenes.values_list("qr_token", flat=True))
+    if tokens:
+        ordenes.model.objects.filter(qr_token__in=tokens).update(actualizado_en=timezone.now())
+        invalidar(tokens)
+        invalidar_familia("ordenes")
+
+
+def invalidar_ordenes(ordenes):
+    # Para cambios del cliente o del equipo: las órdenes no se tocan (actualizado_en ordena
+    # el panel y los listados), solo se descartan las copias en caché. Las versiones de las
+    # páginas ya incluyen el actualizado_en del equipo y del cliente.
+    invalidar(list(ordenes.values_list("qr_token", flat=True)))
+    invalidar_familia("ordenes")
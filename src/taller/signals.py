@@ -1,43 +1,50 @@
-from django.core.mail import send_mail
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
-from taller.models import OrdenReparacion
-
-
-@receiver(pre_save, sender=OrdenReparacion)
-def registrar_estado_anterior(sender, instance, **kwargs):
-    if not instance.pk:
-        instance._estado_anterior = None
-        return
-    previo = OrdenReparacion.objects.filter(pk=instance.pk).only("estado").first()
-    instance._estado_anterior = previo.estado if previo else None
-
-
-@receiver(post_save, sender=OrdenReparacion)
-def flujo_automatico_orden(sender, instance, created, **kwargs):
-    estado_anterior = getattr(instance, "_estado_anterior", None)
-    cambio_estado = estado_anterior is not None and estado_anterior != instance.estado
-
-    if instance.estado == OrdenReparacion.Estado.REPARADO and not instance.stock_descontado:
-        instance.descontar_stock_repuestos()
-
-    if not cambio_estado:
-        return
-
-    cliente_email = instance.equipo.cliente.email
-    if not cliente_email:
-        return
-
-    send_mail(
-        subject=f"Actualización de tu equipo - Orden #{instance.pk}",
-        message=(
-            f"Hola {instance.equipo.cliente.nombre},\n\n"
-            f"Tu equipo ({instance.equipo}) cambió a estado: {instance.get_estado_display()}.\n"
-            f"Podés seguir el detalle aquí: {instance.url_seguimiento}\n\n"
-            "Malargüe Tech"
-        ),
-        from_email=None,
-        recipient_list=[cliente_email],
-        fail_silently=True,
-    )
\ No newline at end of file
+from core.cache import invalidar_familia
+from taller import estadisticas, qr, seguimiento
+from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
+
+
+@receiver(pre_delete, sender=OrdenReparacion)
+def liberar_reservas_orden(sender, instance, **kwargs):
+    instance.liberar_reservas()
+
+
+@receiver(post_delete, sender=OrdenReparacion)
+def descontar_estadisticas_orden(sender, instance, **kwargs):
+    estadisticas.registrar_cambio(instance.estado, instance.precio_estimado, None, None)
+
+
+@receiver(post_delete, sender=OrdenReparacion)
+def invalidar_seguimiento_orden(sender, instance, **kwargs):
+    seguimiento.invalidar([instance.qr_token])
+    qr.invalidar(instance.qr_token)
+    invalidar_familia("ordenes")
+
+
+@receiver(post_save, sender=OrdenRepuesto)
+@receiver(post_delete, sender=OrdenRepuesto)
+def tocar_orden_de_repuesto(sender, instance, **kwargs):
+    OrdenReparacion.recalcular_totales([instance.orden_id])
+    seguimiento.tocar_ordenes(OrdenReparacion.objects.filter(pk=instance.orden_id))
+
+
+@receiver(post_save, sender=Equipo)
+def invalidar_ordenes_de_equipo(sender, instance, created, **kwargs):
+    if not created:
+        seguimiento.invalidar_ordenes(OrdenReparacion.objects.filter(equipo=instance))
+
+
+@receiver(post_save, sender=Cliente)
+def invalidar_ordenes_de_cliente(sender, instance, created, **kwargs):
+    if not created:
+        seguimiento.invalidar_ordenes(OrdenReparacion.objects.filter(equipo__cliente=instance))
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Equipo)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Equipo)
+def invalidar_cache_clientes(sender, **kwargs):
+    invalidar_familia("clientes")
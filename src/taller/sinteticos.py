@@ -0,0 +1,333 @@
+import random
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import invalidar_familia
+from inventario.models import MovimientoStock, Repuesto, ReservaStock, SnapshotStock
+from taller import estadisticas
+from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
+
+
+LOTE = 5000
+DOMINIO = "@sintetico.local"
+PREFIJO_SKU = "SIN-"
+
+# Por unidad de escala. --scale 5000 ronda el millón de órdenes.
+CLIENTES = 100
+REPUESTOS = 50
+ORDENES = 200
+DIAS_HISTORIA = 730
+
+NOMBRES = ["Juan", "María", "Lucas", "Sofía", "Martín", "Valentina", "Diego", "Camila", "Pedro", "Lucía", "Tomás", "Ana"]
+APELLIDOS = ["Pérez", "Gómez", "Díaz", "Fernández", "López", "Martínez", "Sosa", "Romero", "Torres", "Álvarez"]
+EQUIPOS = [
+    ("Notebook", "Lenovo", ["ThinkPad T14", "IdeaPad 3", "Yoga 7"]),
+    ("Notebook", "HP", ["Pavilion 15", "EliteBook 840", "Victus 16"]),
+    ("Notebook", "Dell", ["Inspiron 15", "Latitude 5420", "Vostro 14"]),
+    ("PC", "Custom", ["Ryzen 5600", "Intel i5 12400", "Ryzen 7 5700X"]),
+    ("Celular", "Samsung", ["A54", "S21", "A14"]),
+    ("Impresora", "Epson", ["L3250", "L4260"]),
+]
+PROBLEMAS = [
+    "No enciende",
+    "Pantalla rota",
+    "Batería dura poco",
+    "Se reinicia solo",
+    "Teclado no responde",
+    "Muy lento",
+    "No carga",
+    "Hace ruido el ventilador",
+]
+REPUESTOS_BASE = ["SSD", "Memoria RAM", "Batería", "Cooler", "Pantalla", "Teclado", "Cargador", "Flex de video", "Pasta térmica"]
+
+# Distribución de estados de un taller con historia: la mayoría ya se entregó.
+PESOS_ESTADO = {
+    OrdenReparacion.Estado.INGRESADO: 6,
+    OrdenReparacion.Estado.EN_REVISION: 5,
+    OrdenReparacion.Estado.PRESUPUESTADO: 4,
+    OrdenReparacion.Estado.REPARANDO: 5,
+    OrdenReparacion.Estado.REPARADO: 4,
+    OrdenReparacion.Estado.ENTREGADO: 66,
+    OrdenReparacion.Estado.CANCELADO: 10,
+}
+ESTADOS_CONSUMIDOS = (OrdenReparacion.Estado.REPARADO, OrdenReparacion.Estado.ENTREGADO)
+ESTADOS_CERRADOS = (*ESTADOS_CONSUMIDOS, OrdenReparacion.Estado.CANCELADO)
+
+
+def _crear(modelo, objetos):
+    # bulk_create completa auto_now/auto_now_add con la hora actual: las fechas generadas se
+    # guardan antes y se reescriben con un bulk_update, que no pasa por pre_save.
+    campos = [
+        campo.attname
+        for campo in modelo._meta.concrete_fields
+        if getattr(campo, "auto_now", False) or getattr(campo, "auto_now_add", False)
+    ]
+    fechas = [[getattr(objeto, campo) for campo in campos] for objeto in objetos]
+    creados = modelo.objects.bulk_create(objetos)
+    if campos and creados:
+        for objeto, valores in zip(creados, fechas):
+            for campo, valor in zip(campos, valores):
+                setattr(objeto, campo, valor)
+        modelo.objects.bulk_update(creados, campos)
+    return creados
+
+
+def _en_lotes(objetos, modelo, lote):
+    creados = []
+    pendientes = []
+    for objeto in objetos:
+        # bulk_create no pasa por save(): las columnas de búsqueda se completan acá.
+        if hasattr(objeto, "completar_busqueda"):
+            objeto.completar_busqueda()
+        pendientes.append(objeto)
+        if len(pendientes) >= lote:
+            with transaction.atomic():
+                creados.extend(obj.pk for obj in _crear(modelo, pendientes))
+            pendientes = []
+    if pendientes:
+        with transaction.atomic():
+            creados.extend(obj.pk for obj in _crear(modelo, pendientes))
+    return creados
+
+
+def _numero(valor, prefijo, sufijo=""):
+    try:
+        return int(valor[len(prefijo) : len(valor) - len(sufijo)]) + 1
+    except (TypeError, ValueError):
+        return 0
+
+
+def _siguientes_numeros():
+    # Otra tanda sobre datos sintéticos previos sigue la numeración de SKU y emails.
+    sku = Repuesto.objects.filter(sku__startswith=PREFIJO_SKU).order_by("-sku").values_list("sku", flat=True).first()
+    email = (
+        Cliente.objects.filter(email__endswith=DOMINIO).order_by("-pk").values_list("email", flat=True).first()
+    )
+    return _numero(sku, PREFIJO_SKU), _numero(email, "cliente", DOMINIO)
+
+
+def _fechas(alta):
+    return {"creado_en": alta, "actualizado_en": alta}
+
+
+def _precio(rng, minimo, maximo):
+    return Decimal(rng.randrange(minimo, maximo, 500))
+
+
+def generar(escala=1, semilla=0, tecnicos=(), lote=LOTE, log=None):
+    # Cada lote se confirma por separado: a escala grande no queda abierta una transacción de
+    # millones de filas. Si se corta a mitad, `seed_demo --reset` borra lo que haya quedado.
+    primer_repuesto, primer_cliente = _siguientes_numeros()
+    # Sobre datos previos la secuencia cambia también: los qr_token de la nueva tanda no se repiten.
+    previos = primer_repuesto or primer_cliente
+    rng = random.Random(f"{semilla}:{primer_repuesto}:{primer_cliente}" if previos else semilla)
+    ahora = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    tecnicos = [tecnico.pk for tecnico in tecnicos] or [None]
+    estados, pesos = zip(*PESOS_ESTADO.items())
+
+    def hace(dias):
+        return ahora - timedelta(days=dias, minutes=rng.randrange(24 * 60))
+
+    def avisar(texto):
+        if log:
+            log(texto)
+
+    total_clientes = CLIENTES * escala
+    clientes = _en_lotes(
+        (
+            Cliente(
+                nombre=f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                telefono=f"260{n:07d}",
+                email=f"cliente{n}{DOMINIO}",
+                direccion=f"Calle {rng.randrange(1, 200)} {rng.randrange(1, 3000)}",
+                **_fechas(hace(rng.randrange(DIAS_HISTORIA))),
+            )
+            for n in range(primer_cliente, primer_cliente + total_clientes)
+        ),
+        Cliente,
+        lote,
+    )
+    avisar(f"{len(clientes)} clientes")
+
+    # Cada cliente trae entre uno y tres equipos, con más peso en uno.
+    equipos = _en_lotes(
+        (
+            Equipo(
+                cliente_id=cliente_id,
+                tipo=tipo,
+                marca=marca,
+                modelo=rng.choice(modelos),
+                numero_serie=f"SN-{rng.getrandbits(40):010X}",
+                **_fechas(hace(rng.randrange(DIAS_HISTORIA))),
+            )
+            for cliente_id in clientes
+            for tipo, marca, modelos in rng.choices(EQUIPOS, k=rng.choices((1, 2, 3), weights=(70, 22, 8))[0])
+        ),
+        Equipo,
+        lote,
+    )
+    avisar(f"{len(equipos)} equipos")
+
+    repuestos = _en_lotes(
+        (
+            Repuesto(
+                nombre=f"{rng.choice(REPUESTOS_BASE)} {n}",
+                sku=f"{PREFIJO_SKU}{n:07d}",
+                stock_actual=0,
+                stock_minimo=rng.randrange(1, 6),
+                precio_unitario=_precio(rng, 5000, 150000),
+                actualizado_en=ahora,
+            )
+            for n in range(primer_repuesto, primer_repuesto + REPUESTOS * escala)
+        ),
+        Repuesto,
+        lote,
+    )
+    precios = dict(Repuesto.objects.filter(pk__in=repuestos).values_list("pk", "precio_unitario"))
+    avisar(f"{len(repuestos)} repuestos")
+
+    # Los repuestos más vendidos concentran el consumo (Pareto).
+    pesos_repuesto = [1 / (indice + 1) for indice in range(len(repuestos))]
+    consumidos = defaultdict(int)
+    reservados = defaultdict(int)
+    total_ordenes = 0
+    total_lineas = 0
+    restantes = ORDENES * escala
+    while restantes:
+        cantidad = min(lote, restantes)
+        restantes -= cantidad
+        specs = []
+        for _ in range(cantidad):
+            estado = rng.choices(estados, weights=pesos)[0]
+            # Las órdenes abiertas son recientes; las cerradas se reparten en toda la historia.
+            alta = hace(rng.randrange(30) if estado not in ESTADOS_CERRADOS else rng.randrange(DIAS_HISTORIA))
+            lineas = [
+                (repuesto_id, rng.choices((1, 2), weights=(85, 15))[0])
+                for repuesto_id in rng.choices(repuestos, weights=pesos_repuesto, k=rng.choices((0, 1, 2, 3), weights=(25, 45, 22, 8))[0])
+            ]
+            specs.append((estado, alta, lineas))
+
+        with transaction.atomic():
+            lineas_lote = _crear_ordenes(rng, specs, equipos, tecnicos, precios, ahora, consumidos, reservados)
+        total_ordenes += len(specs)
+        total_lineas += lineas_lote
+        avisar(f"{total_ordenes} órdenes, {total_lineas} líneas")
+
+    # El stock final sale del ledger: una entrada inicial que alcanza para todo lo
+    # consumido y reservado; las salidas de cada orden reparada o entregada ya se cargaron.
+    actualizados = []
+    movimientos = []
+    for repuesto_id in repuestos:
+        entrada = consumidos[repuesto_id] + reservados[repuesto_id] + rng.randrange(0, 40)
+        actualizados.append(
+            Repuesto(pk=repuesto_id, stock_actual=entrada - consumidos[repuesto_id], stock_reservado=reservados[repuesto_id])
+        )
+        movimientos.append(
+            MovimientoStock(
+                repuesto_id=repuesto_id,
+                tipo=MovimientoStock.Tipo.ENTRADA,
+                cantidad=entrada,
+                motivo="Stock inicial",
+                creado_en=hace(DIAS_HISTORIA),
+            )
+        )
+    with transaction.atomic():
+        for inicio in range(0, len(movimientos), lote):
+            _crear(MovimientoStock, movimientos[inicio : inicio + lote])
+        Repuesto.objects.bulk_update(actualizados, ["stock_actual", "stock_reservado"], batch_size=lote)
+    avisar("Stock y movimientos")
+
+    estadisticas.recalcular()
+    invalidar_familia("ordenes", "repuestos", "clientes")
+    return {
+        "clientes": len(clientes),
+        "equipos": len(equipos),
+        "repuestos": len(repuestos),
+        "ordenes": total_ordenes,
+        "lineas": total_lineas,
+    }
+
+
+def _crear_ordenes(rng, specs, equipos, tecnicos, precios, ahora, consumidos, reservados):
+    ordenes = _crear(
+        OrdenReparacion,
+        [
+            OrdenReparacion(
+                equipo_id=rng.choice(equipos),
+                tecnico_asignado_id=rng.choice(tecnicos),
+                problema_reportado=rng.choice(PROBLEMAS),
+                diagnostico="Diagnóstico cargado" if estado != OrdenReparacion.Estado.INGRESADO else "",
+                precio_estimado=_precio(rng, 10000, 250000),
+                estado=estado,
+                stock_descontado=estado in ESTADOS_CONSUMIDOS,
+                qr_token=uuid.UUID(int=rng.getrandbits(128), version=4),
+                creado_en=alta,
+                actualizado_en=(
+                    min(alta + timedelta(days=rng.randrange(15)), ahora) if estado in ESTADOS_CERRADOS else alta
+                ),
+            )
+            for estado, alta, _lineas in specs
+        ],
+    )
+    items = []
+    reservas = []
+    salidas = []
+    for orden, (estado, alta, lineas) in zip(ordenes, specs):
+        for repuesto_id, unidades in lineas:
+            items.append(
+                OrdenRepuesto(orden=orden, repuesto_id=repuesto_id, cantidad=unidades, precio_unitario=precios[repuesto_id])
+            )
+            if estado in ESTADOS_CONSUMIDOS:
+                consumidos[repuesto_id] += unidades
+                salidas.append(
+                    MovimientoStock(
+                        repuesto_id=repuesto_id,
+                        tipo=MovimientoStock.Tipo.SALIDA,
+                        cantidad=unidades,
+                        motivo=f"Orden de reparación #{orden.pk}",
+                        creado_en=alta,
+                    )
+                )
+            elif estado != OrdenReparacion.Estado.CANCELADO:
+                reservados[repuesto_id] += unidades
+                reservas.append(ReservaStock(orden=orden, repuesto_id=repuesto_id, cantidad=unidades, **_fechas(alta)))
+    OrdenRepuesto.objects.bulk_create(items)
+    OrdenReparacion.recalcular_totales([orden.pk for orden in ordenes])
+    _crear(ReservaStock, reservas)
+    _crear(MovimientoStock, salidas)
+    return len(items)
+
+
+@transaction.atomic
+def borrar_rapido(clientes, repuestos):
+    # DELETE directos en orden de dependencias: el collector del ORM traería cada fila
+    # (y sus relacionadas) a memoria antes de borrarla.
+    ordenes = OrdenReparacion.objects.filter(equipo__cliente__in=clientes)
+    borrados = 0
+    for queryset in (
+        ReservaStock.objects.filter(orden__in=ordenes),
+        OrdenRepuesto.objects.filter(orden__in=ordenes),
+        ordenes,
+        Equipo.objects.filter(cliente__in=clientes),
+        clientes,
+        ReservaStock.objects.filter(repuesto__in=repuestos),
+        SnapshotStock.objects.filter(repuesto__in=repuestos),
+        MovimientoStock.objects.filter(repuesto__in=repuestos),
+        repuestos,
+    ):
+        borrados += queryset._raw_delete(queryset.db)
+    estadisticas.recalcular()
+    invalidar_familia("ordenes", "repuestos", "clientes")
+    return borrados
+
+
+def borrar_sinteticos():
+    return borrar_rapido(
+        Cliente.objects.filter(email__endswith=DOMINIO),
+        Repuesto.objects.filter(sku__startswith=PREFIJO_SKU),
+    )
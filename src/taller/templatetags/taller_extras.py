@@ -0,0 +1,21 @@
+from django import template
+
+from taller.models import OrdenReparacion
+
+
+register = template.Library()
+
+BADGE_BY_ESTADO = {
+    OrdenReparacion.Estado.INGRESADO: "ingresado",
+    OrdenReparacion.Estado.EN_REVISION: "revision",
+    OrdenReparacion.Estado.PRESUPUESTADO: "presupuestado",
+    OrdenReparacion.Estado.REPARANDO: "reparando",
+    OrdenReparacion.Estado.REPARADO: "reparado",
+    OrdenReparacion.Estado.ENTREGADO: "entregado",
+    OrdenReparacion.Estado.CANCELADO: "cancelado",
+}
+
+
+@register.filter
+def badge_estado(estado):
+    return BADGE_BY_ESTADO.get(estado, "secondary")
@@ -1,10 +1,42 @@
+import base64
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core import mail
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from core import arranque, busqueda, replicas
+from core.cache import CacheDosNiveles, queryset_cacheado
+from inventario.models import MovimientoStock, Repuesto, ReservaStock
+from inventario import ledger
+from taller import auditoria, benchmark, carga, notificaciones, sinteticos
+from taller.management.commands.bootstrap import asegurar_superusuario
+from taller.forms import EquipoForm, EstadoOrdenForm
+from taller.models import Cliente, CorreoPendiente, Equipo, EstadisticaEstado, OrdenReparacion, OrdenRepuesto
 
-from inventario.models import MovimientoStock, Repuesto
-from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
+
+class BackendQueFalla(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP caído")
 
 
 class TallerFlujoTests(TestCase):
@@ -47,15 +79,18 @@ class TallerFlujoTests(TestCase):
             precio_unitario="30000.00",
         )
 
-        orden.estado = OrdenReparacion.Estado.REPARADO
-        orden.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            orden.estado = OrdenReparacion.Estado.REPARADO
+            orden.save()
 
         self.repuesto.refresh_from_db()
         orden.refresh_from_db()
 
         self.assertEqual(self.repuesto.stock_actual, 1)
         self.assertTrue(orden.stock_descontado)
-        self.assertEqual(MovimientoStock.objects.filter(repuesto=self.repuesto).count(), 1)
+        self.assertEqual(
+            MovimientoStock.objects.filter(repuesto=self.repuesto, tipo=MovimientoStock.Tipo.SALIDA).count(), 1
+        )
 
     def test_cambio_estado_envia_email(self):
         orden = OrdenReparacion.objects.create(
@@ -65,11 +100,18 @@ class TallerFlujoTests(TestCase):
             estado=OrdenReparacion.Estado.INGRESADO,
         )
 
-        orden.estado = OrdenReparacion.Estado.EN_REVISION
-        orden.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            orden.estado = OrdenReparacion.Estado.EN_REVISION
+            orden.save()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(CorreoPendiente.objects.count(), 1)
+
+        call_command("enviar_correos", stdout=StringIO())
 
         self.assertEqual(len(mail.outbox), 1)
         self.assertIn("Actualización de tu equipo", mail.outbox[0].subject)
+        self.assertEqual(CorreoPendiente.objects.get().estado, CorreoPendiente.Estado.ENVIADO)
 
     def test_seguimiento_publico_con_qr(self):
         orden = OrdenReparacion.objects.create(
@@ -87,4 +129,995 @@ class TallerFlujoTests(TestCase):
     def test_dashboard_requiere_autenticacion(self):
         response = self.client.get(reverse("dashboard"))
         self.assertEqual(response.status_code, 302)
-        self.assertIn("/cuentas/login/", response.url)
\ No newline at end of file
+        self.assertIn("/cuentas/login/", response.url)
+
+
+class ReservasStockTests(TestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username="tecnico", password="pass1234")
+        self.client.force_login(self.usuario)
+        cliente = Cliente.objects.create(nombre="Pablo", telefono="2604555555")
+        self.equipo = Equipo.objects.create(cliente=cliente, marca="Acer", modelo="Aspire")
+        self.repuesto = Repuesto.objects.create(nombre="Cargador", sku="CARG-1", stock_actual=3, precio_unitario="10.00")
+
+    def crear_orden(self, cantidad):
+        orden = OrdenReparacion.objects.create(equipo=self.equipo, problema_reportado="No carga")
+        item = OrdenRepuesto.objects.create(orden=orden, repuesto=self.repuesto, cantidad=cantidad, precio_unitario="10.00")
+        orden.reservar_repuestos([item])
+        return orden
+
+    def test_reserva_impide_prometer_dos_veces_el_mismo_repuesto(self):
+        self.crear_orden(2)
+
+        with self.assertRaises(ValidationError):
+            self.crear_orden(2)
+
+        self.repuesto.refresh_from_db()
+        self.assertEqual((self.repuesto.stock_reservado, self.repuesto.stock_disponible), (2, 1))
+
+    def test_cancelar_libera_y_reparado_consume_la_reserva(self):
+        cancelada = self.crear_orden(2)
+        cancelada.transicionar(OrdenReparacion.Estado.CANCELADO)
+        self.repuesto.refresh_from_db()
+        self.assertEqual(self.repuesto.stock_reservado, 0)
+
+        orden = self.crear_orden(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            orden.transicionar(OrdenReparacion.Estado.REPARANDO)
+            orden.transicionar(OrdenReparacion.Estado.REPARADO)
+
+        self.repuesto.refresh_from_db()
+        self.assertEqual((self.repuesto.stock_actual, self.repuesto.stock_reservado), (0, 0))
+        self.assertEqual(
+            set(ReservaStock.objects.values_list("estado", flat=True)),
+            {ReservaStock.Estado.LIBERADA, ReservaStock.Estado.CONSUMIDA},
+        )
+
+    def test_reparado_sin_stock_deshace_la_transicion(self):
+        orden = self.crear_orden(2)
+        orden.transicionar(OrdenReparacion.Estado.REPARANDO)
+        Repuesto.objects.filter(pk=self.repuesto.pk).update(stock_actual=1)
+
+        response = self.client.post(
+            reverse("orden_detalle", args=[orden.pk]),
+            {"action": "update_estado", "estado": OrdenReparacion.Estado.REPARADO, "precio_estimado": "0"},
+        )
+        self.assertContains(response, "Stock insuficiente")
+        self.assertEqual(response.context["orden"].estado, OrdenReparacion.Estado.REPARANDO)
+        response = self.client.post(
+            reverse("orden_edit", args=[orden.pk]),
+            {
+                "equipo": self.equipo.pk,
+                "problema_reportado": "No carga",
+                "precio_estimado": "0",
+                "estado": OrdenReparacion.Estado.REPARADO,
+            },
+        )
+        self.assertContains(response, "Stock insuficiente")
+
+        orden.refresh_from_db()
+        self.repuesto.refresh_from_db()
+        self.assertEqual((orden.estado, orden.stock_descontado), (OrdenReparacion.Estado.REPARANDO, False))
+        self.assertEqual((self.repuesto.stock_actual, self.repuesto.stock_reservado), (1, 2))
+        self.assertEqual(orden.reservas.get().estado, ReservaStock.Estado.ACTIVA)
+        self.assertFalse(MovimientoStock.objects.filter(tipo=MovimientoStock.Tipo.SALIDA).exists())
+        self.assertEqual(EstadisticaEstado.objects.get(estado=OrdenReparacion.Estado.REPARADO).cantidad, 0)
+
+    def test_ordenes_cerradas_no_admiten_repuestos(self):
+        cancelada = self.crear_orden(1)
+        cancelada.transicionar(OrdenReparacion.Estado.CANCELADO)
+        entregada = self.crear_orden(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            for estado in (OrdenReparacion.Estado.REPARANDO, OrdenReparacion.Estado.REPARADO, OrdenReparacion.Estado.ENTREGADO):
+                entregada.transicionar(estado)
+
+        for orden in (cancelada, entregada):
+            response = self.client.post(
+                reverse("orden_detalle", args=[orden.pk]),
+                {"action": "add_repuesto", "repuesto": self.repuesto.pk, "cantidad": "1", "precio_unitario": "10.00"},
+            )
+            self.assertRedirects(response, reverse("orden_detalle", args=[orden.pk]), fetch_redirect_response=False)
+            item = OrdenRepuesto(orden=orden, repuesto=self.repuesto, cantidad=1, precio_unitario="10.00")
+            with self.assertRaises(ValidationError):
+                orden.reservar_repuestos([item])
+
+        self.repuesto.refresh_from_db()
+        self.assertEqual((self.repuesto.stock_actual, self.repuesto.stock_reservado), (2, 0))
+        self.assertEqual(OrdenRepuesto.objects.count(), 2)
+
+    def test_formset_valida_todas_las_lineas_con_una_consulta(self):
+        datos = {
+            "equipo": self.equipo.pk,
+            "problema_reportado": "Pantalla",
+            "precio_estimado": "0",
+            "estado": OrdenReparacion.Estado.INGRESADO,
+            "repuestos-TOTAL_FORMS": "3",
+            "repuestos-INITIAL_FORMS": "0",
+            "repuestos-MIN_NUM_FORMS": "0",
+            "repuestos-MAX_NUM_FORMS": "1000",
+        }
+        for indice in range(3):
+            datos[f"repuestos-{indice}-repuesto"] = self.repuesto.pk
+            datos[f"repuestos-{indice}-cantidad"] = "1"
+            datos[f"repuestos-{indice}-precio_unitario"] = "10.00"
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse("orden_create_form"), datos)
+
+        self.assertEqual(response.status_code, 302)
+        consultas_repuesto = [
+            q["sql"] for q in consultas.captured_queries if q["sql"].startswith("SELECT") and 'FROM "inventario_repuesto"' in q["sql"]
+        ]
+        self.assertEqual(len(consultas_repuesto), 2)  # validación del formset + bloqueo al reservar
+        self.repuesto.refresh_from_db()
+        self.assertEqual(self.repuesto.stock_reservado, 3)
+
+        datos["problema_reportado"] = "Otra orden"
+        response = self.client.post(reverse("orden_create_form"), datos)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OrdenReparacion.objects.count(), 1)
+
+
+class MaquinaEstadosTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(nombre="Sofía", telefono="2604444444", email="sofia@example.com")
+        equipo = Equipo.objects.create(cliente=cliente, marca="Asus", modelo="VivoBook")
+        OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Sin imagen")
+        self.orden = OrdenReparacion.objects.select_related("equipo__cliente").get()
+
+    def test_transicion_hace_un_solo_update_y_difiere_efectos(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as consultas:
+                self.orden.transicionar(OrdenReparacion.Estado.EN_REVISION)
+
+        sql_ordenes = [q["sql"] for q in consultas.captured_queries if "taller_ordenreparacion" in q["sql"]]
+        self.assertEqual(len(sql_ordenes), 1)
+        self.assertTrue(sql_ordenes[0].startswith("UPDATE"))
+        # El aviso queda en la cola dentro de la transacción; lo diferido es lo demás.
+        self.assertEqual(CorreoPendiente.objects.count(), 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(CorreoPendiente.objects.count(), 1)
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.estado, OrdenReparacion.Estado.EN_REVISION)
+
+    def test_guardar_sin_cambio_de_estado_cuesta_una_consulta(self):
+        self.orden.diagnostico = "Flex de video"
+        with self.assertNumQueries(1):
+            self.orden.save()
+
+    def test_una_instancia_vieja_no_pisa_los_campos_mantenidos_aparte(self):
+        vieja = OrdenReparacion.objects.get(pk=self.orden.pk)
+        OrdenReparacion.objects.filter(pk=self.orden.pk).update(
+            stock_descontado=True, total_repuestos=Decimal("50.00"), qr_imagen="qr/orden.png"
+        )
+
+        vieja.diagnostico = "Flex de video"
+        vieja.save()
+        vieja.estado = OrdenReparacion.Estado.EN_REVISION
+        vieja.save()
+
+        self.orden.refresh_from_db()
+        self.assertEqual(
+            (self.orden.diagnostico, self.orden.estado, self.orden.stock_descontado, self.orden.total_repuestos),
+            ("Flex de video", OrdenReparacion.Estado.EN_REVISION, True, Decimal("50.00")),
+        )
+        self.assertEqual(self.orden.qr_imagen.name, "qr/orden.png")
+
+    def test_transicion_no_permitida(self):
+        with self.assertRaises(ValidationError):
+            self.orden.transicionar(OrdenReparacion.Estado.ENTREGADO)
+
+    def test_formulario_rechaza_transicion_no_permitida(self):
+        form = EstadoOrdenForm(
+            data={"estado": OrdenReparacion.Estado.ENTREGADO, "precio_estimado": "0"},
+            instance=self.orden,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("estado", form.errors)
+
+    def test_transicion_concurrente_se_rechaza(self):
+        OrdenReparacion.objects.filter(pk=self.orden.pk).update(estado=OrdenReparacion.Estado.CANCELADO)
+
+        with self.assertRaises(ValidationError):
+            self.orden.transicionar(OrdenReparacion.Estado.EN_REVISION)
+
+
+class PaginacionKeysetTests(TestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username="dueno", password="pass1234")
+        self.client.force_login(self.usuario)
+        self.cliente = Cliente.objects.create(nombre="Ana", telefono="2604111111")
+        Equipo.objects.bulk_create(
+            [
+                Equipo(cliente=self.cliente, marca="Marca", modelo=f"Modelo {indice}")
+                for indice in range(30)
+            ]
+        )
+
+    def test_recorre_paginas_con_tokens_estables(self):
+        primera = self.client.get(reverse("equipos_list"))
+        pagina = primera.context["equipos"]
+        self.assertEqual(len(pagina), 24)
+        self.assertIsNone(pagina.anterior)
+        self.assertIsNotNone(pagina.siguiente)
+
+        segunda = self.client.get(reverse("equipos_list"), {"despues": pagina.siguiente}).context["equipos"]
+        self.assertEqual(len(segunda), 6)
+        self.assertIsNone(segunda.siguiente)
+        ids = [equipo.id for equipo in pagina] + [equipo.id for equipo in segunda]
+        self.assertEqual(len(set(ids)), 30)
+
+        vuelta = self.client.get(reverse("equipos_list"), {"antes": segunda.anterior}).context["equipos"]
+        self.assertEqual([equipo.id for equipo in vuelta], [equipo.id for equipo in pagina])
+
+    def test_token_invalido_muestra_primera_pagina(self):
+        response = self.client.get(reverse("equipos_list"), {"despues": "no-es-un-token"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["equipos"]), 24)
+
+    def test_tokens_con_forma_incorrecta_muestran_primera_pagina(self):
+        tokens = [
+            [1, 2],
+            [{"a": 1}, 1],
+            [None, 1],
+            ["2026-01-01T00:00:00+00:00", None],
+            ["a", "b", "c"],
+            {"a": 1},
+        ]
+        for valores in tokens:
+            token = base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+            for nombre, clave in (
+                ("dashboard", "ordenes"),
+                ("ordenes_list", "ordenes"),
+                ("clientes_list", "clientes"),
+                ("equipos_list", "equipos"),
+                ("repuestos_list", "repuestos"),
+            ):
+                for direccion in ("despues", "antes"):
+                    response = self.client.get(reverse(nombre), {direccion: token})
+                    self.assertEqual(response.status_code, 200, (valores, nombre, direccion))
+                    self.assertIsNone(response.context[clave].anterior, (valores, nombre, direccion))
+
+    def test_listado_de_ordenes_no_carga_problema_reportado(self):
+        equipo = Equipo.objects.first()
+        OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Texto largo")
+
+        response = self.client.get(reverse("ordenes_list"))
+
+        orden = response.context["ordenes"].items[0]
+        self.assertIn("problema_reportado", orden.get_deferred_fields())
+
+
+class EstadisticasPanelTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(nombre="Luis", telefono="2604222222")
+        self.equipo = Equipo.objects.create(cliente=cliente, marca="HP", modelo="240")
+
+    def contador(self, estado):
+        return EstadisticaEstado.objects.get(estado=estado)
+
+    def test_contadores_siguen_alta_cambio_y_baja(self):
+        orden = OrdenReparacion.objects.create(
+            equipo=self.equipo,
+            problema_reportado="No carga",
+            precio_estimado="1000.00",
+        )
+        self.assertEqual(self.contador(OrdenReparacion.Estado.INGRESADO).cantidad, 1)
+
+        orden.estado = OrdenReparacion.Estado.REPARADO
+        orden.precio_estimado = Decimal("1500.00")
+        orden.save()
+        self.assertEqual(self.contador(OrdenReparacion.Estado.INGRESADO).cantidad, 0)
+        reparado = self.contador(OrdenReparacion.Estado.REPARADO)
+        self.assertEqual((reparado.cantidad, reparado.monto), (1, Decimal("1500.00")))
+
+        orden.delete()
+        reparado = self.contador(OrdenReparacion.Estado.REPARADO)
+        self.assertEqual((reparado.cantidad, reparado.monto), (0, Decimal("0.00")))
+
+    def test_guardados_en_paralelo_no_desvian_los_contadores(self):
+        orden = OrdenReparacion.objects.create(equipo=self.equipo, problema_reportado="No carga", precio_estimado=1000)
+        primera = OrdenReparacion.objects.get(pk=orden.pk)
+        segunda = OrdenReparacion.objects.get(pk=orden.pk)
+        vieja = OrdenReparacion.objects.get(pk=orden.pk)
+
+        primera.estado = OrdenReparacion.Estado.EN_REVISION
+        primera.save()
+        segunda.estado = OrdenReparacion.Estado.CANCELADO
+        with self.assertRaises(ValidationError):
+            segunda.save()
+        # Un guardado sin cambio de estado no vuelve la orden al estado que tenía cargado.
+        vieja.diagnostico = "Revisar fuente"
+        vieja.save()
+
+        orden.refresh_from_db()
+        self.assertEqual((orden.estado, orden.diagnostico), (OrdenReparacion.Estado.EN_REVISION, "Revisar fuente"))
+        self.assertEqual(self.contador(OrdenReparacion.Estado.INGRESADO).cantidad, 0)
+        self.assertEqual(self.contador(OrdenReparacion.Estado.EN_REVISION).cantidad, 1)
+        self.assertFalse(EstadisticaEstado.objects.filter(estado=OrdenReparacion.Estado.CANCELADO, cantidad__gt=0).exists())
+
+    def test_comando_detecta_y_corrige_desvios(self):
+        orden = OrdenReparacion.objects.create(equipo=self.equipo, problema_reportado="Lento")
+        OrdenReparacion.objects.filter(pk=orden.pk).update(estado=OrdenReparacion.Estado.ENTREGADO)
+
+        salida = StringIO()
+        call_command("recalcular_estadisticas", stdout=salida)
+
+        self.assertIn("ENTREGADO", salida.getvalue())
+        self.assertEqual(self.contador(OrdenReparacion.Estado.ENTREGADO).cantidad, 1)
+        self.assertEqual(self.contador(OrdenReparacion.Estado.INGRESADO).cantidad, 0)
+
+
+class ColaCorreosTests(TestCase):
+    def test_el_correo_se_guarda_en_la_transaccion_del_cambio(self):
+        cliente = Cliente.objects.create(nombre="Ana", telefono="2604000001", email="ana@example.com")
+        equipo = Equipo.objects.create(cliente=cliente, marca="HP", modelo="240")
+        orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="No enciende")
+
+        try:
+            with transaction.atomic():
+                orden.transicionar(OrdenReparacion.Estado.EN_REVISION)
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        self.assertFalse(CorreoPendiente.objects.exists())
+
+        orden.refresh_from_db()
+        with transaction.atomic():
+            orden.transicionar(OrdenReparacion.Estado.EN_REVISION)
+            # Ya está en la cola antes del commit, sin depender de un callback.
+            self.assertEqual(CorreoPendiente.objects.get().destinatario, "ana@example.com")
+
+    def test_envia_lote_con_una_sola_conexion(self):
+        for indice in range(3):
+            notificaciones.encolar_correo(f"cliente{indice}@example.com", "Asunto", "Mensaje")
+
+        resultado = notificaciones.procesar_lote(tamano=10)
+
+        self.assertEqual(resultado["enviados"], 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(EMAIL_BACKEND="taller.tests.BackendQueFalla")
+    def test_reintenta_con_backoff_y_marca_fallido(self):
+        correo = notificaciones.encolar_correo("ana@example.com", "Asunto", "Mensaje")
+
+        notificaciones.procesar_lote(max_intentos=2, backoff=60)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoPendiente.Estado.PENDIENTE)
+        self.assertEqual(correo.intentos, 1)
+        self.assertGreater(correo.proximo_intento, timezone.now())
+        self.assertIn("SMTP caído", correo.ultimo_error)
+
+        CorreoPendiente.objects.filter(pk=correo.pk).update(proximo_intento=timezone.now())
+        notificaciones.procesar_lote(max_intentos=2, backoff=60)
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, CorreoPendiente.Estado.FALLIDO)
+
+
+class QrOrdenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cliente = Cliente.objects.create(nombre="Marta", telefono="2604333333")
+        equipo = Equipo.objects.create(cliente=cliente, marca="Dell", modelo="Inspiron")
+        self.orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Bisagra rota")
+
+    def test_crear_orden_no_genera_qr(self):
+        self.assertFalse(self.orden.qr_imagen)
+
+    def test_svg_se_genera_a_demanda_y_queda_en_cache(self):
+        url = reverse("orden_qr", args=[self.orden.qr_token, "svg"])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn("immutable", response["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            repetido = self.client.get(url)
+        self.assertEqual(repetido.content, response.content)
+
+        with self.assertNumQueries(0):
+            condicional = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(condicional.status_code, 304)
+
+    def test_borrar_la_orden_saca_el_qr_de_la_cache(self):
+        url = reverse("orden_qr", args=[self.orden.qr_token, "svg"])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.orden.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_token_inexistente_devuelve_404(self):
+        response = self.client.get(reverse("orden_qr", args=["00000000-0000-0000-0000-000000000000", "svg"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comando_generar_qr_completa_ordenes_sin_imagen(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            call_command("generar_qr", "--procesos", "2", stdout=StringIO())
+
+            self.orden.refresh_from_db()
+            self.assertEqual(self.orden.qr_imagen.name, f"qr/orden_{self.orden.pk}.png")
+            self.assertTrue(self.orden.qr_imagen.storage.exists(self.orden.qr_imagen.name))
+
+
+class SeguimientoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cliente = Cliente.objects.create(nombre="Rosa", telefono="2604444444")
+        equipo = Equipo.objects.create(cliente=self.cliente, marca="HP", modelo="Pavilion")
+        self.orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="No carga")
+        self.repuesto = Repuesto.objects.create(nombre="Cargador 65W", sku="CARG-65", stock_actual=3, precio_unitario="10.00")
+        self.url = reverse("seguimiento_publico", args=[self.orden.qr_token])
+
+    def test_visitas_repetidas_no_tocan_la_base(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            repetido = self.client.get(self.url)
+        self.assertEqual(repetido.content, response.content)
+
+        with self.assertNumQueries(0):
+            condicional = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(condicional.status_code, 304)
+
+    def test_cambios_en_la_orden_o_sus_repuestos_invalidan_la_pagina(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        OrdenRepuesto.objects.create(orden=self.orden, repuesto=self.repuesto, cantidad=1, precio_unitario="10.00")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Cargador 65W")
+
+        actualizado = OrdenReparacion.objects.values_list("actualizado_en", flat=True).get(pk=self.orden.pk)
+        self.cliente.nombre = "Rosa Díaz"
+        self.cliente.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(response, "Rosa Díaz")
+        # La orden no se toca: su fecha ordena el panel y los listados.
+        self.assertEqual(OrdenReparacion.objects.values_list("actualizado_en", flat=True).get(pk=self.orden.pk), actualizado)
+
+    def test_home_anonima_responde_304(self):
+        response = self.client.get(reverse("home"))
+        with self.assertNumQueries(0):
+            condicional = self.client.get(reverse("home"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(condicional.status_code, 304)
+
+
+class VistasPublicasAsyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cliente = Cliente.objects.create(nombre="Irma", telefono="2604666666")
+        equipo = Equipo.objects.create(cliente=cliente, marca="Lenovo", modelo="IdeaPad")
+        self.orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Teclado húmedo")
+        repuesto = Repuesto.objects.create(nombre="Teclado ES", sku="TEC-ES", stock_actual=2, precio_unitario="25.00")
+        OrdenRepuesto.objects.create(orden=self.orden, repuesto=repuesto, cantidad=1, precio_unitario="25.00")
+
+    async def test_seguimiento_y_health_bajo_asgi(self):
+        self.assertEqual((await self.async_client.get(reverse("health"))).content, b"ok")
+
+        url = reverse("seguimiento_publico", args=[self.orden.qr_token])
+        response = await self.async_client.get(url)
+        self.assertContains(response, "Teclado ES")
+        condicional = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(condicional.status_code, 304)
+
+        faltante = await self.async_client.get(reverse("seguimiento_publico", args=["00000000-0000-0000-0000-000000000000"]))
+        self.assertEqual(faltante.status_code, 404)
+
+    async def test_qr_png_se_guarda_bajo_asgi(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = await self.async_client.get(reverse("orden_qr", args=[self.orden.qr_token, "png"]))
+            self.assertEqual(response["Content-Type"], "image/png")
+            self.assertTrue(response.content.startswith(b"\x89PNG"))
+
+            await self.orden.arefresh_from_db()
+            self.assertEqual(self.orden.qr_imagen.name, f"qr/orden_{self.orden.pk}.png")
+
+
+class GetCondicionalStaffTests(TestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username="mostrador", password="pass1234")
+        self.client.force_login(self.usuario)
+        cliente = Cliente.objects.create(nombre="Hugo", telefono="2604555555")
+        self.equipo = Equipo.objects.create(cliente=cliente, marca="Acer", modelo="Aspire")
+        self.orden = OrdenReparacion.objects.create(equipo=self.equipo, problema_reportado="Pantalla azul")
+
+    def test_listado_sin_cambios_responde_304(self):
+        url = reverse("ordenes_list")
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in consultas.captured_queries if "taller_equipo" in q["sql"]])
+
+        OrdenReparacion.objects.create(equipo=self.equipo, problema_reportado="No enciende")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        self.equipo.modelo = "Aspire 5"
+        self.equipo.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detalle_cambia_de_version_al_agregar_repuestos(self):
+        url = reverse("orden_detalle", args=[self.orden.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        repuesto = Repuesto.objects.create(nombre="Pila CMOS", sku="CMOS-1", stock_actual=2, precio_unitario="1.00")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        OrdenRepuesto.objects.create(orden=self.orden, repuesto=repuesto, cantidad=1, precio_unitario="1.00")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class CacheDosNivelesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lru_local_cuenta_aciertos_fallos_y_desalojos(self):
+        backend = CacheDosNiveles("prueba-lru", {"OPTIONS": {"COMPARTIDA": "compartida", "MAX_LOCAL": 2}})
+        for clave in ("a", "b", "c"):
+            backend.set(clave, clave.upper())
+
+        self.assertEqual(backend.get("c"), "C")
+        self.assertEqual(backend.get("a"), "A")
+        self.assertIsNone(backend.get("z"))
+        self.assertEqual(
+            {k: backend.estadisticas()[k] for k in ("aciertos_local", "aciertos_compartida", "fallos", "desalojos")},
+            {"aciertos_local": 1, "aciertos_compartida": 1, "fallos": 1, "desalojos": 2},
+        )
+
+    def test_cambio_de_stock_invalida_la_familia_repuestos(self):
+        repuesto = Repuesto.objects.create(nombre="Cooler", sku="COOL-1", stock_actual=0, precio_unitario="1.00")
+        consulta = Repuesto.objects.filter(stock_actual__lte=1).values_list("sku", "stock_actual")
+
+        self.assertEqual(queryset_cacheado("repuestos", "bajo", consulta), [("COOL-1", 0)])
+        Repuesto.objects.filter(pk=repuesto.pk).update(stock_actual=5)
+        self.assertEqual(queryset_cacheado("repuestos", "bajo", consulta), [("COOL-1", 0)])
+
+        repuesto.refresh_from_db()
+        repuesto.stock_actual = 6
+        repuesto.save()
+        self.assertEqual(queryset_cacheado("repuestos", "bajo", consulta), [])
+
+
+class ConexionesTests(TestCase):
+    def test_todas_las_bases_reutilizan_conexiones_y_se_ven_en_health(self):
+        for alias, db in settings.DATABASES.items():
+            self.assertTrue(db["CONN_HEALTH_CHECKS"], alias)
+            self.assertTrue(db["CONN_MAX_AGE"] or db["OPTIONS"].get("pool"), alias)
+
+        url = reverse("estado_db")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        usuario = get_user_model().objects.create_user(username="cajero", password="pass1234")
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        usuario.is_superuser = True
+        usuario.save()
+        fila = self.client.get(url).json()["default"]
+        self.assertEqual(fila["vendor"], connection.vendor)
+        self.assertTrue(fila["health_checks"])
+        self.assertIn("conexiones_creadas", fila)
+
+
+@override_settings(DATABASE_ROUTERS=["core.replicas.RouterReplica"])
+class ReplicaLecturaTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        replicas.olvidar_chequeo()
+        self.usuario = get_user_model().objects.create_user(username="recepcion", password="pass1234")
+        self.client.force_login(self.usuario)
+        cliente = Cliente.objects.create(nombre="Olga", telefono="2604777777")
+        self.equipo = Equipo.objects.create(cliente=cliente, marca="Asus", modelo="Vivobook")
+
+    def _lecturas(self, url):
+        with CaptureQueriesContext(connections["replica"]) as replica, CaptureQueriesContext(connection) as primaria:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tablas = lambda consultas: {t for q in consultas for t in ("taller_ordenreparacion", "django_session") if t in q["sql"]}
+        return tablas(replica.captured_queries), tablas(primaria.captured_queries)
+
+    def test_listados_leen_de_la_replica_salvo_despues_de_escribir(self):
+        en_replica, en_primaria = self._lecturas(reverse("ordenes_list"))
+        self.assertEqual(en_replica, {"taller_ordenreparacion"})
+        self.assertEqual(en_primaria, {"django_session"})
+
+        response = self.client.post(
+            reverse("orden_create_form"),
+            {"equipo": self.equipo.pk, "problema_reportado": "No enciende", "precio_estimado": "0"},
+        )
+        self.assertIn(replicas.COOKIE, response.cookies)
+        en_replica, en_primaria = self._lecturas(reverse("ordenes_list"))
+        self.assertFalse(en_replica)
+        self.assertIn("taller_ordenreparacion", en_primaria)
+
+    def test_replica_atrasada_vuelve_a_la_primaria(self):
+        with override_settings(DB_REPLICA_MAX_LAG=-1), self.assertLogs("core.replicas", "WARNING"):
+            en_replica, en_primaria = self._lecturas(reverse("dashboard"))
+        self.assertFalse(en_replica)
+        self.assertIn("taller_ordenreparacion", en_primaria)
+
+
+class TotalesOrdenTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(nombre="Raúl", telefono="2604777777")
+        equipo = Equipo.objects.create(cliente=cliente, marca="HP", modelo="Pavilion")
+        self.orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Bisagra", precio_estimado=1000)
+        self.repuesto = Repuesto.objects.create(nombre="Bisagra", sku="BIS-1", stock_actual=10, precio_unitario=150)
+
+    def test_totales_siguen_a_las_lineas(self):
+        item = OrdenRepuesto.objects.create(orden=self.orden, repuesto=self.repuesto, cantidad=2, precio_unitario=150)
+        OrdenRepuesto.objects.create(orden=self.orden, repuesto=self.repuesto, cantidad=1, precio_unitario=75)
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.total_repuestos, self.orden.total), (Decimal("375.00"), Decimal("1375.00")))
+
+        item.delete()
+        OrdenReparacion.objects.filter(pk=self.orden.pk).update(precio_estimado=2000)
+        self.orden.refresh_from_db()
+        self.assertEqual((self.orden.total_repuestos, self.orden.total), (Decimal("75.00"), Decimal("2075.00")))
+
+    def test_detalle_lee_las_lineas_una_sola_vez(self):
+        self.client.force_login(get_user_model().objects.create_user(username="detalle", password="pass1234"))
+        for n in range(3):
+            OrdenRepuesto.objects.create(orden=self.orden, repuesto=self.repuesto, cantidad=1, precio_unitario=100)
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse("orden_detalle", args=[self.orden.pk]))
+        self.assertContains(response, "Total repuestos: $300.00")
+        self.assertEqual(sum("taller_ordenrepuesto" in q["sql"] for q in consultas.captured_queries), 1)
+
+
+class FragmentosOrdenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create_user(username="panel", password="pass1234"))
+        cliente = Cliente.objects.create(nombre="Inés", telefono="2604666666")
+        equipo = Equipo.objects.create(cliente=cliente, marca="Lenovo", modelo="IdeaPad")
+        self.orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Ventilador", precio_estimado=100)
+
+    def test_tarjetas_sin_cambios_salen_de_cache(self):
+        for nombre in ("ordenes_list", "dashboard"):
+            self.assertContains(self.client.get(reverse(nombre)), "badge-status-ingresado")
+
+        # Un UPDATE que no toca actualizado_en no cambia la clave del fragmento.
+        OrdenReparacion.objects.filter(pk=self.orden.pk).update(precio_estimado=555)
+        for nombre in ("ordenes_list", "dashboard"):
+            self.assertNotContains(self.client.get(reverse(nombre)), "$555")
+
+        self.orden.refresh_from_db()
+        self.orden.transicionar(OrdenReparacion.Estado.EN_REVISION)
+        for nombre in ("ordenes_list", "dashboard"):
+            response = self.client.get(reverse(nombre))
+            self.assertContains(response, "$555")
+            self.assertContains(response, "badge-status-revision")
+        # El formulario de borrado queda fuera del fragmento: su token CSRF es por sesión.
+        self.assertContains(self.client.get(reverse("ordenes_list")), "csrfmiddlewaretoken")
+
+    def test_editar_el_cliente_renueva_las_tarjetas_sin_tocar_la_orden(self):
+        for nombre in ("ordenes_list", "dashboard"):
+            self.client.get(reverse(nombre))
+        actualizado = self.orden.actualizado_en
+
+        cliente = self.orden.equipo.cliente
+        cliente.nombre = "Inés Molina"
+        cliente.save()
+
+        for nombre in ("ordenes_list", "dashboard"):
+            self.assertContains(self.client.get(reverse(nombre)), "Inés Molina")
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.actualizado_en, actualizado)
+
+
+class PerfiladoSQLTests(TestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user(username="perfil", password="pass1234"))
+        cliente = Cliente.objects.create(nombre="Pablo", telefono="2604777777")
+        equipo = Equipo.objects.create(cliente=cliente, marca="MSI", modelo="Modern")
+        self.orden = OrdenReparacion.objects.create(equipo=equipo, problema_reportado="Bisagra")
+        for numero in range(3):
+            repuesto = Repuesto.objects.create(
+                nombre=f"Tornillo {numero}", sku=f"TOR-{numero}", stock_actual=5, precio_unitario="1.00"
+            )
+            OrdenRepuesto.objects.create(orden=self.orden, repuesto=repuesto, cantidad=1, precio_unitario="1.00")
+
+    def test_apagado_no_agrega_headers(self):
+        response = self.client.get(reverse("orden_detalle", args=[self.orden.pk]))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(PERFILADO_SQL=True, PERFILADO_SQL_UMBRAL_MS=0)
+    def test_detalle_sin_n_mas_uno_y_log_estructurado(self):
+        with self.assertLogs("core.perfilado", level="WARNING") as logs:
+            response = self.client.get(reverse("orden_detalle", args=[self.orden.pk]))
+
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertNotIn("X-Consultas-Duplicadas", response)
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro["vista"], "orden_detalle")
+        self.assertEqual(registro["duplicadas"], [])
+        self.assertGreater(registro["consultas"], 0)
+
+
+class BenchmarkTests(TestCase):
+    def test_todas_las_vistas_respetan_su_presupuesto_de_consultas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = f"{directorio}/benchmark.json"
+            call_command("benchmark", iteraciones=1, forzar=True, salida=salida, stdout=StringIO())
+            with open(salida, encoding="utf-8") as archivo:
+                reporte = json.load(archivo)
+
+        self.assertEqual(set(reporte["escenarios"]), {escenario["nombre"] for escenario in benchmark.ESCENARIOS})
+        self.assertFalse(Cliente.objects.exists())
+
+    def test_corre_sobre_una_base_ya_sembrada(self):
+        sinteticos.generar(escala=1, semilla=0, lote=100)
+        skus = set(Repuesto.objects.values_list("sku", flat=True))
+
+        call_command("benchmark", iteraciones=1, forzar=True, stdout=StringIO())
+
+        self.assertEqual(set(Repuesto.objects.values_list("sku", flat=True)), skus)
+
+
+class SinteticosTests(TestCase):
+    def _huella(self):
+        return (
+            list(Cliente.objects.order_by("pk").values_list("nombre", "email", "creado_en")),
+            list(OrdenReparacion.objects.order_by("pk").values_list("estado", "qr_token", "creado_en")),
+            list(Repuesto.objects.order_by("pk").values_list("sku", "stock_actual", "stock_reservado")),
+        )
+
+    def test_generar_es_determinista_y_el_ledger_cierra(self):
+        totales = sinteticos.generar(escala=1, semilla=7, lote=50)
+        huella = self._huella()
+
+        self.assertEqual(totales["clientes"], sinteticos.CLIENTES)
+        self.assertEqual(OrdenReparacion.objects.count(), sinteticos.ORDENES)
+        self.assertEqual(OrdenRepuesto.objects.count(), totales["lineas"])
+        self.assertEqual(list(ledger.reconciliar()), [])
+        self.assertFalse(
+            OrdenReparacion.objects.filter(stock_descontado=False, reservas__isnull=True, repuestos__isnull=False)
+            .exclude(estado=OrdenReparacion.Estado.CANCELADO)
+            .exists()
+        )
+
+        self.assertGreater(sinteticos.borrar_sinteticos(), 0)
+        self.assertFalse(Cliente.objects.exists())
+        self.assertFalse(MovimientoStock.objects.exists())
+
+        sinteticos.generar(escala=1, semilla=7, lote=50)
+        self.assertEqual(self._huella(), huella)
+
+    def test_otra_tanda_sigue_la_numeracion_y_respeta_las_fechas(self):
+        sinteticos.generar(escala=1, semilla=7, lote=50)
+        sinteticos.generar(escala=1, semilla=7, lote=50)
+
+        self.assertEqual(Repuesto.objects.count(), 2 * sinteticos.REPUESTOS)
+        self.assertTrue(Repuesto.objects.filter(sku=f"{sinteticos.PREFIJO_SKU}{2 * sinteticos.REPUESTOS - 1:07d}").exists())
+        self.assertTrue(Cliente.objects.filter(email=f"cliente{2 * sinteticos.CLIENTES - 1}{sinteticos.DOMINIO}").exists())
+        self.assertEqual(list(ledger.reconciliar()), [])
+        # Las fechas generadas llegan a la base sin tocar los campos auto_now del modelo.
+        self.assertLess(Cliente.objects.order_by("creado_en").first().creado_en, timezone.now() - timedelta(days=30))
+        self.assertTrue(Cliente._meta.get_field("creado_en").auto_now_add)
+        cliente = Cliente.objects.create(nombre="Nuevo", telefono="1")
+        self.assertIsNotNone(cliente.creado_en)
+
+    def test_seed_demo_con_escala_y_reset(self):
+        call_command("seed_demo", scale=1, stdout=StringIO())
+        call_command("seed_demo", scale=1, stdout=StringIO())
+        self.assertEqual(Cliente.objects.filter(email__endswith=sinteticos.DOMINIO).count(), 2 * sinteticos.CLIENTES)
+        self.assertTrue(Cliente.objects.filter(email__endswith="@demo.local").exists())
+        # Las órdenes demo están abiertas: sus repuestos quedan reservados.
+        for repuesto in Repuesto.objects.filter(sku__startswith="DEMO-"):
+            reservado = sum(repuesto.reservas.filter(estado=ReservaStock.Estado.ACTIVA).values_list("cantidad", flat=True))
+            self.assertEqual(repuesto.stock_reservado, reservado, repuesto.sku)
+        self.assertTrue(ReservaStock.objects.filter(repuesto__sku__startswith="DEMO-").exists())
+
+        call_command("seed_demo", reset=True, stdout=StringIO())
+        self.assertFalse(Cliente.objects.filter(email__endswith=sinteticos.DOMINIO).exists())
+        self.assertEqual(Cliente.objects.filter(email__endswith="@demo.local").count(), 3)
+
+
+class PruebaCargaTests(LiveServerTestCase):
+    def foto(self):
+        return {
+            "ordenes": list(OrdenReparacion.objects.order_by("pk").values_list("pk", *carga.CAMPOS_ORDEN, "total_repuestos")),
+            "lineas": OrdenRepuesto.objects.count(),
+            "reservas": list(ReservaStock.objects.order_by("pk").values_list("pk", "estado")),
+            "movimientos": MovimientoStock.objects.count(),
+            "correos": CorreoPendiente.objects.count(),
+            "stock": list(Repuesto.objects.order_by("pk").values_list("pk", "stock_actual", "stock_reservado")),
+            "estadisticas": list(EstadisticaEstado.objects.order_by("estado").values_list("estado", "cantidad", "monto")),
+        }
+
+    def test_mezcla_de_roles_contra_servidor_vivo(self):
+        Repuesto.objects.create(nombre="Pantalla real", sku="REAL-1", stock_actual=5, precio_unitario="10.00")
+        sinteticos.generar(escala=1, semilla=3)
+        antes = self.foto()
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = f"{directorio}/carga.json"
+            call_command(
+                "loadtest",
+                url=self.live_server_url,
+                duracion=1,
+                usuarios=3,
+                forzar=True,
+                salida=salida,
+                stdout=StringIO(),
+            )
+            with open(salida, encoding="utf-8") as archivo:
+                reporte = json.load(archivo)
+
+        self.assertEqual(reporte["usuarios"], {"tecnico": 1, "dueno": 1, "cliente": 1})
+        self.assertGreater(reporte["pedidos"], 0)
+        self.assertEqual(reporte["tasa_error"], 0)
+        self.assertEqual(sum(reporte["histograma_ms"].values()), reporte["pedidos"])
+        self.assertIn("seguimiento_publico", reporte["operaciones"])
+        # Sobre datos sintéticos que ya estaban, la carga deja la base como la encontró.
+        self.assertEqual(self.foto(), antes)
+        self.assertFalse(get_user_model().objects.filter(username__startswith=carga.PREFIJO_USUARIO).exists())
+        self.assertEqual(list(ledger.reconciliar()), [])
+        self.assertEqual(carga.repartir_roles(20, carga.MEZCLA), ["tecnico"] * 4 + ["dueno"] + ["cliente"] * 15)
+
+
+class AuditoriaConsultasTests(TestCase):
+    def test_listados_formularios_y_buscadores_usan_indices(self):
+        datos = benchmark.generar_dataset()
+        resultado = auditoria.auditar(datos, umbral_filas=50)
+
+        for nombre in (
+            "dashboard",
+            "ordenes_list",
+            "clientes_list",
+            "equipos_list",
+            "repuestos_list",
+            "seguimiento_publico",
+            "equipo_create",
+            "orden_create",
+            "orden_create_form",
+            "orden_detalle",
+            "buscar_clientes",
+            "buscar_equipos",
+            "buscar_repuestos",
+        ):
+            self.assertEqual([h for h in resultado[nombre]["hallazgos"] if h["tipo"] == "scan"], [], nombre)
+
+    def test_otros_motores_se_rechazan_antes_de_generar_datos(self):
+        with mock.patch.object(type(connections["default"]), "vendor", "mysql"):
+            with self.assertRaisesMessage(CommandError, "no de mysql"):
+                call_command("query_audit", escala=1, forzar=True, stdout=StringIO())
+        self.assertFalse(Repuesto.objects.exists())
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_user(username="mostrador", password="pass1234")
+        self.client.force_login(self.usuario)
+        self.cliente = Cliente.objects.create(nombre="José Pérez", telefono="(260) 455-1234")
+        self.otro = Cliente.objects.create(nombre="Pedro Gómez", telefono="2604999999")
+        self.equipo = Equipo.objects.create(cliente=self.cliente, marca="Lenovo", modelo="ThinkPad T14", numero_serie="PF-3A9Z")
+        Equipo.objects.create(cliente=self.otro, marca="HP", modelo="ProBook", numero_serie="5CD123")
+        self.repuesto = Repuesto.objects.create(nombre="Batería 45Wh", sku="BAT-T14", stock_actual=5, precio_unitario="30.00")
+        Repuesto.objects.create(nombre="Batería vieja", sku="BAT-OLD", precio_unitario="20.00", activo=False)
+
+    def _ids(self, nombre, texto):
+        response = self.client.get(reverse(nombre), {"q": texto})
+        self.assertEqual(response.status_code, 200)
+        return [fila["id"] for fila in response.json()["resultados"]]
+
+    def test_normaliza_tildes_separadores_y_mayusculas(self):
+        self.assertEqual(busqueda.normalizar("José Pérez"), "joseperez")
+        self.assertEqual(self.cliente.telefono_busqueda, "2604551234")
+        self.assertEqual(self.equipo.marca_modelo_busqueda, "lenovothinkpadt14")
+
+        self.assertEqual(self._ids("buscar_clientes", "jose pe"), [self.cliente.pk])
+        self.assertEqual(self._ids("buscar_clientes", "PEREZ"), [])
+        self.assertEqual(self._ids("buscar_clientes", "260-455"), [self.cliente.pk])
+        self.assertEqual(self._ids("buscar_equipos", "pf3a"), [self.equipo.pk])
+        self.assertEqual(self._ids("buscar_equipos", "thinkpad"), [self.equipo.pk])
+        self.assertEqual(self._ids("buscar_equipos", "lenovo think"), [self.equipo.pk])
+        self.assertEqual(self._ids("buscar_repuestos", "bat"), [self.repuesto.pk])
+        self.assertEqual(self._ids("buscar_repuestos", "bat-t"), [self.repuesto.pk])
+        self.assertEqual(self._ids("buscar_clientes", "j"), [])
+
+        # Editar el nombre recalcula la columna aunque el save sea parcial.
+        self.cliente.nombre = "Josefina Ruiz"
+        self.cliente.save(update_fields=["nombre"])
+        self.assertEqual(self._ids("buscar_clientes", "josefina"), [self.cliente.pk])
+
+    def test_el_rango_del_prefijo_no_sale_del_alfabeto(self):
+        self.assertEqual(busqueda.prefijo("x", "ab9"), Q(x__gte="ab9", x__lt="aba"))
+        self.assertEqual(busqueda.prefijo("x", "a9zz"), Q(x__gte="a9zz", x__lt="aa"))
+        self.assertEqual(busqueda.prefijo("x", "zz"), Q(x__gte="zz"))
+
+        self.assertEqual(self._ids("buscar_equipos", "pf3a9"), [self.equipo.pk])
+        self.assertEqual(self._ids("buscar_equipos", "pf3a9z"), [self.equipo.pk])
+        self.assertEqual(self._ids("buscar_clientes", "2604999999"), [self.otro.pk])
+
+    def test_sin_texto_devuelve_los_recientes_con_limite(self):
+        response = self.client.get(reverse("buscar_clientes"), {"limite": 1})
+        self.assertEqual(response.json()["resultados"], [{"id": self.otro.pk, "texto": "Pedro Gómez", "detalle": "2604999999"}])
+        self.assertEqual(self._ids("buscar_repuestos", ""), [self.repuesto.pk])
+        self.assertEqual(
+            self.client.get(reverse("buscar_repuestos")).json()["resultados"][0]["detalle"], "Disponible: 5"
+        )
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("buscar_clientes"), {"q": "jo"}).status_code, 302)
+
+    def test_los_formularios_no_listan_la_tabla(self):
+        html = str(EquipoForm(instance=self.equipo)["cliente"])
+        self.assertIn(f'data-autocompletar="{reverse("buscar_clientes")}"', html)
+        self.assertIn("José Pérez", html)
+        self.assertNotIn("Pedro Gómez", html)
+
+        response = self.client.get(reverse("orden_create"))
+        self.assertContains(response, reverse("buscar_equipos"))
+        self.assertNotContains(response, "ProBook")
+
+
+class ArranqueTests(TestCase):
+    def test_bootstrap_no_migra_ni_reescribe_si_no_hay_cambios(self):
+        salida = StringIO()
+        call_command("bootstrap", stdout=salida)
+        self.assertIn("Sin migraciones pendientes", salida.getvalue())
+
+        self.assertEqual(asegurar_superusuario("admin", "admin@ejemplo.com", "clave-segura-1"), "creado")
+        self.assertEqual(asegurar_superusuario("admin", "admin@ejemplo.com", "clave-segura-1", resetear=True), "sin cambios")
+        self.assertEqual(asegurar_superusuario("admin", "admin@ejemplo.com", "clave-nueva-2", resetear=True), "actualizado")
+        self.assertTrue(get_user_model().objects.get(username="admin").check_password("clave-nueva-2"))
+
+    def test_calentamiento_sin_dependencias_pesadas(self):
+        self.assertGreater(arranque.calentar()["plantillas"], 0)
+
+        # En un proceso limpio, cargar la app y las URLs no importa qrcode ni PIL.
+        codigo = (
+            "import sys, django; django.setup(); "
+            "from django.urls import get_resolver; get_resolver().url_patterns; "
+            "print(sorted({m.split('.')[0] for m in sys.modules} & {'qrcode', 'PIL'}))"
+        )
+        resultado = subprocess.run(
+            [sys.executable, "-c", codigo],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "core.settings"},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(resultado.stdout.strip(), "[]")
+
+
+class SqliteProduccionTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Solo aplica al modo SQLite.")
+
+    def test_pragmas_y_transacciones_inmediatas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT_MS)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+    def test_backup_en_caliente_copia_los_datos(self):
+        Cliente.objects.create(nombre="Pablo", telefono="2604888888")
+        with transaction.atomic(), self.assertRaises(CommandError):
+            call_command("backup_sqlite", stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as directorio:
+            for _ in range(2):
+                call_command("backup_sqlite", directorio, "--conservar", "1", stdout=StringIO())
+            copias = os.listdir(directorio)
+            self.assertEqual(len(copias), 1)
+            copia = sqlite3.connect(os.path.join(directorio, copias[0]))
+            try:
+                nombres = [fila[0] for fila in copia.execute("SELECT nombre FROM taller_cliente")]
+            finally:
+                copia.close()
+        self.assertEqual(nombres, ["Pablo"])
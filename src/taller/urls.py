@@ -1,6 +1,9 @@
 from django.urls import path
 
 from taller.views import (
+    buscar_clientes,
+    buscar_equipos,
+    buscar_repuestos,
     clientes_list,
     cliente_create,
     cliente_delete,
@@ -10,6 +13,8 @@ from taller.views import (
     equipo_create,
     equipo_delete,
     equipo_edit,
+    estado_cache,
+    estado_db,
     health,
     home,
     ordenes_list,
@@ -18,6 +23,7 @@ from taller.views import (
     orden_delete,
     orden_detalle,
     orden_edit,
+    orden_qr,
     repuestos_list,
     repuesto_create,
     repuesto_delete,
@@ -30,7 +36,12 @@ from taller.views import (
 urlpatterns = [
     path("", home, name="home"),
     path("health/", health, name="health"),
+    path("health/cache/", estado_cache, name="estado_cache"),
+    path("health/db/", estado_db, name="estado_db"),
     path("panel/", dashboard, name="dashboard"),
+    path("buscar/clientes/", buscar_clientes, name="buscar_clientes"),
+    path("buscar/equipos/", buscar_equipos, name="buscar_equipos"),
+    path("buscar/repuestos/", buscar_repuestos, name="buscar_repuestos"),
     path("clientes/", clientes_list, name="clientes_list"),
     path("clientes/nuevo/", cliente_create, name="cliente_create"),
     path("clientes/<int:pk>/editar/", cliente_edit, name="cliente_edit"),
@@ -51,4 +62,5 @@ urlpatterns = [
     path("ordenes/<int:pk>/eliminar/", orden_delete, name="orden_delete"),
     path("demo/seed/", seed_demo_button, name="seed_demo_button"),
     path("seguimiento/<uuid:token>/", seguimiento_publico, name="seguimiento_publico"),
+    path("seguimiento/<uuid:token>/qr.<str:formato>", orden_qr, name="orden_qr"),
 ]
\ No newline at end of file
@@ -1,73 +1,163 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.management import call_command
 from django.forms import inlineformset_factory
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
 from django.db.models.deletion import ProtectedError
-from django.db.models import Count, Sum
-from django.http import HttpResponse
-from django.core.exceptions import PermissionDenied
-from django.shortcuts import get_object_or_404, redirect, render
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, JsonResponse
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.http import require_POST
 
+from core import busqueda, conexiones
+from core.cache import estadisticas as estadisticas_cache, queryset_cacheado, version_familia
+from core.replicas import primaria
+from inventario import alertas
 from inventario.models import Repuesto
+from taller import estadisticas, qr, seguimiento
+from taller.decorators import get_condicional, lectura_replica, version_queryset
 from taller.forms import (
     ClienteForm,
     EquipoForm,
     EstadoOrdenForm,
     OrdenReparacionForm,
+    OrdenRepuestoBaseFormSet,
     OrdenRepuestoForm,
     RepuestoForm,
 )
 from taller.models import Cliente, Equipo, OrdenReparacion, OrdenRepuesto
+from taller.paginacion import paginar_keyset
+from taller.templatetags.taller_extras import BADGE_BY_ESTADO
+
+
+CAMPOS_TARJETA_ORDEN = (
+    "id",
+    "estado",
+    "precio_estimado",
+    "total",
+    "creado_en",
+    "actualizado_en",
+    "equipo__tipo",
+    "equipo__marca",
+    "equipo__modelo",
+    "equipo__actualizado_en",
+    "equipo__cliente__nombre",
+    "equipo__cliente__actualizado_en",
+    "tecnico_asignado__username",
+)
 
 
-BADGE_BY_ESTADO = {
-    OrdenReparacion.Estado.INGRESADO: "ingresado",
-    OrdenReparacion.Estado.EN_REVISION: "revision",
-    OrdenReparacion.Estado.PRESUPUESTADO: "presupuestado",
-    OrdenReparacion.Estado.REPARANDO: "reparando",
-    OrdenReparacion.Estado.REPARADO: "reparado",
-    OrdenReparacion.Estado.ENTREGADO: "entregado",
-    OrdenReparacion.Estado.CANCELADO: "cancelado",
-}
+async def health(_request):
+    return HttpResponse("ok")
 
 
-def health(_request):
-    return HttpResponse("ok")
+@login_required
+def estado_cache(request):
+    if not request.user.is_superuser:
+        raise PermissionDenied("No autorizado")
+    return JsonResponse(estadisticas_cache())
 
 
-def home(request):
-    accesos = [
+@login_required
+def estado_db(request):
+    if not request.user.is_superuser:
+        raise PermissionDenied("No autorizado")
+    return JsonResponse(conexiones.estadisticas())
+
+
+PAGINA_PUBLICA_CACHE_CONTROL = "public, no-cache"
+HOME_CACHE_SEGUNDOS = 60 * 60
+
+
+def _visitante_anonimo(request):
+    # Solo visitantes anónimos sin mensajes pendientes: con sesión la barra de
+    # navegación es personal y no se puede compartir.
+    return not request.user.is_authenticated and not messages.get_messages(request)
+
+
+def _pagina_publica(request, clave, generar, timeout):
+    if not _visitante_anonimo(request):
+        return None
+    entrada = cache.get(clave)
+    if entrada is None:
+        with primaria():
+            entrada = generar()
+        cache.set(clave, entrada, timeout=timeout)
+    return _respuesta_publica(request, entrada)
+
+
+async def _apagina_publica(request, clave, generar, timeout):
+    # Sesión y mensajes pueden leer la base: se consultan en un hilo.
+    if not await sync_to_async(_visitante_anonimo)(request):
+        return None
+    entrada = await cache.aget(clave)
+    if entrada is None:
+        with primaria():
+            entrada = await generar()
+        await cache.aset(clave, entrada, timeout=timeout)
+    return _respuesta_publica(request, entrada)
+
+
+def _respuesta_publica(request, entrada):
+    response = get_conditional_response(request, etag=entrada["etag"], last_modified=entrada["modificado"])
+    if response is None:
+        response = HttpResponse(entrada["html"])
+    response["ETag"] = entrada["etag"]
+    if entrada["modificado"]:
+        response["Last-Modified"] = http_date(entrada["modificado"])
+    response["Cache-Control"] = PAGINA_PUBLICA_CACHE_CONTROL
+    return response
+
+
+def _accesos_home():
+    return [
         {"titulo": "Órdenes", "descripcion": "Ver y gestionar reparaciones", "url": reverse("ordenes_list")},
         {"titulo": "Equipos", "descripcion": "Equipos ingresados al taller", "url": reverse("equipos_list")},
         {"titulo": "Repuestos", "descripcion": "Stock y disponibilidad", "url": reverse("repuestos_list")},
         {"titulo": "Clientes", "descripcion": "Datos de contacto y equipos", "url": reverse("clientes_list")},
     ]
-    return render(request, "taller/home.html", {"accesos": accesos})
+
+
+def home(request):
+    def generar():
+        html = render_to_string("taller/home.html", {"accesos": _accesos_home()}, request=request)
+        return {"html": html, "etag": quote_etag(hashlib.md5(html.encode()).hexdigest()), "modificado": None}
+
+    response = _pagina_publica(request, "home:anonimo", generar, HOME_CACHE_SEGUNDOS)
+    if response is not None:
+        return response
+    return render(request, "taller/home.html", {"accesos": _accesos_home()})
 
 
 @login_required
+@lectura_replica
 def dashboard(request):
-    ordenes = OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado").order_by("-actualizado_en")
-    stock_bajo = Repuesto.objects.filter(activo=True, stock_actual__lte=0) | Repuesto.objects.filter(
-        activo=True, stock_actual__lte=1
-    )
-    estadisticas_estados = (
-        OrdenReparacion.objects.values("estado")
-        .annotate(total=Count("id"))
-        .order_by("estado")
+    ordenes = paginar_keyset(
+        request,
+        OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado").only(*CAMPOS_TARJETA_ORDEN),
+        orden=("-actualizado_en", "-id"),
     )
-    facturacion_estim = OrdenReparacion.objects.filter(
-        estado__in=[OrdenReparacion.Estado.REPARADO, OrdenReparacion.Estado.ENTREGADO]
-    ).aggregate(total=Sum("precio_estimado"))["total"]
+    stock_critico = alertas.criticos().only("id", "nombre", "stock_actual", "stock_reservado", "stock_minimo")
+    estadisticas_estados, facturacion_estim = estadisticas.resumen()
     return render(
         request,
         "taller/dashboard.html",
         {
             "ordenes": ordenes,
-            "stock_bajo": stock_bajo[:8],
+            "stock_critico": queryset_cacheado("repuestos", "stock_critico", stock_critico[:8]),
             "estadisticas_estados": estadisticas_estados,
             "facturacion_estim": facturacion_estim or 0,
         },
@@ -75,34 +165,63 @@ def dashboard(request):
 
 
 @login_required
+@lectura_replica
+@get_condicional(lambda request: version_queryset(Cliente.objects.all()))
 def clientes_list(request):
-    clientes = Cliente.objects.order_by("-creado_en")
+    clientes = paginar_keyset(
+        request,
+        Cliente.objects.only("id", "nombre", "telefono", "email", "direccion", "creado_en"),
+    )
     return render(request, "taller/clientes_list.html", {"clientes": clientes})
 
 
 @login_required
+@lectura_replica
+@get_condicional(lambda request: version_queryset(Equipo.objects.all(), "actualizado_en", "cliente__actualizado_en"))
 def equipos_list(request):
-    equipos = Equipo.objects.select_related("cliente").order_by("-creado_en")
+    equipos = paginar_keyset(
+        request,
+        Equipo.objects.select_related("cliente").only(
+            "id",
+            "tipo",
+            "marca",
+            "modelo",
+            "numero_serie",
+            "observaciones_ingreso",
+            "creado_en",
+            "cliente__nombre",
+        ),
+    )
     return render(request, "taller/equipos_list.html", {"equipos": equipos})
 
 
 @login_required
+@lectura_replica
+@get_condicional(lambda request: version_queryset(Repuesto.objects.all()))
 def repuestos_list(request):
-    repuestos = Repuesto.objects.order_by("nombre")
+    repuestos = paginar_keyset(
+        request,
+        Repuesto.objects.only(
+            "id", "nombre", "sku", "stock_actual", "stock_reservado", "stock_minimo", "precio_unitario"
+        ),
+        orden=("nombre", "id"),
+    )
     return render(request, "taller/repuestos_list.html", {"repuestos": repuestos})
 
 
 @login_required
+@lectura_replica
+@get_condicional(
+    # Las tarjetas muestran datos del equipo y del cliente: su versión sale de la familia
+    # "clientes" de la caché, sin un JOIN que recorra todas las órdenes.
+    lambda request: (*version_queryset(OrdenReparacion.objects.all()), version_familia("clientes"))
+)
 def ordenes_list(request):
-    ordenes = OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado").order_by("-creado_en")
-    return render(
+    ordenes = paginar_keyset(
         request,
-        "taller/ordenes_list.html",
-        {
-            "ordenes": ordenes,
-            "badge_by_estado": BADGE_BY_ESTADO,
-        },
+        OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado").only(*CAMPOS_TARJETA_ORDEN),
     )
+    return render(request, "taller/ordenes_list.html", {"ordenes": ordenes})
 
 
 @login_required
@@ -195,8 +314,69 @@ def repuesto_edit(request, pk):
     return render(request, "taller/form_page.html", {"title": "Editar repuesto", "form": form})
 @login_required
 def orden_create(request):
-    equipos = Equipo.objects.select_related("cliente").order_by("-creado_en")
-    return render(request, "taller/orden_select_equipo.html", {"equipos": equipos})
+    return render(request, "taller/orden_select_equipo.html")
+
+
+def _autocompletar(request, queryset, campos, orden, fila):
+    # Sin texto devuelve los primeros según `orden` (sirve un índice); con texto, los que
+    # empiezan así en alguna de las columnas normalizadas.
+    try:
+        limite = min(int(request.GET.get("limite", busqueda.LIMITE)), busqueda.LIMITE_MAXIMO)
+    except ValueError:
+        limite = busqueda.LIMITE
+    texto = request.GET.get("q", "")
+    if busqueda.normalizar(texto):
+        queryset = busqueda.buscar(queryset, texto, campos)
+    return JsonResponse({"resultados": [fila(objeto) for objeto in queryset.order_by(*orden)[: max(limite, 1)]]})
+
+
+@login_required
+@lectura_replica
+def buscar_clientes(request):
+    return _autocompletar(
+        request,
+        Cliente.objects.only("id", "nombre", "telefono"),
+        ("nombre_busqueda", "telefono_busqueda"),
+        ("-creado_en", "-id"),
+        lambda cliente: {"id": cliente.pk, "texto": cliente.nombre, "detalle": cliente.telefono},
+    )
+
+
+@login_required
+@lectura_replica
+def buscar_equipos(request):
+    return _autocompletar(
+        request,
+        Equipo.objects.select_related("cliente").only(
+            "id", "tipo", "marca", "modelo", "numero_serie", "cliente__nombre"
+        ),
+        ("marca_modelo_busqueda", "modelo_busqueda", "serie_busqueda"),
+        ("-creado_en", "-id"),
+        lambda equipo: {
+            "id": equipo.pk,
+            "texto": str(equipo),
+            "detalle": " · ".join(filter(None, [equipo.cliente.nombre, equipo.numero_serie])),
+        },
+    )
+
+
+@login_required
+@lectura_replica
+def buscar_repuestos(request):
+    return _autocompletar(
+        request,
+        Repuesto.objects.filter(activo=True).only(
+            "id", "nombre", "sku", "stock_actual", "stock_reservado", "precio_unitario"
+        ),
+        ("nombre_busqueda", "sku_busqueda"),
+        ("nombre", "id"),
+        lambda repuesto: {
+            "id": repuesto.pk,
+            "texto": str(repuesto),
+            "detalle": f"Disponible: {repuesto.stock_disponible}",
+            "precio": str(repuesto.precio_unitario),
+        },
+    )
 
 
 @login_required
@@ -205,6 +385,7 @@ def orden_create_form(request):
         OrdenReparacion,
         OrdenRepuesto,
         form=OrdenRepuestoForm,
+        formset=OrdenRepuestoBaseFormSet,
         extra=1,
         can_delete=True,
     )
@@ -214,24 +395,17 @@ def orden_create_form(request):
         form = OrdenReparacionForm(request.POST)
         formset = OrdenRepuestoFormSet(request.POST)
         if form.is_valid() and formset.is_valid():
-            stock_ok = True
-            for repuesto_form in formset.forms:
-                cleaned = getattr(repuesto_form, "cleaned_data", None)
-                if not cleaned or cleaned.get("DELETE"):
-                    continue
-                repuesto = cleaned.get("repuesto")
-                cantidad = cleaned.get("cantidad") or 0
-                if repuesto and cantidad > repuesto.stock_actual:
-                    repuesto_form.add_error(
-                        "cantidad",
-                        f"Stock insuficiente para {repuesto.nombre}. Disponible: {repuesto.stock_actual}.",
-                    )
-                    stock_ok = False
-
-            if stock_ok:
-                orden = form.save()
-                formset.instance = orden
-                formset.save()
+            try:
+                with transaction.atomic():
+                    orden = form.save()
+                    formset.instance = orden
+                    items = formset.save()
+                    # Una orden que nace reparada descuenta el stock directo; cancelada, no lo toca.
+                    if orden.admite_repuestos:
+                        orden.reservar_repuestos(items)
+            except ValidationError as exc:
+                messages.error(request, " ".join(exc.messages))
+            else:
                 messages.success(request, f"Orden #{orden.id} creada correctamente.")
                 return redirect(reverse("orden_detalle", args=[orden.id]))
     else:
@@ -252,7 +426,35 @@ def orden_create_form(request):
     )
 
 
+def _guardar_orden(form):
+    # La transición, los contadores y el descuento de stock van en la transacción de save():
+    # si algo la rechaza no queda nada escrito. El error se atrapa antes del commit, así una
+    # falla posterior no se muestra como un cambio rechazado que en realidad se guardó.
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                form.save()
+        except ValidationError as exc:
+            form.add_error(None, exc.messages)
+            return False
+    return True
+
+
+def _version_orden(request, pk):
+    # La orden ya se toca cuando cambian sus repuestos; el equipo y el cliente aportan su
+    # propio actualizado_en y el catálogo de repuestos entra por el selector del formulario.
+    ultimo_repuesto = Repuesto.objects.order_by("-actualizado_en").values("actualizado_en")[:1]
+    return (
+        OrdenReparacion.objects.filter(pk=pk)
+        .annotate(catalogo=Subquery(ultimo_repuesto))
+        .values_list("actualizado_en", "equipo__actualizado_en", "equipo__cliente__actualizado_en", "catalogo")
+        .first()
+        or ()
+    )
+
+
 @login_required
+@get_condicional(_version_orden)
 def orden_detalle(request, pk):
     orden = get_object_or_404(
         OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado"),
@@ -266,33 +468,38 @@ def orden_detalle(request, pk):
         if action == "update_estado":
             estado_form = EstadoOrdenForm(request.POST, instance=orden)
             if estado_form.is_valid():
-                estado_form.save()
-                messages.success(request, "Orden actualizada.")
-                return redirect(reverse("orden_detalle", args=[orden.id]))
+                if _guardar_orden(estado_form):
+                    messages.success(request, "Orden actualizada.")
+                    return redirect(reverse("orden_detalle", args=[orden.id]))
+                # El formulario dejó en la instancia el estado rechazado: se muestra el de la base.
+                orden.refresh_from_db()
         elif action == "add_repuesto":
             repuesto_form = OrdenRepuestoForm(request.POST)
+            if not orden.admite_repuestos:
+                messages.error(request, "La orden está cerrada: no admite repuestos nuevos.")
+                return redirect(reverse("orden_detalle", args=[orden.id]))
             if repuesto_form.is_valid():
                 item = repuesto_form.save(commit=False)
-                if item.cantidad > item.repuesto.stock_actual:
-                    repuesto_form.add_error(
-                        "cantidad",
-                        f"Stock insuficiente para {item.repuesto.nombre}. Disponible: {item.repuesto.stock_actual}.",
-                    )
+                item.orden = orden
+                try:
+                    with transaction.atomic():
+                        item.save()
+                        orden.reservar_repuestos([item])
+                except ValidationError as exc:
+                    repuesto_form.add_error("cantidad", exc.messages)
                 else:
-                    item.orden = orden
-                    item.save()
-                    messages.success(request, "Repuesto agregado a la orden.")
+                    messages.success(request, "Repuesto agregado y reservado para la orden.")
                     return redirect(reverse("orden_detalle", args=[orden.id]))
 
-    total_repuestos = sum((item.subtotal() for item in orden.repuestos.all()), start=0)
+    items = list(orden.repuestos.select_related("repuesto"))
     return render(
         request,
         "taller/orden_detalle.html",
         {
             "orden": orden,
+            "items": items,
             "estado_form": estado_form,
             "repuesto_form": repuesto_form,
-            "total_repuestos": total_repuestos,
             "badge": BADGE_BY_ESTADO.get(orden.estado, "secondary"),
         },
     )
@@ -304,28 +511,89 @@ def orden_edit(request, pk):
     if request.method == "POST":
         form = OrdenReparacionForm(request.POST, instance=orden)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Orden actualizada correctamente.")
-            return redirect("ordenes_list")
+            if _guardar_orden(form):
+                messages.success(request, "Orden actualizada correctamente.")
+                return redirect("ordenes_list")
+            orden.refresh_from_db()
     else:
         form = OrdenReparacionForm(instance=orden)
     return render(request, "taller/form_page.html", {"title": "Editar orden", "form": form})
 
 
-def seguimiento_publico(request, token):
-    orden = get_object_or_404(
-        OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado"),
-        qr_token=token,
-    )
-    return render(
-        request,
-        "taller/seguimiento_publico.html",
-        {
+@lectura_replica
+async def seguimiento_publico(request, token):
+    # Vista async: bajo ASGI una ráfaga de escaneos de QR no ocupa los hilos de las vistas
+    # del personal. El acierto en la caché local se resuelve sin salir del event loop.
+    async def contexto():
+        orden = await aget_object_or_404(
+            OrdenReparacion.objects.select_related("equipo__cliente", "tecnico_asignado"),
+            qr_token=token,
+        )
+        return {
             "orden": orden,
             "badge": BADGE_BY_ESTADO.get(orden.estado, "secondary"),
-            "repuestos": orden.repuestos.select_related("repuesto"),
-        },
-    )
+            "repuestos": [item async for item in orden.repuestos.select_related("repuesto")],
+        }
+
+    async def generar():
+        datos = await contexto()
+        # Los datos del equipo y del cliente también están en la página.
+        orden = datos["orden"]
+        modificado = max(orden.actualizado_en, orden.equipo.actualizado_en, orden.equipo.cliente.actualizado_en)
+        return {
+            "html": await sync_to_async(render_to_string)("taller/seguimiento_publico.html", datos, request=request),
+            "etag": quote_etag(f"{token.hex}-{modificado.timestamp():.6f}"),
+            "modificado": int(modificado.timestamp()),
+        }
+
+    response = await _apagina_publica(request, seguimiento.clave_cache(token), generar, seguimiento.CACHE_SEGUNDOS)
+    if response is not None:
+        return response
+    return await sync_to_async(render)(request, "taller/seguimiento_publico.html", await contexto())
+
+
+QR_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+async def orden_qr(request, token, formato):
+    if formato not in qr.FORMATOS:
+        raise Http404("Formato de QR no soportado")
+
+    etag = qr.etag(token, formato)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        contenido = await cache.aget(qr.clave_cache(token, formato))
+        if contenido is None:
+            contenido = await _obtener_qr(token, formato)
+            await cache.aset(qr.clave_cache(token, formato), contenido, timeout=qr.CACHE_SEGUNDOS)
+        response = HttpResponse(contenido, content_type=qr.FORMATOS[formato])
+    response["ETag"] = etag
+    response["Cache-Control"] = QR_CACHE_CONTROL
+    return response
+
+
+def _leer_archivo(nombre):
+    with default_storage.open(nombre) as archivo:
+        return archivo.read()
+
+
+async def _obtener_qr(token, formato):
+    orden = await OrdenReparacion.objects.filter(qr_token=token).values("id", "qr_imagen").afirst()
+    if orden is None:
+        raise Http404("Orden inexistente")
+
+    if formato == "png" and orden["qr_imagen"]:
+        try:
+            return await sync_to_async(_leer_archivo, thread_sensitive=False)(orden["qr_imagen"])
+        except OSError:
+            pass
+
+    # Dibujar el QR es CPU puro: va a un hilo propio para no frenar el event loop.
+    contenido = await sync_to_async(qr.renderizar, thread_sensitive=False)(qr.url_seguimiento(token), formato)
+    if formato == "png":
+        nombre = await sync_to_async(default_storage.save)(qr.nombre_archivo(orden["id"]), ContentFile(contenido))
+        await OrdenReparacion.objects.filter(pk=orden["id"]).aupdate(qr_imagen=nombre)
+    return contenido
 
 
 @login_required